@@ -1,70 +1,143 @@
-from flask import Flask, request, jsonify, session, redirect, url_for
-from flask_session import Session
+from flask import Flask, Blueprint, current_app, request, jsonify, session, redirect, url_for
+import click
 from datetime import datetime
-import re
 import os
+import math
+import time
 import uuid
-import requests
-import redis
-import bcrypt
 import stripe
+import msgspec
+import redis
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from pymongo import MongoClient
-from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from bson import ObjectId
 from datetime import timedelta
-from schedule_parser import parse_html_schedule
-from fuzzy_match import fuzzy_match_event
+from schedule_parser import (
+    parse_html_schedule, parse_schedule_stream, ScheduleTooLargeError, DEFAULT_MAX_BYTES as SCHEDULE_MAX_BYTES
+)
+from fuzzy_match import SEASON_CODE, OrdersFetchError, fuzzy_match_event, fetch_patron_orders, build_event_index
+from paciolan_client import PaciolanClient, PaciolanError, PaciolanUnavailableError
+from log_shipper import shipper_from_env
+from orders_cache import OrdersCache
+from schedule_cache import ScheduleCache
+from holds import holds_from_env
+from listing_view import listing_view_from_env
+from jobs import JobDeferred, JobFailed, queue_from_env
+from stripe_webhooks import (
+    PAYMENT_INTENT_EVENTS, WebhookError, verify_event, record_event, forget_event, apply_payment_intent_event
+)
+from ticket_state import (
+    TicketStateError, hold_ticket, record_transfer, get_pending, record_payment, release_ticket, mark_sold,
+    extend_hold
+)
+from schedule_ingest import (
+    ScheduleSource, ScheduleFetchError, ScheduleValidationError, sources_from_json,
+    fetch_schedule_page, attach_source, prepare_schedule, upsert_schedule, ingest_schedules, refresh_schedules
+)
+from metrics import (
+    init_app as init_metrics, registry as metrics_registry, stats_callback,
+    InstrumentedRedis, MongoCommandListener
+)
+from outbound import GuardedStripeClient, policy_from_env, circuit_states, outbound_stats
+from passwords import HasherBusyError, hasher_from_env, throttle_from_env
+from listing_query import (
+    ListingQueryError, parse_listing_args, build_listing_query, serialize_listing,
+    encode_cursor, LISTING_PROJECTION, LISTING_SORT
+)
+from schema import ensure_indexes, verify_hot_queries, IndexVerificationError
+from clients import ProcessLocal
+from models import (
+    RequestValidationError, decode_body, from_doc, from_docs, projection, encode, json_response,
+    NewTicket, NewAttendance, NewUser, LoginRequest, Ticket, Attendance, UserProfile, PublicProfile,
+    Schedule, SchoolSchedules,
+)
+from session_index import IndexedSession, get_latest_user_session, delete_user_sessions, backfill_session_index
 from dotenv import load_dotenv
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SESSION_COOKIE_SECURE'] = False  # if you're on HTTP in dev
-CORS(app, supports_credentials=True)
-
-#Redis Integration - Secret Key
-app.secret_key = os.getenv('SECRET_KEY')
-app.config['SESSION_TYPE'] = 'redis'
-app.config['SESSION_PERMANENT'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=6)
-app.config['SESSION_SERIALIZATION_FORMAT'] = 'json'
-app.config['SESSION_USE_SIGNER'] = True
-app.config['SESSION_REDIS'] = redis.from_url(os.getenv('REDIS_URL'))
-app.config['SESSION_COOKIE_SECURE'] = True # uses https or not
-app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+# Routes, CLI commands and the per-request hook live on this blueprint; create_app() builds
+# the Flask app around it. The clients below are process-wide, shared by the routes, the job
+# workers and the hold sweeper, and connect on first use (see clients.py), so importing this
+# module does no I/O.
+api = Blueprint("api", __name__, cli_group=None)
+
+# Connection pool sizes, per worker process. With N request threads (plus the log shipper,
+# hold sweeper, listing view and JOB_WORKERS threads) each pool wants a little over N connections.
+# create_app() sets these from its config.
+pool_sizes = {
+    "MONGO_MAX_POOL_SIZE": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "REDIS_MAX_CONNECTIONS": int(os.getenv("REDIS_MAX_CONNECTIONS", "0")) or None,
+}
+
+def _redis_client(url=None, **kwargs):
+    """
+    Redis client with this process's pool. When REDIS_MAX_CONNECTIONS is set, threads
+    wait for a free connection instead of erroring past the limit.
+    """
+    max_connections = pool_sizes['REDIS_MAX_CONNECTIONS']
+    if max_connections:
+        if url:
+            pool = redis.BlockingConnectionPool.from_url(url, max_connections=max_connections, **kwargs)
+        else:
+            pool = redis.BlockingConnectionPool(max_connections=max_connections, **kwargs)
+        return InstrumentedRedis(connection_pool=pool)
+    if url:
+        return InstrumentedRedis.from_url(url, **kwargs)
+    return InstrumentedRedis(**kwargs)
+
+# Session store, passed to Flask-Session as SESSION_REDIS
+session_redis = ProcessLocal(lambda: _redis_client(os.getenv('REDIS_URL')))
 #Connect to Redis
-r = redis.Redis(host='localhost', port=6379, decode_responses=True)
+r = ProcessLocal(lambda: _redis_client(host='localhost', port=6379, decode_responses=True))
 #Session ID Generation
 def generate_session_id():
     return str(uuid.uuid4())
-# Create and initialize the Flask-Session object AFTER `app` has been configured
-server_session = Session(app)
 
-# Stripe Integration
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# Stripe calls get STRIPE_HTTP_* timeouts and a circuit breaker; stripe-python does the
+# retries itself (jittered backoff, idempotency keys on every POST)
+stripe_policy = policy_from_env("stripe", "STRIPE_HTTP", connect_timeout=5.0, read_timeout=30.0)
+# Signing secret for /webhooks/stripe. When unset, confirm asks Stripe for the payment status directly.
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
 # MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-ssdb = client['student_section']
-schedules_collection = ssdb['schedules']
-users_collection = ssdb['users']
-tickets_collection = ssdb['tickets']
-apilogs_collection = ssdb['apilogs']
+def _mongo_client():
+    options = {"maxPoolSize": pool_sizes['MONGO_MAX_POOL_SIZE']}
+    if os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"):
+        options["serverSelectionTimeoutMS"] = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"))
+    return MongoClient(os.getenv('MONGO_URI'), event_listeners=[MongoCommandListener()], **options)
+
+client = ProcessLocal(_mongo_client)
+ssdb = client.child(os.getenv('MONGO_DB_NAME', 'student_section'))
+schedules_collection = ssdb.child('schedules')
+users_collection = ssdb.child('users')
+tickets_collection = ssdb.child('tickets')
+apilogs_collection = ssdb.child('apilogs')
+stripe_events_collection = ssdb.child('stripe_events')
 
 # Mock API base URL for Paciolan
 # --- Configuration based on Mockoon config ---
-MOCK_API_BASE_URL = "http://localhost:3003"
+MOCK_API_BASE_URL = os.getenv("PACIOLAN_BASE_URL", "http://localhost:3003")
 DISTRIBUTOR_CODE = "SS"
 USER_AGENT = "StudentSection/v1.0"
 PAC_CHANNEL_CODE = "mock.channel.code"
 PAC_APP_ID = "application.id"
 PAC_API_KEY = "mock.api.key"
+PAC_ORGANIZATION_ID = "OrganizationID"
+PAC_POOL_SIZE = int(os.getenv("PAC_POOL_SIZE", "10"))
+# Timeouts, retries and circuit breaker for every Paciolan call (PACIOLAN_* settings)
+paciolan_policy = policy_from_env("paciolan", "PACIOLAN", connect_timeout=3.0, read_timeout=10.0)
+
+# Let listing names match Paciolan events on token-set score ("Xavier" vs "Xavier Musketeers")
+FUZZY_TOKEN_SET_NAMES = os.getenv("FUZZY_TOKEN_SET_NAMES", "false").lower() == "true"
 
-MOCK_API_BASE_URL = "http://localhost:3003"
+# Diagnostics are written to apilogs in batches by a background thread
+log_shipper = shipper_from_env(apilogs_collection)
 
 def log_mongo_debug(level: str, message: str, extra: dict = None):
     """
-    Insert a debug log into the apilogs collection.
+    Queue a debug log for the apilogs collection; the log shipper inserts it in the background.
     :param level: e.g. "DEBUG", "INFO", "ERROR"
     :param message: A short log message or summary
     :param extra: Optional dict of additional details
@@ -78,39 +151,127 @@ def log_mongo_debug(level: str, message: str, extra: dict = None):
         "message": message,
         "extra": extra
     }
-    apilogs_collection.insert_one(log_entry)
-
-# Utility function to authenticate with the mock Paciolan API
-def get_mock_token():
-    print("get_token endpoint was called")
-    url = f"{MOCK_API_BASE_URL}/v1/auth/token"
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": "MyApplication/1.0",
-        "Accept": "application/json",
-        "Request-ID": "d4f55f60-1a6d-4a3c-8f36-1f4e4a3a6b6c"
-    }
-    response = requests.post(url, headers=headers)
-    status = 'Success' if response.status_code == 200 else 'Error'
-    log_mongo_debug('POST /v1/auth/token', response.status_code, status)
-    if response.status_code == 200:
-        return response.json().get("accessToken")
-    return None
-
-def get_auth_token():
-    token = get_mock_token()  # Already defined in your app.py
-    return f"Bearer {token}" if token else None
-
-def generate_request_id():
-    return str(uuid.uuid4())
-
-#Pull the new session for later use
-def get_user_session(useremail):
-    sessions=r.scan(cursor=0, match="session:*")
-    for newsession in sessions[1]:
-        session_data=r.get(newsession)
-        if useremail in session_data:
-            return newsession    
+    log_shipper.submit(log_entry)
+
+def _log_token_fetch(status_code):
+    status = 'Success' if status_code == 200 else 'Error'
+    log_mongo_debug('POST /v1/auth/token', status_code, status)
+
+# Shared Paciolan client: pooled keep-alive connections and a cached bearer token (one per process)
+paciolan = ProcessLocal(lambda: PaciolanClient(
+    base_url=MOCK_API_BASE_URL,
+    distributor_code=DISTRIBUTOR_CODE,
+    user_agent=USER_AGENT,
+    channel_code=PAC_CHANNEL_CODE,
+    application_id=PAC_APP_ID,
+    api_key=PAC_API_KEY,
+    organization_id=PAC_ORGANIZATION_ID,
+    pool_size=PAC_POOL_SIZE,
+    on_token_fetch=_log_token_fetch,
+    policy=paciolan_policy
+))
+
+# Decoded patron orders, cached per (paciolan_id, season_code) in-process and in Redis.
+# Each process also keeps the fuzzy matcher's date-bucketed event index next to its copy.
+orders_cache = OrdersCache(
+    r,
+    fetch=lambda paciolan_id, season_code: fetch_patron_orders(paciolan, paciolan_id, season_code),
+    ttl=int(os.getenv("ORDERS_CACHE_TTL", "300")),
+    stale_ttl=int(os.getenv("ORDERS_CACHE_STALE_TTL", "900")),
+    max_entries=int(os.getenv("ORDERS_CACHE_MAX_ENTRIES", "256")),
+    derive=build_event_index
+)
+
+# Sources per bulk schedule request (fetch/parse pool sizes are in schedule_ingest.py)
+SCHEDULE_BULK_MAX_SOURCES = int(os.getenv("SCHEDULE_BULK_MAX_SOURCES", "50"))
+
+# Serialized /schedule responses, invalidated per school by POST /schedule/upload
+schedule_cache = ScheduleCache(r, ttl=int(os.getenv("SCHEDULE_CACHE_TTL", "3600")))
+
+# bcrypt runs in a bounded per-worker process pool (BCRYPT_ROUNDS, PASSWORD_HASH_*) so login
+# bursts can't tie up request threads; failed logins are throttled per IP and account (LOGIN_*)
+password_hasher = hasher_from_env()
+login_throttle = throttle_from_env(r)
+
+#Pull the newest session for later use
+def get_user_session(user_id):
+    return get_latest_user_session(current_app.session_interface.client, user_id)
+
+
+@api.cli.command("backfill-session-index")
+def backfill_session_index_command():
+    """One-time: index the sessions that existed before the per-user session index."""
+    interface = current_app.session_interface
+    indexed = backfill_session_index(interface.client, interface.serializer, interface.key_prefix)
+    click.echo(f"Indexed {indexed} sessions")
+
+
+@api.cli.command("ingest-schedules")
+@click.argument("files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option("--url", "urls", multiple=True, help="Schedule page to fetch; may be repeated.")
+@click.option("--user-id", default="cli", show_default=True, help="Recorded as the schedules' user_id.")
+def ingest_schedules_command(files, urls, user_id):
+    """Bulk-load schedules from HTML files and/or URLs in one write."""
+    sources = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            sources.append(ScheduleSource(path, html=f.read()))
+    sources.extend(ScheduleSource(url, url=url) for url in urls)
+    if not sources:
+        raise click.UsageError("Give at least one FILE or --url")
+
+    results = ingest_schedules(sources, schedules_collection, user_id)
+    for school_name in {r["school_name"] for r in results if r["status"] in ("created", "updated")}:
+        schedule_cache.invalidate(school_name)
+    for r in results:
+        detail = r.get("error") or f"{r['school_name'] or '(no school)'} / {r['event_type']}, {r['games']} games"
+        click.echo(f"{r['status']:<10} {r['source']}: {detail}")
+    if any(r["status"] == "error" for r in results):
+        raise SystemExit(1)
+
+
+@api.cli.command("refresh-schedules")
+def refresh_schedules_command():
+    """Re-check every URL-registered schedule with conditional requests; run periodically (e.g. daily cron)."""
+    results = refresh_schedules(schedules_collection)
+    for school_name in {r["school_name"] for r in results if r["status"] == "updated"}:
+        schedule_cache.invalidate(school_name)
+    for r in results:
+        detail = r.get("error") or (f"{r['changed_games']} games changed" if r["status"] == "updated" else "")
+        click.echo(f"{r['status']:<13} {r['school_name'] or '(no school)'} / {r['event_type']} {r['url']} {detail}".rstrip())
+    click.echo(f"{len(results)} schedules checked")
+    if any(r["status"] == "error" for r in results):
+        raise SystemExit(1)
+
+
+@api.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create the indexes declared in schema.py (safe to re-run)."""
+    failed = False
+    for spec, error in ensure_indexes(ssdb):
+        click.echo(f"{spec.collection}.{spec.name}: {error or 'ok'}")
+        failed = failed or error is not None
+    if failed:
+        raise SystemExit(1)
+
+
+@api.cli.command("verify-indexes")
+def verify_indexes_command():
+    """explain() every hot query and exit non-zero if any of them scans a collection."""
+    try:
+        plans = verify_hot_queries(ssdb)
+    except IndexVerificationError as e:
+        click.echo(str(e), err=True)
+        raise SystemExit(1)
+    for name, stages in plans.items():
+        click.echo(f"{name}: {' > '.join(stages)}")
+
+@api.cli.command("run-jobs")
+@click.option("--workers", default=4, show_default=True, help="Worker threads.")
+def run_jobs_command(workers):
+    """Run the Paciolan transfer job workers in the foreground (set JOB_WORKERS=0 on the web processes)."""
+    job_queue.workers = workers
+    job_queue.run_forever()
 
 def transfer_ticket_initialize(ticket, buyer):
     """
@@ -132,64 +293,71 @@ def transfer_ticket_initialize(ticket, buyer):
             }
         ]
     }
-    url = f"{MOCK_API_BASE_URL}/v1/tickets/transfer?distributorCode={DISTRIBUTOR_CODE}"
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Authorization": get_auth_token(),
-        "PAC-Channel-Code": PAC_CHANNEL_CODE,
-        "PAC-Application-ID": PAC_APP_ID,
-        "PAC-API-Key": PAC_API_KEY,
-        "Request-ID": generate_request_id(),
-        "Content-Type": "application/json"
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    try:
+        response = paciolan.create_transfer(payload)
+    except PaciolanError:
+        return False, None, None, None
     if response.status_code == 200:
         data = response.json()
         # Expected fields: transferId and url as defined in the mock response
         return True, data.get("transferId"), data.get("url"), data.get("confirmationCd")
     else:
         # Optionally, log response details for debugging
-        return False, None, None
+        return False, None, None, None
 
 def transfer_ticket_cancel(confirmation_code):
     """
     Cancel the ticket transfer by calling the mock Paciolan cancel endpoint.
     """
-    url = f"{MOCK_API_BASE_URL}/v1/tickets/transfer/{confirmation_code}?distributorCode={DISTRIBUTOR_CODE}"
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Authorization": get_auth_token(),
-        "PAC-Channel-Code": PAC_CHANNEL_CODE,
-        "PAC-Application-ID": PAC_APP_ID,
-        "PAC-API-Key": PAC_API_KEY,
-        "Request-ID": generate_request_id(),
-        "Content-Type": "application/json"
-    }
     # Send DELETE request to cancel the transfer
-    response = requests.delete(url, headers=headers)
+    try:
+        response = paciolan.cancel_transfer(confirmation_code)
+    except PaciolanError:
+        return False
     if response.status_code == 200 or response.status_code == 204:
         return True
     else:
         # Optionally log response for debugging if needed
         return False
 
+def _settle_expiring_payment(ticket):
+    """
+    Current status of an expiring hold's PaymentIntent. An intent that can still be canceled
+    is canceled first, so the buyer can't pay for a ticket that is about to go back on sale.
+    """
+    intent_id = ticket["transaction_id"]
+    try:
+        intent = stripe.PaymentIntent.cancel(intent_id)
+    except stripe.InvalidRequestError:
+        # Succeeded, processing or already canceled: read what it is now
+        intent = stripe.PaymentIntent.retrieve(intent_id)
+    tickets_collection.update_one(
+        {"_id": ticket["_id"], "status": "pending", "transaction_id": intent_id},
+        {"$set": {"payment_status": intent.status}}
+    )
+    return intent.status
+
+# Pending purchases hold a ticket for TICKET_HOLD_SECONDS; a background sweeper cancels
+# the Paciolan transfer and makes the ticket available again once the hold expires.
+# A hold that was paid by then is finished by the transfer.accept job instead.
+holds = holds_from_env(
+    r, tickets_collection, cancel_transfer=transfer_ticket_cancel, payment_status=_settle_expiring_payment,
+    on_paid=lambda ticket_id, buyer_id: _enqueue_transfer_accept(ticket_id, buyer_id)
+)
+
+# GET /tickets is served from an in-memory view of available listings, seeded per process
+# and kept current by a change stream on tickets (needs a replica set). LISTING_VIEW=false
+# serves every page from Mongo.
+listing_view = listing_view_from_env(tickets_collection)
 
 def transfer_ticket_accept(transfer_id):
     """
     Confirm the ticket transfer by calling the mock Paciolan accept endpoint.
     """
-    payload = {"transferId": transfer_id}
-    url = f"{MOCK_API_BASE_URL}/v1/tickets/transfer/accept?distributorCode={DISTRIBUTOR_CODE}"
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Authorization": get_auth_token(),
-        "PAC-Channel-Code": PAC_CHANNEL_CODE,
-        "PAC-Application-ID": PAC_APP_ID,
-        "PAC-API-Key": PAC_API_KEY,
-        "Request-ID": generate_request_id(),
-        "Content-Type": "application/json"
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    try:
+        response = paciolan.accept_transfer(transfer_id)
+    except PaciolanError:
+        return False, None, None
     if response.status_code == 200:
         data = response.json()
         # Expected fields: transferId and confirmationCd from the mock response
@@ -197,37 +365,190 @@ def transfer_ticket_accept(transfer_id):
     else:
         return False, None, None
 
+
+# Paciolan transfer calls run on a Redis-backed job queue so a slow Paciolan
+# holds up a job worker rather than a web worker. Each job is keyed by ticket,
+# retried with backoff (JOB_MAX_ATTEMPTS) and dead-lettered when it runs out.
+# Handlers re-check the ticket's state first, so re-running one is harmless.
+job_queue = queue_from_env(r)
+
+def _buyer_info(buyer_id):
+    """Buyer details for the ticket transfer (use real user info if available)."""
+    buyer_doc = users_collection.find_one({"_id": ObjectId(buyer_id)}) or {}
+    return {
+        "email": buyer_doc.get("email", ""),
+        "first_name": buyer_doc.get("first_name", "BuyerFirstName"),
+        "last_name":  buyer_doc.get("last_name", "BuyerLastName"),
+        "phone":      buyer_doc.get("phone") if buyer_doc.get("phone") else None
+    }
+
+@job_queue.handler("transfer.initialize")
+def run_transfer_initialize(payload):
+    ticket_id, buyer_id = payload["ticket_id"], payload["buyer_id"]
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, buyer_id)
+    except TicketStateError as e:
+        raise JobFailed(e.message)
+    transfer = ticket.get("transfer", {})
+    if transfer.get("confirmationCd"):
+        # An earlier attempt already started the transfer
+        return {"transferUrl": transfer.get("url")}
+
+    success, transfer_id, transfer_url, confirmationCd = transfer_ticket_initialize(ticket, _buyer_info(buyer_id))
+    if not success or not transfer_id or not transfer_url or not confirmationCd:
+        raise RuntimeError("Ticket transfer initialization failed")
+
+    # Store transfer details in the ticket document for later confirmation
+    try:
+        record_transfer(tickets_collection, ticket_id, buyer_id, transfer_id, transfer_url, confirmationCd)
+    except TicketStateError as e:
+        # The hold lapsed while Paciolan was responding; don't leave the transfer open
+        transfer_ticket_cancel(confirmationCd)
+        raise JobFailed(e.message)
+    return {"transferUrl": transfer_url}
+
+def _payment_buyer_id(ticket):
+    """buyer_id from the metadata of the ticket's PaymentIntent (asks Stripe if it wasn't stored with the status)."""
+    if ticket.get("payment_buyer_id"):
+        return ticket["payment_buyer_id"]
+    intent = stripe.PaymentIntent.retrieve(ticket["transaction_id"])
+    return intent.metadata.get("buyer_id")
+
+@job_queue.handler("transfer.accept")
+def run_transfer_accept(payload):
+    ticket_id, buyer_id = payload["ticket_id"], payload["buyer_id"]
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, buyer_id, wrong_buyer="Ticket is not pending for this user")
+    except TicketStateError as e:
+        sold = tickets_collection.find_one(
+            {"_id": ObjectId(ticket_id), "status": "sold", "buyer_id": ObjectId(buyer_id)}, {"transfer": 1}
+        ) if e.status_code == 400 else None
+        if sold:
+            # An earlier attempt already finished the purchase
+            return {"confirmationCode": sold.get("transfer", {}).get("confirmationCd")}
+        raise JobFailed(e.message)
+
+    if ticket.get("payment_status") != "succeeded":
+        if ticket.get("payment_status") == "canceled":
+            raise JobFailed("Payment was canceled")
+        # The payment_intent.succeeded webhook hasn't arrived yet. Wait for it without using up
+        # attempts (the hold sweeper ends the wait if the payment never completes); the webhook
+        # wakes this job when it arrives.
+        raise JobDeferred("Payment has not been completed yet")
+    if _payment_buyer_id(ticket) != buyer_id:
+        raise JobFailed("Payment was not made by this buyer")
+
+    transfer_info = ticket.get("transfer", {})
+    transfer_id = transfer_info.get("transferId")
+    if not transfer_id:
+        # transfer.initialize hasn't finished yet; retry after it has
+        raise RuntimeError("Ticket transfer has not been initialized yet")
+
+    success, confirmed_transfer_id, confirmation_code = transfer_ticket_accept(transfer_id)
+    if not success or not confirmation_code:
+        raise RuntimeError("Ticket transfer confirmation failed")
+
+    # Mark the ticket as sold and record the transfer confirmation code
+    try:
+        mark_sold(tickets_collection, ticket_id, buyer_id, confirmation_code)
+    except TicketStateError as e:
+        raise JobFailed(e.message)
+    holds.converted(ticket_id)
+
+    # The seller's Paciolan orders changed with this transfer, so drop the cached copy
+    seller_patron_id = transfer_info.get("Sender", {}).get("patronId")
+    if seller_patron_id:
+        orders_cache.invalidate(seller_patron_id)
+    return {"confirmationCode": confirmation_code}
+
+@job_queue.handler("transfer.cancel")
+def run_transfer_cancel(payload):
+    ticket_id, buyer_id = payload["ticket_id"], payload["buyer_id"]
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, buyer_id)
+    except TicketStateError as e:
+        raise JobFailed(e.message)
+
+    confirmation_code = ticket.get("transfer", {}).get("confirmationCd")
+    if not confirmation_code:
+        # transfer.initialize hasn't finished yet; retry after it has
+        raise RuntimeError("Ticket transfer has not been initialized yet")
+    if not transfer_ticket_cancel(confirmation_code):
+        raise RuntimeError("Ticket transfer cancellation failed")
+
+    # Revert the ticket status to available and clear buyer/transfer fields
+    try:
+        release_ticket(tickets_collection, ticket_id, buyer_id)
+    except TicketStateError as e:
+        raise JobFailed(e.message)
+    holds.canceled(ticket_id)
+    return {"released": True}
+
+def _enqueue_transfer_accept(ticket_id, buyer_id):
+    """
+    Extend the hold (paid tickets shouldn't expire while the job waits its turn) and queue transfer.accept.
+    If the job is already waiting (e.g. for the payment webhook that is calling this), it runs now.
+    """
+    hold_expires_at = holds.new_deadline()
+    extend_hold(tickets_collection, ticket_id, buyer_id, hold_expires_at)
+    holds.extended(ticket_id, hold_expires_at)
+    job_id, created = job_queue.enqueue(
+        "transfer.accept", f"{ticket_id}:{buyer_id}", {"ticket_id": ticket_id, "buyer_id": buyer_id}, owner=buyer_id
+    )
+    if not created:
+        job_queue.wake(job_id)
+    return job_id
+
+def _retry_later(status, message, retry_after=None):
+    response = jsonify({"error": message})
+    response.status_code = status
+    if retry_after:
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def _unavailable(message, retry_after=None):
+    """503 for a dependency that is down or shedding load; Retry-After when we know when to try again."""
+    return _retry_later(503, message, retry_after)
+
+def _throttled(message, retry_after):
+    """429 for a client that has to slow down."""
+    return _retry_later(429, message, retry_after)
+
+def _job_accepted(message, job_id, **extra):
+    body = {"message": message, "job_id": job_id, "status_url": url_for("api.get_job", job_id=job_id)}
+    body.update(extra)
+    return jsonify(body), 202
+
 # ------------------------------
 # Endpoint: POST /users/register
 # Create a new user in MongoDB with email, password, and optional school name.
 # If 'School' is missing, None, or an empty string, set it to 'public'.
 # Check if the user already exists before creating a new user.
 # ------------------------------
-@app.route('/users/register', methods=['POST'])
+@api.route('/users/register', methods=['POST'])
 def create_user():
-    data = request.get_json()
-    
-    required_fields = ["email", "password"]
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"error": f"Missing field: {field}"}), 400
+    try:
+        new_user = decode_body(request.get_data(), NewUser)
+    except RequestValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Add createdAt field
+    # Only the fields NewUser declares are stored; School defaults to 'public'
+    data = msgspec.to_builtins(new_user)
     data['createdAt'] = datetime.now()
 
-    school_value = data.get("School", "").strip()
-    if not school_value:  # i.e. school_value is "" or None
-        school_value = "public"
-    data["School"] = school_value
-
     if users_collection.find_one({"email": data["email"]}):
         return jsonify({"error": "User already exists"}), 409
 
     # Hash the password before storing it
-    hashed_password = bcrypt.hashpw(data["password"].encode('utf-8'), bcrypt.gensalt())
-    data["password"] = hashed_password.decode('utf-8')  # Store as a string
+    try:
+        data["password"] = password_hasher.hash(data["password"])
+    except HasherBusyError as e:
+        return _unavailable("Too many sign-ups in progress; please try again shortly", e.retry_after)
 
-    result = users_collection.insert_one(data)
+    try:
+        result = users_collection.insert_one(data)
+    except DuplicateKeyError:
+        return jsonify({"error": "User already exists"}), 409
     
     return jsonify({
         "message": "User created successfully",
@@ -235,12 +556,22 @@ def create_user():
     }), 201
 
 
+def _rehash_password(user, password):
+    """Store a new hash of a just-verified password. Best effort: the login goes ahead either way."""
+    try:
+        new_hash = password_hasher.hash(password)
+    except HasherBusyError:
+        return  # try again on a later login
+    # Only replace the hash that was verified, in case the password changed meanwhile
+    users_collection.update_one({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}})
+
+
 # ------------------------------
 # Endpoint: POST, GET /users/login
 # Log in a user by email and password, or get the current user's session data.
 # once authenticated, store the user's ID in the Flask session.
 # ------------------------------
-@app.route('/users/login', methods=['POST', 'GET'])
+@api.route('/users/login', methods=['POST', 'GET'])
 def login():
     # Check if the user is already logged in
     if 'user_id' in session:
@@ -251,30 +582,41 @@ def login():
             "school": session.get("school")
         }), 200
 
-    # Proceed with login if no active session
-    data = request.get_json()
-    email = data.get("email")
-    password = data.get("password")
+    # Proceed with login if no active session; email and password must be non-empty strings
+    try:
+        credentials = decode_body(request.get_data(), LoginRequest)
+    except RequestValidationError as e:
+        return jsonify({"error": "Email and password are required", "details": str(e)}), 400
+    email, password = credentials.email, credentials.password
 
-    if not email or not password:
-        return jsonify({"error": "Email and password are required"}), 400
+    # Refuse IPs and accounts with too many recent failures before doing any bcrypt work
+    client_ip = request.remote_addr or ""
+    retry_after = login_throttle.retry_after(client_ip, email)
+    if retry_after:
+        return _throttled("Too many failed login attempts; please try again later", retry_after)
 
     # Look up the user by email
     user = users_collection.find_one({"email": email})
     if not user:
+        login_throttle.failed(client_ip, email)
         return jsonify({"error": "Invalid email or password"}), 401
 
     # Verify the password
-    if not bcrypt.checkpw(password.encode('utf-8'), user["password"].encode('utf-8')):
+    try:
+        password_ok = password_hasher.verify(password, user["password"])
+    except HasherBusyError as e:
+        return _unavailable("Too many logins in progress; please try again shortly", e.retry_after)
+    if not password_ok:
+        login_throttle.failed(client_ip, email)
         return jsonify({"error": "Invalid email or password"}), 401
+    login_throttle.succeeded(email)
+
+    # Re-hash at the current BCRYPT_ROUNDS if the stored hash used another cost
+    if password_hasher.needs_rehash(user["password"]):
+        _rehash_password(user, password)
 
     # Clear any existing sessions for this user
-    cursor = 0
-    keys = r.scan(cursor=cursor, match="session:*")
-    for key in keys[1]:
-        session_data = r.get(key)
-        if email in session_data:
-            r.delete(key)
+    delete_user_sessions(current_app.session_interface.client, str(user["_id"]))
 
     # Create a new session
     session['user_id'] = str(user["_id"])
@@ -290,7 +632,7 @@ def login():
 # Endpoint: POST /logout
 # Clear the session data to log out the user.
 # ------------------------------
-@app.route('/logout', methods=['POST'])
+@api.route('/logout', methods=['POST'])
 def logout():
     session.clear()
     return jsonify({"message": "Logged out successfully"}), 200
@@ -300,7 +642,7 @@ def logout():
 # Endpoint: GET /users/me
 # Get the current user's session data, if logged in.
 # ------------------------------
-@app.route('/users/me', methods=['GET'])
+@api.route('/users/me', methods=['GET'])
 def get_current_user():
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
@@ -318,7 +660,7 @@ def get_current_user():
 # Return the user's profile from MongoDB, 
 # verifying that the user_id in the URL matches the session user.
 # ------------------------------
-@app.route('/users/<string:user_id>/profile', methods=['GET'])
+@api.route('/users/<string:user_id>/profile', methods=['GET'])
 def get_profile(user_id):
     if 'user_id' not in session:
         return jsonify({"error": "No session found"}), 401
@@ -327,30 +669,27 @@ def get_profile(user_id):
 
     # If the URL user_id == session user, return the full profile
     if session_user_id == user_id:
-        user_doc = users_collection.find_one({"_id": ObjectId(session_user_id)})
+        user_doc = users_collection.find_one({"_id": ObjectId(session_user_id)}, projection(UserProfile))
         if not user_doc:
             return jsonify({"error": "User not found"}), 404
 
-        user_doc['_id'] = str(user_doc['_id'])
-        user_doc.pop('password', None)
-        return jsonify({"profile": user_doc}), 200
+        return json_response({"profile": from_doc(user_doc, UserProfile)})
 
     else:
         # If the URL user_id != session user, return only email
-        user_doc = users_collection.find_one({"_id": ObjectId(user_id)})
+        user_doc = users_collection.find_one({"_id": ObjectId(user_id)}, projection(PublicProfile))
         if not user_doc:
             return jsonify({"error": "User not found"}), 404
 
         # Return only the user’s email
-        limited_profile = {"email": user_doc.get("email", None)}
-        return jsonify({"profile": limited_profile}), 200
+        return json_response({"profile": from_doc(user_doc, PublicProfile)})
 
 
 # ------------------------------
 # Endpoint: PUT /users/<string:user_id>/profile
 # Update user fields in their MongoDB profile, e.g. phone, school_name, etc.
 # ------------------------------
-@app.route('/users/<string:user_id>/profile', methods=['PUT'])
+@api.route('/users/<string:user_id>/profile', methods=['PUT'])
 def update_profile(user_id):
     data = request.get_json()
     # Accept any fields that are safe to update. For example:
@@ -381,7 +720,7 @@ def update_profile(user_id):
 # This example assumes the third-party account has a username and password.
 # This example also assumes the third-party account has an ID that we need to store.
 # ------------------------------
-@app.route('/users/<string:user_id>/third_party', methods=['POST'])
+@api.route('/users/<string:user_id>/third_party', methods=['POST'])
 def connect_third_party_account(user_id):
     # 1) Confirm session user matches the user_id
     if 'user_id' not in session or session['user_id'] != user_id:
@@ -394,38 +733,24 @@ def connect_third_party_account(user_id):
         if field not in data:
             return jsonify({"error": f"Missing field: {field}"}), 400
 
-    # 2) Get a mock token
-    mock_token = get_mock_token()
-
-    # 3) Build your GET request
-    params = {
-        'userName': data['userName']
-    }
-    headers = {
-        'Authorization': f'Bearer {mock_token}',
-        'PAC-Application-ID': 'application.id',
-        'PAC-API-Key': 'applicmock.api.key',
-        'PAC-Channel-Code': 'mock.channel.code',
-        'PAC-Organization-ID': 'OrganizationID',
-        'User-Agent': 'StudentSection/v1.0',
-        'Accept': 'application/json'
-    }
-    if mock_token:
-        headers['Authorization'] = f'Bearer {mock_token}'
-
-    # 4) Make the request to the mock route
-    response = requests.get("http://localhost:3003/v2/accounts", params=params, headers=headers)
+    # 2) Look up the account through the shared Paciolan client
+    try:
+        response = paciolan.get_account(data['userName'])
+    except PaciolanUnavailableError as e:
+        return _unavailable("Paciolan is unavailable, try again later", e.retry_after)
+    except PaciolanError:
+        return jsonify({"error": "Unable to retrieve mock token"}), 500
     if response.status_code != 200:
         return jsonify({"error": "Unable to retrieve account from mock."}), 502
 
     account_data = response.json()
 
-    # 5) Check if we got an account object. In your sample JSON, it's in .get("key", {}).get("id", ...)
+    # 3) Check if we got an account object. In your sample JSON, it's in .get("key", {}).get("id", ...)
     paciolan_id = account_data.get("key", {}).get("id")
     if not paciolan_id:
         return jsonify({"error": "No paciolan_id found in mock response."}), 404
 
-    # 6) Store the third-party account details in MongoDB
+    # 4) Store the third-party account details in MongoDB
     #    e.g. "third_party_account": { "paciolan_id": paciolan_id, "userName": data["userName"] }
     users_collection.update_one(
         {"_id": ObjectId(user_id)},
@@ -447,7 +772,7 @@ def connect_third_party_account(user_id):
 # Endpoint: POST /users/stripe_account_session
 # Create a Stripe Connect account session for the user.
 # ------------------------------
-@app.route('/users/stripe_account_session', methods=['POST'])
+@api.route('/users/stripe_account_session', methods=['POST'])
 def create_account_session():
     try:
         connected_account_id = request.get_json().get('account')
@@ -471,7 +796,7 @@ def create_account_session():
 # Endpoint: POST /users/stripe_account
 # Create (or reuse) a Stripe Connect account for the user.
 # ------------------------------
-@app.route('/users/stripe_account', methods=['POST'])
+@api.route('/users/stripe_account', methods=['POST'])
 def create_account():
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 403
@@ -539,7 +864,7 @@ def create_account():
         }), 200
 
     except Exception as e:
-        app.logger.error("Stripe account creation/lookup failed: %s", e)
+        current_app.logger.error("Stripe account creation/lookup failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -549,32 +874,22 @@ def create_account():
 # confirm the requested event truly exists in the mock Paciolan system, and only then create
 # the ticket doc with proper 'transfer' info.
 # ------------------------------
-@app.route('/tickets', methods=['POST'])
+@api.route('/tickets', methods=['POST'])
 def post_ticket():
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
     user_doc = users_collection.find_one({"_id": ObjectId(user_id)})
-    data = request.get_json() or {}
-
-    # Basic validation for UC tickets
-    required_fields = ['event_name', 'event_date', 'venue', 'price']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"error": f"Missing field: {field}"}), 400
 
+    # Validate the UC ticket; price is stored as a number so listings can be filtered by price range
     try:
-        event_date_dt = datetime.fromisoformat(data['event_date'])
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid event_date format; must be ISO-8601"}), 400
-
-    school_name = (data.get("school_name") or "").strip()
-    if not school_name:
-        school_name = "public"
+        data = decode_body(request.get_data(), NewTicket)
+    except RequestValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
     # This endpoint only handles University of Cincinnati tickets.
-    if school_name.lower() != "university of cincinnati":
+    if data.school_name.lower() != "university of cincinnati":
         return jsonify({
             "error": "This endpoint is only for University of Cincinnati events. For public events, please use the /Attend endpoint."
         }), 400
@@ -582,7 +897,7 @@ def post_ticket():
     # Check if a ticket already exists for this seller and event.
     existing_ticket = tickets_collection.find_one({
         "seller_id": ObjectId(user_id),
-        "event_name": data["event_name"]
+        "event_name": data.event_name
     })
     if existing_ticket:
         return jsonify({"error": "Ticket for this event has already been posted by this user"}), 409
@@ -592,17 +907,24 @@ def post_ticket():
     if not paciolan_id:
         return jsonify({"error": "User does not have a linked UC account"}), 400
 
-    token = get_mock_token()
-    if not token:
+    try:
+        matched_event = fuzzy_match_event(
+            frontend_name=data.event_name,
+            frontend_venue=data.venue,
+            frontend_datetime=data.event_date,
+            paciolan_id=paciolan_id,
+            client=paciolan,
+            orders_cache=orders_cache,
+            token_set=FUZZY_TOKEN_SET_NAMES
+        )
+    except PaciolanUnavailableError as e:
+        return _unavailable("Paciolan is unavailable, try again later", e.retry_after)
+    except PaciolanError:
         return jsonify({"error": "Unable to retrieve mock token"}), 500
-
-    matched_event = fuzzy_match_event(
-        frontend_name=data["event_name"],
-        frontend_venue=data["venue"],
-        frontend_datetime=data["event_date"],
-        paciolan_id=paciolan_id,
-        token=f"Bearer {token}"
-    )
+    except OrdersFetchError as e:
+        if e.status_code == 404:
+            return jsonify({"error": f"No tickets found for paciolan_id={paciolan_id}, season={SEASON_CODE}"}), 404
+        return jsonify({"error": f"Mock API error: {e.status_code}"}), 502
     if not matched_event:
         return jsonify({"error": "Unable to find Paciolan event that matches those details"}), 404
 
@@ -618,12 +940,12 @@ def post_ticket():
 
     ticket_doc = {
         "seller_id": ObjectId(user_id),
-        "school_name": school_name,
-        "event_name": data["event_name"],
-        "event_date": event_date_dt,
-        "venue": data["venue"],
-        "price": data["price"],
-        "currency": data.get("currency", "USD"),
+        "school_name": data.school_name,
+        "event_name": data.event_name,
+        "event_date": data.event_datetime,
+        "venue": data.venue,
+        "price": data.price,
+        "currency": data.currency,
         "status": "available",
         "is_transferrable": True,
         "created_at": datetime.utcnow(),
@@ -639,7 +961,10 @@ def post_ticket():
         }
     }
 
-    result = tickets_collection.insert_one(ticket_doc)
+    try:
+        result = tickets_collection.insert_one(ticket_doc)
+    except DuplicateKeyError:
+        return jsonify({"error": "Ticket for this event has already been posted by this user"}), 409
     return jsonify({
         "message": "Ticket created successfully",
         "ticket_id": str(result.inserted_id),
@@ -650,51 +975,44 @@ def post_ticket():
 # Endpoint: POST /Attend
 # Create a new attendance record for a user.
 # ------------------------------
-@app.route('/Attend', methods=['POST'])
+@api.route('/Attend', methods=['POST'])
 def create_attendance():
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
-    data = request.get_json() or {}
 
     # Basic validation for attendance/public events.
-    required_fields = ['event_name', 'event_date', 'venue']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"error": f"Missing field: {field}"}), 400
-
     try:
-        event_date_dt = datetime.fromisoformat(data['event_date'])
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid event_date format; must be ISO-8601"}), 400
-
-    school_name = (data.get("school_name") or "").strip()
-    if not school_name:
-        school_name = "public"
+        data = decode_body(request.get_data(), NewAttendance)
+    except RequestValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
     # This endpoint only handles public events.
-    if school_name.lower() != "public":
+    if data.school_name.lower() != "public":
         return jsonify({"error": "This endpoint only handles public events"}), 400
 
     # Check if an attendance record already exists for this attendee and event.
     existing_attendance = tickets_collection.find_one({
         "attendee_id": ObjectId(user_id),
-        "event_name": data["event_name"]
+        "event_name": data.event_name
     })
     if existing_attendance:
         return jsonify({"error": "Attendance for this event has already been recorded for this user"}), 409
 
     attendance_doc = {
         "attendee_id": ObjectId(user_id),
-        "school_name": school_name,
-        "event_name": data["event_name"],
-        "event_date": event_date_dt,
-        "venue": data["venue"],
+        "school_name": data.school_name,
+        "event_name": data.event_name,
+        "event_date": data.event_datetime,
+        "venue": data.venue,
         "created_at": datetime.utcnow()
     }
 
-    result = tickets_collection.insert_one(attendance_doc)
+    try:
+        result = tickets_collection.insert_one(attendance_doc)
+    except DuplicateKeyError:
+        return jsonify({"error": "Attendance for this event has already been recorded for this user"}), 409
     return jsonify({
         "message": "Attendance record created successfully",
         "attendance_id": str(result.inserted_id)
@@ -705,32 +1023,21 @@ def create_attendance():
 # Endpoint: GET /attendance
 # List all attendance records for the logged-in user.
 # ------------------------------
-@app.route('/attendance', methods=['GET'])
+@api.route('/attendance', methods=['GET'])
 def get_attendance():
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
-    attendance_cursor = tickets_collection.find({"attendee_id": ObjectId(user_id)})
-
-    # Convert the cursor into a list of dictionaries we can JSON-ify
-    attendance_records = []
-    for doc in attendance_cursor:
-        doc['_id'] = str(doc['_id'])
-        doc['attendee_id'] = str(doc['attendee_id'])
-        # Convert datetime fields to ISO strings
-        if 'created_at' in doc and isinstance(doc['created_at'], datetime):
-            doc['created_at'] = doc['created_at'].isoformat()
-        attendance_records.append(doc)
-
-    return jsonify({"attendance": attendance_records}), 200
+    attendance_cursor = tickets_collection.find({"attendee_id": ObjectId(user_id)}, projection(Attendance))
+    return json_response({"attendance": from_docs(attendance_cursor, Attendance)})
 
 
 # ------------------------------
 # Endpoint: GET /tickets/mine
 # List all tickets owned by the logged-in user.
 # ------------------------------
-@app.route('/tickets/mine', methods=['GET'])
+@api.route('/tickets/mine', methods=['GET'])
 def get_my_tickets():
     """
     Returns a list of the logged-in user's tickets from MongoDB.
@@ -746,51 +1053,44 @@ def get_my_tickets():
             {"seller_id": ObjectId(user_id)},
             {"buyer_id": ObjectId(user_id)}
         ]
-    })
-
-    # Convert the cursor into a list of dictionaries we can JSON-ify
-    user_tickets = []
-    for doc in tickets_cursor:
-        doc['_id'] = str(doc['_id'])
-        doc['seller_id'] = str(doc['seller_id'])
-        if 'buyer_id' in doc:
-            doc['buyer_id'] = str(doc['buyer_id'])
-        # Convert datetime fields to ISO strings
-        if 'created_at' in doc and isinstance(doc['created_at'], datetime):
-            doc['created_at'] = doc['created_at'].isoformat()
-        if 'event_date' in doc and isinstance(doc['event_date'], datetime):
-            doc['event_date'] = doc['event_date'].isoformat()
-        user_tickets.append(doc)
+    }, projection(Ticket))
 
-    return jsonify({"tickets": user_tickets}), 200
+    return json_response({"tickets": from_docs(tickets_cursor, Ticket)})
 
 
 # ------------------------------
 # Endpoint: GET /tickets
-# List all available ticket listings (public endpoint)
+# List available ticket listings (public endpoint), one page at a time.
+# Optional filters: school, event, event_code, date_from, date_to, price_min, price_max.
+# Pages are ordered by (event_date, _id); pass the returned "next" value as ?cursor= to continue.
 # ------------------------------
-@app.route('/tickets', methods=['GET'])
+@api.route('/tickets', methods=['GET'])
 def list_tickets():
-    tickets_cursor = tickets_collection.find({"status": "available"})
-    tickets = []
-    for t in tickets_cursor:
-        ticket = {
-            "ticket_id": str(t["_id"]),
-            "seller_id": str(t["seller_id"]),
-            "school_name": t.get("school_name", ""),
-            "event_code": t.get("event_code", ""),
-            "event_name": t.get("event_name", ""),
-            "event_date": t["event_date"].isoformat() if "event_date" in t else "",
-            "venue": t.get("venue", ""),
-            "section": t.get("section", ""),
-            "row": t.get("row", ""),
-            "seat": t.get("seat", ""),
-            "level": t.get("level", ""),
-            "price": t.get("price", 0),
-            "currency": t.get("currency", "USD")
-        }
-        tickets.append(ticket)
-    return jsonify({"tickets": tickets}), 200
+    try:
+        params = parse_listing_args(request.args)
+    except ListingQueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+    limit = params["limit"]
+    page = listing_view.query(params) if listing_view is not None else None
+    if page is not None:
+        tickets, has_more = page
+    else:
+        # The view is disabled, still seeding or lagging; read this page from Mongo
+        tickets_cursor = (
+            tickets_collection.find(build_listing_query(params), LISTING_PROJECTION)
+            .sort(LISTING_SORT)
+            .limit(limit + 1)
+        )
+        tickets = [serialize_listing(t) for t in tickets_cursor]
+        has_more = len(tickets) > limit
+        tickets = tickets[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = tickets[-1]
+        next_cursor = encode_cursor(last.event_date, last.ticket_id)
+    return json_response({"tickets": tickets, "next": next_cursor})
 
 
 # ------------------------------
@@ -798,75 +1098,44 @@ def list_tickets():
 # Initiate a ticket purchase: mark as pending and start transfer via Paciolan.
 # This endpoint is called when a buyer wants to purchase a ticket.
 # ------------------------------
-@app.route('/tickets/<ticket_id>/purchase', methods=['POST'])
+@api.route('/tickets/<ticket_id>/purchase', methods=['POST'])
 def purchase_ticket(ticket_id):
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     buyer_id = session['user_id']
-    # Fetch the ticket from the database
-    ticket = tickets_collection.find_one({"_id": ObjectId(ticket_id)})
-    if not ticket:
-        return jsonify({"error": "Ticket not found"}), 404
-    if ticket.get("status") != "available":
-        return jsonify({"error": "Ticket is not available"}), 400
-    if str(ticket.get("seller_id")) == buyer_id:
-        return jsonify({"error": "Cannot purchase your own ticket"}), 400
-
-    # Mark the ticket as pending (to lock it for this buyer)
-    result = tickets_collection.update_one(
-        {"_id": ObjectId(ticket_id), "status": "available"},
-        {"$set": {"status": "pending", "buyer_id": ObjectId(buyer_id)}}
-    )
-    if result.modified_count != 1:
-        # If the ticket status was not updated, it may have been taken by someone else
-        return jsonify({"error": "Ticket purchase could not be initiated; ticket may have been updated"}), 409
-
-    # Prepare buyer details for the ticket transfer (use real user info if available)
-    buyer_doc = users_collection.find_one({"_id": ObjectId(buyer_id)}) or {}
-    buyer_info = {
-        "email": buyer_doc.get("email", ""), 
-        "first_name": buyer_doc.get("first_name", "BuyerFirstName"),
-        "last_name":  buyer_doc.get("last_name", "BuyerLastName"),
-        "phone":      buyer_doc.get("phone") if buyer_doc.get("phone") else None
-    }
-
-    # Call the Paciolan API to initiate the ticket transfer
-    success, transfer_id, transfer_url, confirmationCd = transfer_ticket_initialize(ticket, buyer_info)
-    if not success or not transfer_id or not transfer_url or not confirmationCd:
-        return jsonify({"error": "Ticket transfer initialization failed"}), 500
-
-    # Store transfer details in the ticket document for later confirmation
-    tickets_collection.update_one(
-        {"_id": ObjectId(ticket_id)},
-        {"$set": {
-            "transfer.transferId": transfer_id,
-            "transfer.url": transfer_url,
-            "transfer.confirmationCd": confirmationCd
-        }}
+    # Mark the ticket as pending (to lock it for this buyer until the hold expires).
+    # Availability and seller != buyer are checked in the same write.
+    hold_expires_at = holds.new_deadline()
+    try:
+        hold_ticket(tickets_collection, ticket_id, buyer_id, hold_expires_at)
+    except TicketStateError as e:
+        return jsonify({"error": e.message}), e.status_code
+    holds.created(ticket_id, hold_expires_at)
+
+    # Start the Paciolan transfer in the background; the job's result carries the transferUrl
+    job_id, _ = job_queue.enqueue(
+        "transfer.initialize", f"{ticket_id}:{buyer_id}", {"ticket_id": ticket_id, "buyer_id": buyer_id}, owner=buyer_id
     )
-    return jsonify({"message": "Ticket purchase initiated", "transferUrl": transfer_url}), 200
+    return _job_accepted("Ticket purchase initiated", job_id, holdExpiresAt=hold_expires_at.isoformat() + "Z")
 
 
 # ------------------------------
 # Endpoint: POST /tickets/<ticket_id>/purchase/intent
 # Creates a Stripe PaymentIntent for the given ticket and prepares the transaction.
 # ------------------------------
-@app.route('/tickets/<ticket_id>/purchase/intent', methods=['POST'])
+@api.route('/tickets/<ticket_id>/purchase/intent', methods=['POST'])
 def ticket_purchase_intent(ticket_id):
     """Create a Stripe PaymentIntent for the pending ticket purchase."""
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
-    ticket = tickets_collection.find_one({"_id": ObjectId(ticket_id)})
-    if not ticket:
-        return jsonify({"error": "Ticket not found"}), 404
-    if ticket.get("status") != "pending":
-        return jsonify({"error": "Ticket is not pending"}), 400
     # Only the buyer who initiated the purchase can create the PaymentIntent
-    if str(ticket.get("buyer_id")) != user_id:
-        return jsonify({"error": "Ticket is pending for a different user"}), 403
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, user_id)
+    except TicketStateError as e:
+        return jsonify({"error": e.message}), e.status_code
 
     # Calculate the amount in cents from the ticket price
     try:
@@ -888,28 +1157,32 @@ def ticket_purchase_intent(ticket_id):
                 "seller_id": str(ticket["seller_id"])
             }
         )
+    except stripe.APIConnectionError:
+        # Timed out, unreachable, or failing fast while the circuit is open; the ticket stays pending
+        return _unavailable("Payment provider is unavailable, try again later")
     except Exception as e:
         # **Removed automatic ticket release on Stripe error to allow retry attempts**
         # If the Stripe API call fails, keep the ticket in pending state and return an error.
         return jsonify({"error": "Failed to create payment intent", "details": str(e)}), 500
 
-    # Store PaymentIntent details in the ticket document (for reference/auditing)
-    tickets_collection.update_one(
-        {"_id": ObjectId(ticket_id)},
-        {"$set": {
-            "transaction_id": intent.id,
-            "payment_status": intent.status,        # e.g. "requires_payment_method"
-            "payment_timestamp": datetime.utcnow()  # record when payment was initiated
-        }}
-    )
-    return jsonify({"client_secret": intent.client_secret}), 200
+    # Store PaymentIntent details in the ticket document (for reference/auditing).
+    # Starting payment restarts the hold so the buyer isn't released mid-checkout.
+    hold_expires_at = holds.new_deadline()
+    try:
+        # payment_status is e.g. "requires_payment_method"
+        record_payment(tickets_collection, ticket_id, user_id, intent.id, intent.status, hold_expires_at)
+    except TicketStateError as e:
+        # The hold expired (or was canceled) while the PaymentIntent was being created
+        return jsonify({"error": e.message}), e.status_code
+    holds.extended(ticket_id, hold_expires_at)
+    return jsonify({"client_secret": intent.client_secret, "holdExpiresAt": hold_expires_at.isoformat() + "Z"}), 200
 
 
 # ------------------------------
 # Endpoint: DELETE /tickets/<ticket_id>/purchase
 # Cancel a pending ticket purchase and revert the ticket status to available.
 # ------------------------------
-@app.route('/tickets/<ticket_id>/purchase', methods=['DELETE'])
+@api.route('/tickets/<ticket_id>/purchase', methods=['DELETE'])
 def cancel_ticket_purchase(ticket_id):
     """Cancel a pending ticket purchase and release the ticket back to available."""
     # Ensure the user is authenticated
@@ -917,95 +1190,87 @@ def cancel_ticket_purchase(ticket_id):
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
-    ticket = tickets_collection.find_one({"_id": ObjectId(ticket_id)})
-    if not ticket:
-        return jsonify({"error": "Ticket not found"}), 404
-    # Ticket must be in pending status to be canceled
-    if ticket.get("status") != "pending":
-        return jsonify({"error": "Ticket is not pending"}), 400
-    # Only the user who reserved the ticket can cancel this purchase
-    if str(ticket.get("buyer_id")) != user_id:
-        return jsonify({"error": "Ticket is pending for a different user"}), 403
-
-    # Cancel the ticket transfer via the mock Paciolan API
-    confirmation_code = ticket.get("transfer", {}).get("confirmationCd")
-    if not confirmation_code:
-        return jsonify({"error": "No transfer information found for this ticket"}), 400
-    success = transfer_ticket_cancel(confirmation_code)
-    if not success:
-        return jsonify({"error": "Ticket transfer cancellation failed"}), 500
+    # Ticket must be pending, and only the user who reserved it can cancel this purchase
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, user_id)
+    except TicketStateError as e:
+        return jsonify({"error": e.message}), e.status_code
 
-    # Revert the ticket status to available and clear buyer/transfer fields
-    result = tickets_collection.update_one(
-        {"_id": ObjectId(ticket_id), "status": "pending"},
-        {"$set": {"status": "available"}, 
-         "$unset": {
-             "buyer_id": "",
-             "transfer.transferId": "",
-             "transfer.url": "",
-             "transfer.confirmationCd": ""
-         }}
+    confirmation_code = ticket.get("transfer", {}).get("confirmationCd")
+    initializing = job_queue.active_job("transfer.initialize", f"{ticket_id}:{user_id}")
+    if not confirmation_code and not initializing:
+        # No transfer was ever started (or starting it gave up), so there is nothing to
+        # cancel in Paciolan: revert the ticket now (409 if it changed meanwhile)
+        try:
+            release_ticket(tickets_collection, ticket_id, user_id)
+        except TicketStateError as e:
+            return jsonify({"error": e.message}), e.status_code
+        holds.canceled(ticket_id)
+        return jsonify({"message": "Ticket purchase canceled"}), 200
+
+    # Cancel the ticket transfer via the mock Paciolan API in the background, then release the ticket
+    job_id, _ = job_queue.enqueue(
+        "transfer.cancel", f"{ticket_id}:{user_id}", {"ticket_id": ticket_id, "buyer_id": user_id}, owner=user_id
     )
-    if result.modified_count != 1:
-        # If the document was not updated, it may have been changed (e.g., purchase finalized concurrently)
-        return jsonify({"error": "Ticket purchase cancellation could not be finalized; ticket may have been updated"}), 409
-
-    return jsonify({"message": "Ticket purchase canceled"}), 200
+    return _job_accepted("Ticket purchase cancellation started", job_id)
 
 
 # ------------------------------
 # Endpoint: POST /tickets/<ticket_id>/purchase/confirm
 # Confirm a ticket purchase by accepting the transfer via the mock Paciolan API.
 # ------------------------------
-@app.route('/tickets/<ticket_id>/purchase/confirm', methods=['POST'])
+@api.route('/tickets/<ticket_id>/purchase/confirm', methods=['POST'])
 def confirm_ticket_purchase(ticket_id):
     """Finalize the purchase: verify payment and accept the ticket transfer."""
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
 
     user_id = session['user_id']
-    ticket = tickets_collection.find_one({"_id": ObjectId(ticket_id)})
-    if not ticket:
-        return jsonify({"error": "Ticket not found"}), 404
-    if ticket.get("status") != "pending":
-        return jsonify({"error": "Ticket is not pending"}), 400
     # Only the buyer who reserved the ticket can confirm the purchase
-    if str(ticket.get("buyer_id")) != user_id:
-        return jsonify({"error": "Ticket is not pending for this user"}), 403
+    try:
+        ticket = get_pending(tickets_collection, ticket_id, user_id, wrong_buyer="Ticket is not pending for this user")
+    except TicketStateError as e:
+        return jsonify({"error": e.message}), e.status_code
 
-    # Verify the payment status with Stripe
     payment_intent_id = ticket.get("transaction_id")
     if not payment_intent_id:
         return jsonify({"error": "No payment transaction found for this ticket"}), 400
-    try:
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-    except Exception as e:
-        return jsonify({"error": "Unable to verify payment status", "details": str(e)}), 500
-
-    if payment_intent.status != 'succeeded':
-        # Payment not completed successfully
-        return jsonify({"error": "Payment has not been completed"}), 400
+    if STRIPE_WEBHOOK_SECRET:
+        # payment_status is kept current by /webhooks/stripe; the accept job waits for
+        # payment_intent.succeeded if it hasn't arrived yet
+        if ticket.get("payment_status") == "canceled":
+            return jsonify({"error": "Payment has not been completed"}), 400
+    else:
+        # Without webhooks, verify the payment status with Stripe
+        try:
+            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        except stripe.APIConnectionError:
+            return _unavailable("Payment provider is unavailable, try again later")
+        except Exception as e:
+            return jsonify({"error": "Unable to verify payment status", "details": str(e)}), 500
+
+        if payment_intent.status != 'succeeded':
+            # Payment not completed successfully
+            return jsonify({"error": "Payment has not been completed"}), 400
+        payment_buyer_id = payment_intent.metadata.get("buyer_id")
+        if payment_buyer_id != user_id:
+            return jsonify({"error": "Payment was not made by this user"}), 400
+        tickets_collection.update_one(
+            {"_id": ticket["_id"], "status": "pending", "transaction_id": payment_intent_id},
+            {"$set": {"payment_status": payment_intent.status, "payment_buyer_id": payment_buyer_id}}
+        )
 
-    # Payment succeeded – proceed to finalize the ticket transfer via Paciolan
-    transfer_info = ticket.get("transfer", {})
-    transfer_id = transfer_info.get("transferId")
-    if not transfer_id:
+    # Proceed to finalize the ticket transfer via Paciolan
+    transfer_id = ticket.get("transfer", {}).get("transferId")
+    if not transfer_id and not job_queue.active_job("transfer.initialize", f"{ticket_id}:{user_id}"):
         return jsonify({"error": "No transfer information found for this ticket"}), 400
 
-    success, confirmed_transfer_id, confirmation_code = transfer_ticket_accept(transfer_id)
-    if not success or not confirmation_code:
-        return jsonify({"error": "Ticket transfer confirmation failed"}), 500
-
-    # Mark the ticket as sold and record the transfer confirmation code
-    result = tickets_collection.update_one(
-        {"_id": ObjectId(ticket_id), "status": "pending"},
-        {"$set": {
-            "status": "sold",
-            "transfer.confirmationCd": confirmation_code
-        }}
-    )
-    if result.modified_count != 1:
-        return jsonify({"error": "Ticket purchase could not be finalized; ticket may have been updated"}), 409
+    # Accept the transfer and mark the ticket sold in the background; the job's result
+    # carries the confirmationCode
+    try:
+        job_id = _enqueue_transfer_accept(ticket_id, user_id)
+    except TicketStateError as e:
+        return jsonify({"error": e.message}), e.status_code
 
     # (Future improvement: If using Stripe Connect with seller accounts, initiate a Stripe Transfer here to the seller's account)
     # Example:
@@ -1016,7 +1281,66 @@ def confirm_ticket_purchase(ticket_id):
     #     source_transaction=payment_intent.charges.data[0].id
     # )
 
-    return jsonify({"message": "Ticket purchase confirmed", "confirmationCode": confirmation_code}), 200
+    return _job_accepted("Ticket purchase confirmation started", job_id)
+
+
+# ------------------------------
+# Endpoint: GET /jobs/<job_id>
+# Poll a background job started by one of the purchase endpoints.
+# status is queued, running, retrying, succeeded, failed or dead; result is set once it succeeds.
+# ------------------------------
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    job = job_queue.get(job_id)
+    # Jobs are only visible to the user who started them
+    if not job or job["owner"] != session['user_id']:
+        return jsonify({"error": "Job not found"}), 404
+    job.pop("owner")
+    return jsonify(job), 200
+
+
+# ------------------------------
+# Endpoint: POST /webhooks/stripe
+# Receives Stripe events (signed with STRIPE_WEBHOOK_SECRET). Each event is applied once, keyed by
+# its id. payment_intent.* events update the ticket's payment_status, and payment_intent.succeeded
+# starts finalizing the purchase without waiting for the buyer to call confirm.
+# ------------------------------
+@api.route('/webhooks/stripe', methods=['POST'])
+def stripe_webhook():
+    if not STRIPE_WEBHOOK_SECRET:
+        return jsonify({"error": "Stripe webhooks are not configured"}), 404
+
+    try:
+        event = verify_event(request.get_data(as_text=True), request.headers.get("Stripe-Signature"), STRIPE_WEBHOOK_SECRET)
+    except WebhookError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not record_event(stripe_events_collection, event):
+        return jsonify({"received": True, "duplicate": True}), 200
+
+    if event.get("type") not in PAYMENT_INTENT_EVENTS:
+        return jsonify({"received": True}), 200
+
+    try:
+        ticket = apply_payment_intent_event(tickets_collection, event)
+        if ticket and event["type"] == "payment_intent.succeeded" and ticket.get("status") == "pending":
+            ticket_id, buyer_id = str(ticket["_id"]), str(ticket["buyer_id"])
+            transfer_started = (ticket.get("transfer", {}).get("transferId")
+                                or job_queue.active_job("transfer.initialize", f"{ticket_id}:{buyer_id}"))
+            if transfer_started:
+                try:
+                    _enqueue_transfer_accept(ticket_id, buyer_id)
+                except TicketStateError as e:
+                    log_mongo_debug("ERROR", "Paid ticket could not be finalized", {"ticket_id": ticket_id, "error": e.message})
+    except Exception:
+        # Let Stripe retry the delivery
+        forget_event(stripe_events_collection, event["id"])
+        raise
+
+    return jsonify({"received": True}), 200
 
 
 # ------------------------------
@@ -1025,7 +1349,7 @@ def confirm_ticket_purchase(ticket_id):
 # Ensures that year and event_type are present; school_name is now optional (Defaults to "Public").
 # Only an admin user can upload schedules. The schedule is also associated with the user_id from the session.
 # ------------------------------
-@app.route('/schedule/upload', methods=['POST'])
+@api.route('/schedule/upload', methods=['POST'])
 def upload_schedule():
     # Ensure user is authenticated and has admin role
     if 'user_id' not in session:
@@ -1037,8 +1361,10 @@ def upload_schedule():
         extra={"method": request.method, "has_file": 'file' in request.files}
     )
 
-    data = request.get_json()
+    # File uploads arrive as multipart form data, not JSON
+    data = request.get_json(silent=True) or {}
     schedule_data = None
+    source_page = None
 
     try:
         # 1) Check for file upload
@@ -1053,8 +1379,16 @@ def upload_schedule():
                 return jsonify({"error": "No file selected"}), 400
 
             if file and file.filename.endswith('.html'):
-                html_content = file.read().decode('utf-8')
-                schedule_data = parse_html_schedule(html_content)
+                # Parsed as it is read; uploads over SCHEDULE_MAX_BYTES are rejected
+                try:
+                    schedule_data = parse_schedule_stream(file.stream)
+                except ScheduleTooLargeError as e:
+                    log_mongo_debug(
+                        level="ERROR",
+                        message="Uploaded schedule too large",
+                        extra={"filename": file.filename}
+                    )
+                    return jsonify({"error": str(e)}), 413
                 log_mongo_debug(
                     level="DEBUG",
                     message="Parsed HTML schedule from uploaded file",
@@ -1071,18 +1405,17 @@ def upload_schedule():
         # 2) Check for URL
         elif 'url' in data:
             schedule_url = data['url']
-            headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(schedule_url, headers=headers)
-            if response.status_code != 200:
+            try:
+                source_page = fetch_schedule_page(schedule_url)
+            except ScheduleFetchError as e:
                 log_mongo_debug(
                     level="ERROR",
                     message="Failed to fetch schedule from URL",
-                    extra={"url": schedule_url, "status_code": response.status_code}
+                    extra={"url": schedule_url, "status_code": e.status_code, "error": str(e)}
                 )
                 return jsonify({"error": "Failed to fetch schedule from URL"}), 400
 
-            html_content = response.text
-            schedule_data = parse_html_schedule(html_content)
+            schedule_data = parse_html_schedule(source_page.html)
             log_mongo_debug(
                 level="DEBUG",
                 message="Parsed HTML schedule from URL",
@@ -1109,83 +1442,27 @@ def upload_schedule():
             )
             return jsonify({"error": "Failed to parse or retrieve schedule"}), 400
 
-        # Extract top-level fields
-        school_name = schedule_data.get("school_name", "")  # Now optional
-        year = schedule_data.get("year", "")
-        event_type = schedule_data.get("event_type")
-
-        # If event_type wasn't found, maybe it's in the first game's data
-        if not event_type and schedule_data.get("games"):
-            event_type = schedule_data["games"][0].get("event_type", "")
-
-        # Check for missing required fields (remove school_name from this check)
-        missing_fields = []
-        if not year:
-            missing_fields.append("year")
-        if not event_type:
-            missing_fields.append("event_type")
-
-        if missing_fields:
+        try:
+            prepare_schedule(schedule_data, session["user_id"])
+        except ScheduleValidationError as e:
             log_mongo_debug(
                 level="INFO",
-                message="Missing required fields for schedule",
-                extra={"missing_fields": missing_fields}
+                message=str(e),
+                extra={k: v for k, v in e.payload.items() if k != "schedule_data"}
             )
-            return jsonify({
-                "error": "Missing required fields",
-                "missing_fields": missing_fields,
-                "schedule_data": schedule_data
-            }), 400
-
-        # Store event_type at the schedule level
-        schedule_data["event_type"] = event_type
-
-        # Associate the schedule with the current user
-        schedule_data["user_id"] = session["user_id"]
-
-        # Date parsing logic (still uses year)
-        current_year = int(year)
-        previous_dt = None
-
-        for game in schedule_data.get("games", []):
-            raw_date = game.get("date", "")
-            if raw_date:
-                # Remove any day-of-week info, e.g. "(Fri)"
-                clean_date = re.sub(r'\s*\(.*\)', '', raw_date).strip()
-                try:
-                    dt = datetime.strptime(f"{clean_date} {current_year}", "%b %d %Y")
-                    # If this date’s month is less than a previous date’s month, assume rollover to next year
-                    if previous_dt and dt.month < previous_dt.month:
-                        current_year += 1
-                        dt = datetime.strptime(f"{clean_date} {current_year}", "%b %d %Y")
-                except Exception as e:
-                    log_mongo_debug(
-                        level="ERROR",
-                        message="Failed to parse game date",
-                        extra={"raw_date": raw_date, "error": str(e)}
-                    )
-                    return jsonify({"error": f"Failed to parse game date '{raw_date}': {str(e)}"}), 400
-
-                game["date"] = dt.strftime("%m/%d/%Y")
-                previous_dt = dt
+            return jsonify(e.payload), 400
 
-            # Remove event_type from individual games
-            if "event_type" in game:
-                game.pop("event_type")
+        # Schedules registered by URL are kept current by `flask --app app refresh-schedules`
+        if source_page is not None:
+            attach_source(schedule_data, source_page)
 
-        schedule_data["last_updated"] = datetime.utcnow()
-
-        # Upsert logic: Check if an existing schedule with the same (school_name, event_type) pair exists
-        # (If school_name is blank, that’s okay; it just means they’re “public” or unknown school events.)
-        existing_schedule = schedules_collection.find_one(
-            {"school_name": school_name, "event_type": event_type}
-        )
+        school_name = schedule_data.get("school_name", "")
+        event_type = schedule_data["event_type"]
 
-        if existing_schedule:
-            schedules_collection.update_one(
-                {"school_name": school_name, "event_type": event_type},
-                {"$set": schedule_data}
-            )
+        # Upsert on the (school_name, event_type) pair
+        created = upsert_schedule(schedules_collection, schedule_data)
+        schedule_cache.invalidate(school_name)
+        if not created:
             log_mongo_debug(
                 level="INFO",
                 message="Schedule updated successfully in MongoDB",
@@ -1193,7 +1470,6 @@ def upload_schedule():
             )
             return jsonify({"message": "Schedule updated successfully"}), 200
         else:
-            schedules_collection.insert_one(schedule_data)
             log_mongo_debug(
                 level="INFO",
                 message="Schedule uploaded successfully into MongoDB",
@@ -1210,52 +1486,109 @@ def upload_schedule():
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 
+# ------------------------------
+# Endpoint: POST /schedule/bulk
+# Ingest many schedules in one request: JSON {"sources": [{"url": ...} | {"custom_schedule": "<html>"}, ...]}
+# or multipart form data with several "file" parts (and optional "url" fields).
+# URLs are fetched concurrently, pages are parsed in a process pool, and every valid schedule
+# is upserted in one bulk write. Returns a per-source report.
+# ------------------------------
+@api.route('/schedule/bulk', methods=['POST'])
+def bulk_upload_schedules():
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    sources = []
+    try:
+        if request.files:
+            for file in request.files.getlist('file'):
+                if not file.filename.endswith('.html'):
+                    return jsonify({"error": f"Invalid file type for {file.filename}. Only .html files are allowed"}), 400
+                raw = file.stream.read(SCHEDULE_MAX_BYTES + 1)
+                if len(raw) > SCHEDULE_MAX_BYTES:
+                    return jsonify({"error": f"{file.filename} exceeds the {SCHEDULE_MAX_BYTES} byte limit"}), 413
+                sources.append(ScheduleSource(file.filename, html=raw.decode('utf-8')))
+            sources.extend(ScheduleSource(url, url=url) for url in request.form.getlist('url') if url)
+        else:
+            data = request.get_json(silent=True) or {}
+            sources = sources_from_json(data.get("sources"))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not sources:
+        return jsonify({"error": "No schedule sources provided"}), 400
+    if len(sources) > SCHEDULE_BULK_MAX_SOURCES:
+        return jsonify({"error": f"At most {SCHEDULE_BULK_MAX_SOURCES} sources per request"}), 400
+
+    results = ingest_schedules(sources, schedules_collection, session["user_id"])
+    for school_name in {r["school_name"] for r in results if r["status"] in ("created", "updated")}:
+        schedule_cache.invalidate(school_name)
+
+    written = sum(1 for r in results if r["status"] in ("created", "updated"))
+    failed = sum(1 for r in results if r["status"] == "error")
+    log_mongo_debug(
+        level="INFO" if not failed else "ERROR",
+        message="Bulk schedule ingestion finished",
+        extra={"sources": len(sources), "written": written, "failed": failed}
+    )
+    return jsonify({"results": results, "written": written, "failed": failed}), 200
+
+
+def _allowed_schools():
+    """Schedules are visible for "public" plus the logged-in user's school, if any."""
+    user_school = session.get("school")
+    allowed_schools = ["public"]
+    if user_school and user_school.lower() != "public":
+        allowed_schools.append(user_school)
+    return allowed_schools
+
+
+def _schedule_response(body, status):
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
 # ------------------------------
 # Endpoint: GET /schedule/all
 # Retrieve all schedules grouped by school, returning "public" schedules for everyone,
 # and also the user's school (if logged in).
+# Responses are cached in Redis until one of the included schools uploads a new schedule.
 # ------------------------------
-@app.route('/schedule/all', methods=['GET'])
+@api.route('/schedule/all', methods=['GET'])
 def retrieve_all_schedules():
     try:
-        # If the user is logged in, session['school'] is set
-        user_school = session.get("school")
+        allowed_schools = _allowed_schools()
 
-        # By default, show only 'public' schedules
-        allowed_schools = ["public"]
-
-        # If user_school is set and not 'public', include it
-        if user_school and user_school.lower() != "public":
-            allowed_schools.append(user_school)
-
-        # 1) Create a match stage that includes only these schools
-        match_stage = {
-            "$match": {
-                "school_name": {"$in": allowed_schools}
+        def compute():
+            # 1) Create a match stage that includes only these schools
+            match_stage = {
+                "$match": {
+                    "school_name": {"$in": allowed_schools}
+                }
             }
-        }
 
-        # 2) Group by school_name
-        group_stage = {
-            "$group": {
-                "_id": "$school_name",
-                "events": {
-                    "$push": {
-                        "year": "$year",
-                        "event_type": "$event_type",
-                        "games": "$games"
+            # 2) Group by school_name
+            group_stage = {
+                "$group": {
+                    "_id": "$school_name",
+                    "events": {
+                        "$push": {
+                            "year": "$year",
+                            "event_type": "$event_type",
+                            "games": "$games"
+                        }
                     }
                 }
             }
-        }
 
-        pipeline = [match_stage, group_stage]
-        schedules = list(schedules_collection.aggregate(pipeline))
+            pipeline = [match_stage, group_stage]
+            schedules = from_docs(schedules_collection.aggregate(pipeline), SchoolSchedules)
 
-        if not schedules:
-            return jsonify({"message": "No schedules found"}), 404
+            if not schedules:
+                return encode({"message": "No schedules found"}).decode(), 404
+            return encode({"schedules": schedules}).decode(), 200
 
-        return jsonify({"schedules": schedules}), 200
+        body, status = schedule_cache.get_or_compute("all", allowed_schools, {}, compute)
+        return _schedule_response(body, status)
 
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve schedule data: {str(e)}"}), 500
@@ -1265,43 +1598,227 @@ def retrieve_all_schedules():
 # Endpoint: GET /schedule/retrieve
 # Retrieve schedules based on filters: school name and event type,
 # but always includes "public" schedules plus the user's own school if logged in.
+# Cached like /schedule/all, per combination of filters.
 # ------------------------------
-@app.route('/schedule/retrieve', methods=['GET'])
+@api.route('/schedule/retrieve', methods=['GET'])
 def retrieve_schedule():
     try:
-        user_school = session.get("school")
-        allowed_schools = ["public"]
-        if user_school and user_school.lower() != "public":
-            allowed_schools.append(user_school)
-
-        # Build the base query to match only the allowed schools
-        query = {"school_name": {"$in": allowed_schools}}
-
-        # If user supplies a 'school_name' query param, refine the match
-        # (still must also be in allowed_schools)
+        allowed_schools = _allowed_schools()
         school_name_param = request.args.get('school_name')
-        if school_name_param:
-            # combine $in with regex:
-            query["school_name"] = {
-                "$in": allowed_schools,
-                "$regex": school_name_param,
-                "$options": "i"
-            }
-
         event_type = request.args.get('event_type')
-        if event_type:
-            query["event_type"] = {"$regex": event_type, "$options": "i"}
 
-        schedules = list(schedules_collection.find(query, {"_id": 0}))
+        def compute():
+            # Build the base query to match only the allowed schools
+            query = {"school_name": {"$in": allowed_schools}}
+
+            # If user supplies a 'school_name' query param, refine the match
+            # (still must also be in allowed_schools)
+            if school_name_param:
+                # combine $in with regex:
+                query["school_name"] = {
+                    "$in": allowed_schools,
+                    "$regex": school_name_param,
+                    "$options": "i"
+                }
+
+            if event_type:
+                query["event_type"] = {"$regex": event_type, "$options": "i"}
+
+            schedules = from_docs(schedules_collection.find(query, dict(projection(Schedule), _id=0)), Schedule)
 
-        if not schedules:
-            return jsonify({"message": "No matching schedules found"}), 404
+            if not schedules:
+                return encode({"message": "No matching schedules found"}).decode(), 404
+            return encode({"schedules": schedules}).decode(), 200
 
-        return jsonify({"schedules": schedules}), 200
+        params = {"school_name": school_name_param or None, "event_type": event_type or None}
+        body, status = schedule_cache.get_or_compute("retrieve", allowed_schools, params, compute)
+        return _schedule_response(body, status)
 
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve schedule data: {str(e)}"}), 500
 
+# ------------------------------
+# Endpoint: GET /healthz
+# Liveness: the process is up and serving requests. Checks no dependencies.
+# ------------------------------
+@api.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+# ------------------------------
+# Endpoint: GET /readyz
+# Readiness: 200 only when MongoDB and both Redis connections answer a ping, else 503.
+# ------------------------------
+@api.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {
+        "mongo": lambda: client.admin.command("ping"),
+        "redis": lambda: r.ping(),
+        "session_redis": lambda: current_app.session_interface.client.ping(),
+    }
+    results = {}
+    for name, check in checks.items():
+        start = time.perf_counter()
+        try:
+            check()
+            results[name] = {"ok": True}
+        except Exception as e:
+            results[name] = {"ok": False, "error": str(e)}
+        results[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    ready = all(result["ok"] for result in results.values())
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": results}), 200 if ready else 503
+
+
+@api.before_app_request
+def _start_background_workers():
+    # Threads don't survive fork, so each worker process starts its own job workers, hold
+    # sweeper and listing view stream (all no-ops once running in this process).
+    job_queue.ensure_workers()
+    holds.ensure_worker()
+    if listing_view is not None:
+        listing_view.ensure_worker()
+
+
+def _register_stats(name, help_text, stats_fn, counters, gauge_help=None):
+    """
+    Export a component's stats(): the monotonic `counters` as the counter <name>_total, and
+    the remaining stats (queue depths, entries and the like) as the gauge <name>.
+    """
+    metrics_registry.callback(
+        f"{name}_total", help_text, ("stat",), stats_callback(stats_fn, only=counters), "counter", replace=True
+    )
+    if gauge_help:
+        metrics_registry.callback(name, gauge_help, ("stat",), stats_callback(stats_fn, exclude=counters), replace=True)
+
+
+def _register_metrics():
+    """Export the components' stats() at /metrics (re-registering replaces the previous callbacks)."""
+    _register_stats(
+        "log_shipper_entries", "apilogs entries enqueued, dropped, flushed and failed.", log_shipper.stats,
+        ("enqueued", "dropped", "flushed", "failed"), gauge_help="apilogs entries waiting to be flushed."
+    )
+    _register_stats(
+        "orders_cache_events", "Patron orders cache hits, misses and refreshes.", orders_cache.stats,
+        orders_cache.metrics, gauge_help="Patron orders cached in this process."
+    )
+    _register_stats(
+        "schedule_cache_events", "Schedule response cache hits, misses and invalidations.", schedule_cache.stats,
+        schedule_cache.metrics
+    )
+    _register_stats(
+        "password_hash_events", "Password hashes, verifications, saturation rejections and timeouts.", password_hasher.stats,
+        password_hasher.metrics, gauge_help="Password hashing calls queued or running."
+    )
+    _register_stats(
+        "login_throttle_events", "Failed logins and attempts refused by the login throttle.", login_throttle.stats,
+        login_throttle.metrics
+    )
+    _register_stats(
+        "ticket_holds_events", "Pending-purchase holds created, converted, canceled and expired.", holds.stats,
+        holds.metrics, gauge_help="Pending-purchase holds scheduled for expiry."
+    )
+    _register_stats(
+        "job_queue_events", "Transfer jobs enqueued, retried, succeeded, failed and dead-lettered.", job_queue.stats,
+        job_queue.metrics, gauge_help="Transfer job queue depths."
+    )
+    metrics_registry.callback(
+        "outbound_circuit_state", "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open.",
+        ("dependency", "upstream"), circuit_states, replace=True
+    )
+    metrics_registry.callback(
+        "outbound_calls_total", "Outbound calls, retries, failures, timeouts, short-circuited calls and circuit openings.",
+        ("dependency", "stat"), outbound_stats, "counter", replace=True
+    )
+    if listing_view is not None:
+        _register_stats(
+            "listing_view_events", "Listing view seeds, resyncs, applied changes and pages served.", listing_view.stats,
+            listing_view.metrics, gauge_help="Listings held in this process's view."
+        )
+
+        def _listing_view_staleness():
+            staleness = listing_view.staleness()
+            return {} if staleness is None else {(): staleness}
+
+        metrics_registry.callback(
+            "listing_view_staleness_seconds", "Seconds since the listing view last caught up with MongoDB.", (),
+            _listing_view_staleness, replace=True
+        )
+
+
+def create_app(config=None):
+    """
+    Build a new Flask app around the `api` blueprint.
+    :param config: Overrides applied after the defaults, e.g. MONGO_MAX_POOL_SIZE, REDIS_MAX_CONNECTIONS
+        or TESTING. The pool sizes apply to this process's shared clients.
+
+    Startup work (index creation, Stripe and metrics setup) happens here rather than at import.
+    Mongo, Redis and Paciolan clients connect on first use in each process, and background
+    workers start on the first request, so this is safe to call in a server master that forks
+    workers afterwards. See wsgi.py / gunicorn.conf.py for the production entry point.
+    """
+    app = Flask(__name__)
+    app.config.update(pool_sizes)
+    #Redis Integration - Secret Key
+    app.secret_key = os.getenv('SECRET_KEY')
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_PERMANENT'] = True
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=6)
+    app.config['SESSION_SERIALIZATION_FORMAT'] = 'json'
+    app.config['SESSION_USE_SIGNER'] = True
+    app.config['SESSION_REDIS'] = session_redis
+    app.config['SESSION_COOKIE_SECURE'] = True # uses https or not
+    app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+    if config:
+        app.config.update(config)
+
+    # Rebuild this process's clients if the pool sizes changed
+    sizes = {name: app.config[name] for name in pool_sizes}
+    if sizes != pool_sizes:
+        pool_sizes.update(sizes)
+        for process_local in (client, r, session_redis):
+            process_local.reset()
+
+    CORS(app, supports_credentials=True)
+    # Behind a load balancer or reverse proxy, set TRUSTED_PROXY_HOPS to the number of proxies in
+    # front of the app, so request.remote_addr (which the login throttle keys on) is the client's
+    # address from X-Forwarded-For. Leave it at 0 when clients connect directly: the header is
+    # then ignored, since any client could set it.
+    trusted_proxy_hops = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+    if trusted_proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_hops, x_proto=trusted_proxy_hops)
+
+    # Create and initialize the Flask-Session object AFTER `app` has been configured.
+    # IndexedSession also keeps a per-user index of session keys (see session_index.py).
+    IndexedSession(app)
+
+    # Stripe Integration
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    stripe.default_http_client = GuardedStripeClient(stripe_policy)
+    stripe.max_network_retries = stripe_policy.retries
+    # Point Stripe calls elsewhere, e.g. at tools/fake_stripe.py during load tests
+    if os.getenv("STRIPE_API_BASE"):
+        stripe.api_base = os.getenv("STRIPE_API_BASE")
+
+    # Per-route latency, status counts and in-flight requests, exposed at /metrics
+    init_metrics(app)
+    _register_metrics()
+    app.register_blueprint(api)
+
+    # Declared indexes (see schema.py) are created at startup unless disabled;
+    # set MONGO_VERIFY_INDEXES=true to refuse to start when a hot query would scan a collection.
+    if os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true":
+        try:
+            ensure_indexes(ssdb)
+            if os.getenv("MONGO_VERIFY_INDEXES", "false").lower() == "true":
+                verify_hot_queries(ssdb)
+        except PyMongoError as e:
+            print(f"Skipping index setup, MongoDB unavailable: {e}")
+    return app
+
+
 if __name__ == '__main__':
+    # Development server only; run production with `gunicorn -c gunicorn.conf.py wsgi:app`
+    app = create_app()
     with app.app_context():
-        app.run(debug=True)
+        app.run(debug=os.getenv("FLASK_DEBUG", "true").lower() == "true")
@@ -0,0 +1,336 @@
+"""
+Microbenchmarks for the two CPU-bound hot paths: fuzzy_match.fuzzy_match_event
+and schedule_parser.parse_html_schedule.
+
+Fuzzy matching runs against the UC Ticket Data orders (shmeegtickets.json,
+deactickets.json and mitchellticket.json, combined into one patron's payload),
+scaled to --scales times as many events:
+
+    spread  copy k of every event is k weeks later (per-day buckets stay small)
+    dense   every copy falls on the original day under a suffixed name, ahead of
+            the original (worst case for the per-day candidate scan)
+
+"cold" cases call fuzzy_match_event without an orders cache (decode the payload,
+build the index, match); the others match against a prebuilt index, as a warm
+OrdersCache does, for an exact, misspelled, token-set and no-event-that-day
+listing.
+
+Schedule parsing runs each parser backend over a generated corpus of legacy
+(GoBearcats <pre>) and schedule-builder pages, from realistic season lengths
+up to 50,000 games. --write-corpus saves those pages for inspection.
+
+For every case this reports the time per call (best and median of --repeat
+rounds), the peak memory traced during one call, and the memory and number of
+allocated blocks still held after it (tracemalloc has no running allocation
+count, so peak and retained memory stand in for allocations). The result
+column fingerprints each output, so behaviour changes show up too. Inputs are
+deterministic and cases are always listed in the same order; with --no-timing
+the output is identical between runs of the same code, so it can be diffed
+between commits:
+
+    python benchmarks/bench_hot_paths.py --no-timing > before.txt
+    python benchmarks/bench_hot_paths.py --scales 1,10 --only fuzzy --json results.json
+"""
+import io
+import os
+import gc
+import sys
+import json
+import time
+import zlib
+import argparse
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fuzzy_match import build_event_index, fuzzy_match_event, match_event  # noqa: E402
+from schedule_parser import BACKENDS, parse_html_schedule  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "UC Ticket Data")
+FIXTURES = ("shmeegtickets.json", "deactickets.json", "mitchellticket.json")
+DEFAULT_SCALES = "1,10,100,1000"
+EVENT_DT_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+# (case, listing name, venue, date, token_set); all aimed at one fixture event
+QUERIES = (
+    ("exact", "UC Football vs. Houston", "Nippert Stadium", "2024-09-21T12:00:00-04:00", False),
+    ("typo", "UC Footbal vs Houston", "Nipert Stadium", "2024-09-21T12:00:00-04:00", False),
+    ("token", "Houston", "Nippert Stadium", "2024-09-21T12:00:00-04:00", True),
+    ("miss", "UC Football vs. Houston", "Nippert Stadium", "2024-09-20T12:00:00-04:00", False),
+)
+
+
+# ------------------------------
+# Orders payloads
+# ------------------------------
+def load_line_items() -> List[Dict[str, Any]]:
+    items = []
+    for fixture in FIXTURES:
+        with open(os.path.join(FIXTURE_DIR, fixture), encoding="utf-8") as f:
+            items.extend(json.load(f).get("value", {}).get("lineItemOHVos", []))
+    return items
+
+
+def _copy_item(item: Dict[str, Any], copy: int, layout: str) -> Dict[str, Any]:
+    item = dict(item)
+    events = []
+    for event in item.get("eventOHVos") or []:
+        event = dict(event)
+        event["id"] = f"{event.get('id', '')}-{copy}"
+        if layout == "dense":
+            event["name"] = f"{event.get('name', '')} ({copy})"
+        else:
+            try:
+                event_dt = datetime.strptime(event.get("eventDtStr", ""), EVENT_DT_FORMAT) + timedelta(weeks=copy)
+                event["eventDtStr"] = event_dt.strftime("%Y-%m-%dT%H:%M:%S.000%z")
+            except ValueError:
+                pass  # left as is, like an unparsable date in a real payload
+        events.append(event)
+    item["eventOHVos"] = events
+    return item
+
+
+def scaled_orders(items: List[Dict[str, Any]], scale: int, layout: str) -> bytes:
+    """The fixtures' line items repeated `scale` times, as the JSON body Paciolan would send."""
+    scaled = []
+    if layout == "dense":
+        # Copies first, so an exact match for the original is the last candidate scanned
+        for copy in range(scale - 1, 0, -1):
+            scaled.extend(_copy_item(item, copy, layout) for item in items)
+        scaled.extend(items)
+    else:
+        scaled.extend(items)
+        for copy in range(1, scale):
+            scaled.extend(_copy_item(item, copy, layout) for item in items)
+    return json.dumps({"value": {"lineItemOHVos": scaled}}).encode("utf-8")
+
+
+class _OrdersResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class FixtureClient:
+    """Stands in for PaciolanClient; every patron gets the same payload."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def get_patron_orders(self, paciolan_id, season_code):
+        return _OrdersResponse(self.body)
+
+
+# ------------------------------
+# Schedule corpus
+# ------------------------------
+OPPONENTS = ("Houston", "West Virginia", "Xavier", "BYU", "TCU", "Texas Tech", "Colorado", "Baylor",
+             "Oklahoma State", "Miami (Ohio)", "Kansas State", "Iowa State", "UCF", "Arizona State")
+LOCATIONS = ("Cincinnati, Ohio", "Manhattan, Kan.", "Oxford, Ohio", "Lubbock, Texas", "Orlando, Fla.",
+             "Morgantown, W.Va.", "Waco, Texas")
+TIMES = ("12:00 PM", "3:30 PM", "7:00 PM", "8:00 PM ET", "TBA")
+SITES = ("Home", "Away", "Neutral")
+RESULTS = ("W, 31-24", "L, 10-17", "Postponed", "")
+
+
+def _game_columns(i: int) -> List[str]:
+    day = datetime(2024, 2, 14) + timedelta(days=i // 2)
+    return [
+        f"{day:%b} {day.day} ({day:%a})",
+        TIMES[i % len(TIMES)],
+        SITES[i % len(SITES)],
+        OPPONENTS[(i * 7) % len(OPPONENTS)],
+        LOCATIONS[(i * 3) % len(LOCATIONS)],
+        RESULTS[i % len(RESULTS)],
+    ]
+
+
+def _page(body: str, chrome_kib: int = 0) -> str:
+    # Navigation and script markup ahead of the schedule, like a full athletics site page
+    chrome = []
+    while sum(map(len, chrome)) < chrome_kib * 1024:
+        n = len(chrome)
+        chrome.append(
+            f"<div class='nav'><a href='/sports/{n}'>Sport {n}</a> | <a href='/roster/{n}'>Roster</a></div>\n"
+            f"<script>var s{n} = '<pre>not this</pre>'; if (a < b) {{ s{n}++; }}</script>\n"
+        )
+    return (
+        "<!DOCTYPE html>\n<html><head><title>Cincinnati Bearcats Schedule</title><meta charset='utf-8'></head>\n"
+        f"<body>{''.join(chrome)}{body}<p>Footer &copy; 2024</p></body></html>\n"
+    )
+
+
+def legacy_schedule(games: int, sport: str = "Baseball", chrome_kib: int = 0) -> str:
+    lines = ["University of Cincinnati", f"2024 {sport} Schedule", "",
+             "Date       Time       At       Opponent        Location      Result"]
+    lines.extend("   ".join(_game_columns(i)).rstrip() for i in range(games))
+    return _page("<pre>\n" + "\n".join(lines) + "\n</pre>\n", chrome_kib)
+
+
+def builder_schedule(games: int, event_type: str = "Baseball", pre: bool = True) -> str:
+    lines = ["University of Cincinnati", "2024", event_type, "Date    Time    At    Opponent    Location    Result"]
+    lines.extend("    ".join(_game_columns(i)).rstrip() for i in range(games))
+    text = "\n".join(lines) + "\n"
+    return _page(f"<pre>{text}</pre>\n") if pre else text
+
+
+SCHEDULE_CORPUS: Tuple[Tuple[str, Callable[[], str]], ...] = (
+    ("legacy-football-12", lambda: legacy_schedule(12, "Football")),
+    ("legacy-basketball-31", lambda: legacy_schedule(31, "Men's Basketball")),
+    ("legacy-baseball-56", lambda: legacy_schedule(56)),
+    ("legacy-page-56", lambda: legacy_schedule(56, chrome_kib=150)),
+    ("legacy-5000", lambda: legacy_schedule(5000)),
+    ("legacy-50000", lambda: legacy_schedule(50000)),
+    ("builder-football-12", lambda: builder_schedule(12, "Football")),
+    ("builder-basketball-31", lambda: builder_schedule(31, "Men's Basketball")),
+    ("builder-baseball-56", lambda: builder_schedule(56)),
+    ("builder-text-56", lambda: builder_schedule(56, pre=False)),
+    ("builder-5000", lambda: builder_schedule(5000)),
+    ("builder-50000", lambda: builder_schedule(50000)),
+)
+
+
+# ------------------------------
+# Measurement
+# ------------------------------
+def fingerprint(result: Any) -> str:
+    if result is None:
+        return "none"
+    if isinstance(result, dict) and "games" in result:
+        digest = zlib.crc32(json.dumps(result, sort_keys=True).encode("utf-8"))
+        return f"{len(result['games'])} games {digest:08x}"
+    if isinstance(result, dict):
+        return f"event {result.get('id')}"
+    return type(result).__name__
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float, timing: bool) -> Dict[str, Any]:
+    """Time fn (best/median per call over `repeat` rounds of at least `min_time` s) and trace one call."""
+    result = fn()  # warm-up
+    row: Dict[str, Any] = {"result": fingerprint(result)}
+
+    if timing:
+        per_call = []
+        for _ in range(repeat):
+            calls, start = 0, time.perf_counter()
+            while True:
+                fn()
+                calls += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_time:
+                    break
+            per_call.append(elapsed / calls)
+        row["best_us"] = round(min(per_call) * 1e6, 1)
+        row["median_us"] = round(statistics.median(per_call) * 1e6, 1)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        kept = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del kept
+    row["peak_kib"] = round((peak - base) / 1024, 1)
+    row["retained_kib"] = round((current - base) / 1024, 1)
+    row["retained_blocks"] = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return row
+
+
+def fuzzy_cases(scales: List[int]):
+    items = load_line_items()
+    for layout in ("spread", "dense"):
+        for scale in scales:
+            body = scaled_orders(items, scale, layout)
+            client = FixtureClient(body)
+            index = build_event_index(json.loads(body))
+            events = sum(len(bucket) for bucket in index.values())
+            prefix = f"fuzzy/{layout}/x{scale}"
+            yield (
+                f"{prefix}/cold", f"{events} events, {len(body) // 1024} KiB",
+                lambda c=client, q=QUERIES[0]: fuzzy_match_event(q[1], q[2], q[3], "bench", c, token_set=q[4]),
+            )
+            for case, name, venue, date, token_set in QUERIES:
+                yield (
+                    f"{prefix}/{case}", f"{events} events",
+                    lambda i=index, n=name, v=venue, d=date, t=token_set: match_event(i, n, v, d, t),
+                )
+
+
+def schedule_cases(backends: List[str]):
+    for name, build in SCHEDULE_CORPUS:
+        html = build()
+        for backend in backends:
+            yield (
+                f"schedule/{name}/{backend}", f"{len(html.encode('utf-8')) // 1024} KiB",
+                lambda h=html, b=backend: parse_html_schedule(h, backend=b),
+            )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Fixture multipliers (default {DEFAULT_SCALES})")
+    arg_parser.add_argument("--backends", default=",".join(BACKENDS), help="Schedule parser backends to run")
+    arg_parser.add_argument("--only", help="Run only cases whose name contains this text")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case")
+    arg_parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing round")
+    arg_parser.add_argument("--no-timing", action="store_true", help="Only report memory and results (stable output)")
+    arg_parser.add_argument("--json", metavar="FILE", help="Also write the results as JSON")
+    arg_parser.add_argument("--write-corpus", metavar="DIR", help="Save the generated schedule pages and exit")
+    args = arg_parser.parse_args()
+
+    if args.write_corpus:
+        os.makedirs(args.write_corpus, exist_ok=True)
+        for name, build in SCHEDULE_CORPUS:
+            with open(os.path.join(args.write_corpus, name + ".html"), "w", encoding="utf-8") as f:
+                f.write(build())
+        print(f"Wrote {len(SCHEDULE_CORPUS)} pages to {args.write_corpus}")
+        return
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown or any(s < 1 for s in scales):
+        arg_parser.error(f"Invalid --backends {sorted(unknown)}" if unknown else "--scales must be positive")
+    timing = not args.no_timing
+
+    header = f"{'case':<42} {'input':<24}"
+    if timing:
+        header += f" {'best us':>12} {'median us':>12}"
+    header += f" {'peak KiB':>10} {'kept KiB':>9} {'kept blk':>8}  result"
+    print(header)
+
+    rows = []
+    for case, described, fn in [*fuzzy_cases(scales), *schedule_cases(backends)]:
+        if args.only and args.only not in case:
+            continue
+        # build_event_index prints a line per unparsable event date; keep the report clean
+        with redirect_stdout(io.StringIO()):
+            row = measure(fn, args.repeat, args.min_time, timing)
+        line = f"{case:<42} {described:<24}"
+        if timing:
+            line += f" {row['best_us']:>12.1f} {row['median_us']:>12.1f}"
+        line += f" {row['peak_kib']:>10.1f} {row['retained_kib']:>9.1f} {row['retained_blocks']:>8}  {row['result']}"
+        print(line, flush=True)
+        rows.append(dict(row, case=case, input=described))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "cases": rows}, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
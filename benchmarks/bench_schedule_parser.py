@@ -0,0 +1,81 @@
+"""
+Benchmark and equivalence check for the schedule parser backends.
+
+Parses every HTML file in benchmarks/schedule_fixtures with each backend, both
+from a string and from a byte stream, checks the result against the fixture's
+expected JSON (recorded from the original html5lib parser), and reports the
+fastest of N runs per backend. Exits non-zero if any output differs.
+
+Usage:
+    python benchmarks/bench_schedule_parser.py [--repeat N]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from schedule_parser import BACKENDS, parse_html_schedule, parse_schedule_stream  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule_fixtures")
+
+
+def load_fixtures():
+    fixtures = []
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if not name.endswith(".html"):
+            continue
+        base = name[:-len(".html")]
+        with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+            raw = f.read()
+        with open(os.path.join(FIXTURE_DIR, base + ".json"), encoding="utf-8") as f:
+            expected = json.load(f)
+        fixtures.append((base, raw, expected))
+    return fixtures
+
+
+def time_backend(backend, fixtures, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, raw, _ in fixtures:
+            parse_schedule_stream(io.BytesIO(raw), backend=backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Runs per backend; the fastest is reported")
+    args = arg_parser.parse_args()
+
+    fixtures = load_fixtures()
+    mismatches = []
+    for backend in BACKENDS:
+        for base, raw, expected in fixtures:
+            from_text = parse_html_schedule(raw.decode("utf-8"), backend=backend)
+            from_stream = parse_schedule_stream(io.BytesIO(raw), backend=backend)
+            if from_text != expected or from_stream != expected:
+                mismatches.append(f"{backend}: {base}")
+
+    total_kb = sum(len(raw) for _, raw, _ in fixtures) / 1024
+    print(f"{len(fixtures)} fixtures ({total_kb:.0f} KiB), best of {args.repeat} runs")
+    print(f"{'backend':<10} {'seconds':>10} {'KiB/s':>10}")
+    for backend in BACKENDS:
+        elapsed = time_backend(backend, fixtures, args.repeat)
+        print(f"{backend:<10} {elapsed:>10.4f} {total_kb / elapsed:>10.0f}")
+
+    if mismatches:
+        print("Output differs from the recorded fixtures:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print("All backends match the recorded fixtures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark for the similarity backends used by fuzzy_match.
+
+Scores every (listing, Paciolan event) name and venue pair built from the
+UC Ticket Data fixtures with each installed backend, with and without the
+score cutoff the matcher uses, and checks that every backend agrees with
+difflib (fuzzywuzzy's pure-Python path) on all scores at or above the cutoff.
+
+Usage:
+    python benchmarks/bench_similarity.py [--repeat N]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fuzzy_match import MATCH_CUTOFF, normalize_key  # noqa: E402
+from similarity import BACKENDS, get_scorer  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "UC Ticket Data")
+FIXTURES = ("shmeegtickets.json", "deactickets.json", "mitchellticket.json")
+
+
+def load_pairs():
+    """Build (listing, event) string pairs the way the matcher compares them."""
+    names, venues = [], []
+    for fixture in FIXTURES:
+        with open(os.path.join(FIXTURE_DIR, fixture), encoding="utf-8") as f:
+            data = json.load(f)
+        for order in data.get("value", {}).get("lineItemOHVos", []):
+            for event in order.get("eventOHVos", []) or []:
+                names.append(normalize_key(event.get("name", "")))
+                venues.append(normalize_key(event.get("facility", "")))
+
+    pairs = []
+    for values in (names, venues):
+        # Every listing against every event, plus slightly mangled listings.
+        queries = values + [v[:-1] for v in values if v] + [v + "x" for v in values]
+        for q in queries:
+            for v in values:
+                pairs.append((q, v))
+    return pairs
+
+
+def time_backend(scorer, pairs, cutoff, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for a, b in pairs:
+            scorer.ratio(a, b, score_cutoff=cutoff)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Runs per backend; the fastest is reported")
+    args = arg_parser.parse_args()
+
+    pairs = load_pairs()
+    reference = get_scorer("difflib")
+    expected = [reference.ratio(a, b, score_cutoff=MATCH_CUTOFF) for a, b in pairs]
+
+    print(f"{len(pairs)} pairs, best of {args.repeat} runs")
+    print(f"{'backend':<12} {'no cutoff (s)':>14} {'cutoff ' + str(MATCH_CUTOFF) + ' (s)':>14} {'pairs/s':>12}  agrees")
+    for name in BACKENDS:
+        try:
+            scorer = get_scorer(name)
+        except ImportError:
+            print(f"{name:<12} not installed")
+            continue
+        plain = time_backend(scorer, pairs, 0, args.repeat)
+        cut = time_backend(scorer, pairs, MATCH_CUTOFF, args.repeat)
+        agrees = all(
+            scorer.ratio(a, b, score_cutoff=MATCH_CUTOFF) == e for (a, b), e in zip(pairs, expected)
+        )
+        print(f"{name:<12} {plain:>14.4f} {cut:>14.4f} {len(pairs) / cut:>12.0f}  {agrees}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,694 @@
+"""
+End-to-end load test for the marketplace endpoints.
+
+Boots the backend (gunicorn wsgi:app) against local MongoDB and Redis, with
+tools/paciolan_sim.py standing in for Paciolan and tools/fake_stripe.py for
+Stripe, then drives scripted user journeys from --users concurrent virtual
+users for --duration seconds:
+
+    register  register, log in, GET /users/me, log out
+    browse    GET /tickets, optionally filtered by event, following "next" for a few pages
+    sell      a seller with a linked Paciolan account posts a ticket (POST /tickets)
+    buy       GET /tickets, POST purchase, wait for the transfer job, POST intent,
+              pay (fake Stripe confirm), POST confirm, wait for the accept job
+
+Before the timed run, --seed-listings tickets are posted so buyers have
+something to buy. Per-endpoint latency percentiles, throughput and error
+rates are written to a JSON results file, along with per-journey timings and
+MongoDB / Redis operation counts for the timed run. --compare prints the
+change against an earlier results file.
+
+    python benchmarks/loadtest.py --users 20 --duration 60
+    python benchmarks/loadtest.py --mix browse=80,buy=20 --env LISTING_VIEW=false --out before.json
+    python benchmarks/loadtest.py --mix browse=80,buy=20 --out after.json --compare before.json
+
+Data goes to the MONGO_DB_NAME database (default student_section_loadtest),
+which is dropped afterwards unless --keep-data is given. Operation counts come
+from MongoDB serverStatus and Redis INFO commandstats (server-wide, so run
+against otherwise idle local servers). Mongo commands and outbound calls per
+operation also come from the app's /metrics; with more than one --workers
+that only covers the worker that answered the scrape.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import secrets
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import paciolan_sim  # noqa: E402
+import fake_stripe  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SEASON_CODE = "FB24"  # the season fuzzy_match asks Paciolan for
+DEFAULT_MIX = "browse=50,buy=25,sell=15,register=10"
+METRIC_LINE_RE = re.compile(r'^dependency_request_duration_seconds_count\{dependency="([^"]+)",operation="([^"]+)"\} (\S+)$')
+
+
+# ------------------------------
+# Measurements
+# ------------------------------
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Thread-safe latency and outcome samples, keyed by endpoint or journey name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.conflicts: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, elapsed_ms: float, status: str, error: bool = False, conflict: bool = False):
+        with self._lock:
+            self.latencies[name].append(elapsed_ms)
+            self.statuses[name][status] += 1
+            if error:
+                self.errors[name] += 1
+            if conflict:
+                self.conflicts[name] += 1
+
+    def summary(self, elapsed_s: float) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = sorted(self.latencies)
+            out = {}
+            for name in names:
+                values = sorted(self.latencies[name])
+                count = len(values)
+                out[name] = {
+                    "count": count,
+                    "throughput_rps": round(count / elapsed_s, 2) if elapsed_s else None,
+                    "errors": self.errors[name],
+                    "error_rate": round(self.errors[name] / count, 4) if count else 0.0,
+                    "conflicts": self.conflicts[name],
+                    "statuses": dict(self.statuses[name]),
+                    "mean_ms": round(sum(values) / count, 2) if count else None,
+                    "p50_ms": _round(percentile(values, 50)),
+                    "p90_ms": _round(percentile(values, 90)),
+                    "p99_ms": _round(percentile(values, 99)),
+                    "max_ms": _round(values[-1] if values else None),
+                }
+            return out
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+# ------------------------------
+# Virtual users
+# ------------------------------
+class JourneyFailed(Exception):
+    """A step returned something the journey can't continue from."""
+
+
+class AppClient:
+    """
+    One virtual user's HTTP client. The session cookie is sent by hand: the backend
+    marks it Secure, which requests won't send back over plain http.
+    """
+
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.cookies: Dict[str, str] = {}
+        self.user_id: Optional[str] = None
+
+    def call(self, name: str, method: str, path: str, expect=(200,), conflict=(), **kwargs) -> requests.Response:
+        """
+        Send one request and record it under `name` (e.g. "POST /tickets/<id>/purchase").
+        Statuses in `conflict` are expected contention (counted, not errors); anything
+        else outside `expect` is an error and raises JourneyFailed.
+        """
+        headers = kwargs.pop("headers", {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, headers=headers, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            self.recorder.record(name, (time.perf_counter() - start) * 1000, type(e).__name__, error=True)
+            raise JourneyFailed(f"{name}: {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for cookie in response.cookies:
+            self.cookies[cookie.name] = cookie.value
+        self.http.cookies.clear()
+
+        is_conflict = response.status_code in conflict
+        is_error = response.status_code not in expect and not is_conflict
+        self.recorder.record(name, elapsed_ms, str(response.status_code), error=is_error, conflict=is_conflict)
+        if is_error:
+            raise JourneyFailed(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    def register_and_login(self, email: str, password: str):
+        response = self.call("POST /users/register", "POST", "/users/register", expect=(201,), json={
+            "email": email, "password": password, "FirstName": "Load", "LastName": "Test", "School": "",
+        })
+        self.user_id = response.json()["user_id"]
+        self.call("POST /users/login", "POST", "/users/login", json={"email": email, "password": password})
+
+    def wait_for_job(self, job_name: str, status_url: str, timeout: float = 60.0, interval: float = 0.05) -> Dict[str, Any]:
+        """Poll a job until it finishes; its time to completion is recorded as "job <name>"."""
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.call("GET /jobs/<id>", "GET", status_url).json()
+            if job["status"] in ("succeeded", "failed", "dead"):
+                ok = job["status"] == "succeeded"
+                self.recorder.record(f"job {job_name}", (time.perf_counter() - start) * 1000, job["status"], error=not ok)
+                if not ok:
+                    raise JourneyFailed(f"job {job_name} {job['status']}: {job.get('error')}")
+                return job
+            time.sleep(interval)
+        self.recorder.record(f"job {job_name}", (time.perf_counter() - start) * 1000, "timeout", error=True)
+        raise JourneyFailed(f"job {job_name} did not finish in {timeout}s")
+
+
+class Seller:
+    """A seller with a linked (synthetic) Paciolan account and the events it can still list."""
+
+    def __init__(self, client: AppClient, listable: List[Dict[str, str]]):
+        self.client = client
+        self.listable = listable
+        self.lock = threading.Lock()
+
+
+class SellerPool:
+    """
+    Sellers for POST /tickets. A seller may list each event name once, so a new seller is
+    registered and linked whenever the current one runs out of names.
+    """
+
+    def __init__(self, harness: "LoadTest"):
+        self.harness = harness
+        self._lock = threading.Lock()
+        self._sellers: List[Seller] = []
+
+    def _new_seller(self) -> Seller:
+        h = self.harness
+        client = AppClient(h.app_url, h.recorder)
+        email = f"seller-{h.run_id}-{len(self._sellers)}@loadtest.local"
+        client.register_and_login(email, "loadtest-password")
+        response = client.call(
+            "POST /users/<id>/third_party", "POST", f"/users/{client.user_id}/third_party",
+            json={"userName": email, "password": "loadtest-password"},
+        )
+        patron_id = response.json()["paciolan_id"]
+        # The simulator's synthetic orders are deterministic, so the events can be derived here
+        seen, listable = set(), []
+        for item in paciolan_sim.synthetic_line_items(patron_id, SEASON_CODE, h.args.synthetic_events):
+            event = item["eventOHVos"][0]
+            if event["name"] in seen:
+                continue
+            seen.add(event["name"])
+            listable.append({
+                "event_name": event["name"],
+                "venue": event["facility"],
+                "event_date": datetime.strptime(event["eventDtStr"], "%Y-%m-%dT%H:%M:%S.000%z").isoformat(),
+            })
+        h.rng_shuffle(listable)
+        return Seller(client, listable)
+
+    def next_listing(self) -> Tuple[Seller, Dict[str, str]]:
+        with self._lock:
+            for seller in self._sellers:
+                with seller.lock:
+                    if seller.listable:
+                        return seller, seller.listable.pop()
+            seller = self._new_seller()
+            self._sellers.append(seller)
+            if not seller.listable:
+                raise JourneyFailed("Seller has no listable events; raise --synthetic-events")
+            return seller, seller.listable.pop()
+
+    def __len__(self):
+        return len(self._sellers)
+
+
+# ------------------------------
+# Journeys
+# ------------------------------
+def journey_register(h: "LoadTest", vu: AppClient):
+    client = AppClient(h.app_url, h.recorder)
+    client.register_and_login(f"user-{h.run_id}-{h.next_id()}@loadtest.local", "loadtest-password")
+    client.call("GET /users/me", "GET", "/users/me")
+    client.call("POST /logout", "POST", "/logout")
+
+
+def journey_browse(h: "LoadTest", vu: AppClient):
+    params: Dict[str, Any] = {"limit": h.args.page_size}
+    if h.event_names and random.random() < 0.5:
+        params["event"] = random.choice(h.event_names)
+    for _ in range(h.args.browse_pages):
+        body = vu.call("GET /tickets", "GET", "/tickets", params=params).json()
+        if not body.get("next"):
+            break
+        params["cursor"] = body["next"]
+
+
+def journey_sell(h: "LoadTest", vu: AppClient):
+    seller, listing = h.sellers.next_listing()
+    body = dict(listing, price=str(random.randint(10, 150)), school_name="University of Cincinnati")
+    response = seller.client.call("POST /tickets", "POST", "/tickets", expect=(201,), conflict=(409,), json=body)
+    if response.status_code == 201:
+        h.remember_event(listing["event_name"])
+
+
+def journey_buy(h: "LoadTest", vu: AppClient):
+    # Pick a listing; another buyer may take it first (409/400), so try a few
+    for _ in range(3):
+        tickets = vu.call("GET /tickets", "GET", "/tickets", params={"limit": h.args.page_size}).json()["tickets"]
+        if not tickets:
+            raise JourneyFailed("No listings available to buy")
+        ticket_id = random.choice(tickets)["ticket_id"]
+        response = vu.call(
+            "POST /tickets/<id>/purchase", "POST", f"/tickets/{ticket_id}/purchase", expect=(202,), conflict=(400, 409)
+        )
+        if response.status_code == 202:
+            break
+    else:
+        raise JourneyFailed("Every listing tried was taken by another buyer")
+
+    vu.wait_for_job("transfer.initialize", response.json()["status_url"])
+    intent = vu.call("POST /tickets/<id>/purchase/intent", "POST", f"/tickets/{ticket_id}/purchase/intent").json()
+    payment_intent_id = intent["client_secret"].split("_secret_")[0]
+
+    # What Stripe.js does in the browser
+    start = time.perf_counter()
+    paid = h.stripe_http.post(f"{h.stripe_url}/v1/payment_intents/{payment_intent_id}/confirm", timeout=30)
+    h.recorder.record("stripe confirm (fake)", (time.perf_counter() - start) * 1000, str(paid.status_code),
+                      error=paid.status_code != 200)
+    if paid.status_code != 200 or paid.json().get("status") != "succeeded":
+        raise JourneyFailed("Payment was declined")
+
+    # With --stripe-webhooks the payment_intent.succeeded event may finalize the purchase first
+    response = vu.call(
+        "POST /tickets/<id>/purchase/confirm", "POST", f"/tickets/{ticket_id}/purchase/confirm",
+        expect=(202,), conflict=(400, 409) if h.args.stripe_webhooks else (),
+    )
+    if response.status_code == 202:
+        vu.wait_for_job("transfer.accept", response.json()["status_url"])
+
+
+JOURNEYS = {"register": journey_register, "browse": journey_browse, "sell": journey_sell, "buy": journey_buy}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"Unknown journey {name!r}; choose from {', '.join(JOURNEYS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in {part!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The journey mix needs a positive weight")
+    return mix
+
+
+# ------------------------------
+# Environment
+# ------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def mongo_opcounters(mongo_uri: str) -> Optional[Dict[str, int]]:
+    try:
+        from pymongo import MongoClient
+        with MongoClient(mongo_uri, serverSelectionTimeoutMS=2000) as mongo:
+            return dict(mongo.admin.command("serverStatus")["opcounters"])
+    except Exception as e:
+        print(f"MongoDB serverStatus unavailable: {e}")
+        return None
+
+
+def redis_commandstats(redis_url: str) -> Optional[Dict[str, int]]:
+    try:
+        import redis
+        info = redis.Redis.from_url(redis_url, socket_timeout=2).info("commandstats")
+        return {name.replace("cmdstat_", ""): stats["calls"] for name, stats in info.items()}
+    except Exception as e:
+        print(f"Redis INFO commandstats unavailable: {e}")
+        return None
+
+
+def app_dependency_counts(app_url: str) -> Optional[Dict[str, int]]:
+    """Outbound calls per dependency/operation from the app's /metrics (the answering worker only)."""
+    try:
+        text = requests.get(f"{app_url}/metrics", timeout=5).text
+    except requests.RequestException:
+        return None
+    counts = {}
+    for line in text.splitlines():
+        match = METRIC_LINE_RE.match(line)
+        if match:
+            counts[f"{match.group(1)} {match.group(2)}"] = int(float(match.group(3)))
+    return counts
+
+
+def _delta(before: Optional[Dict[str, int]], after: Optional[Dict[str, int]]) -> Optional[Dict[str, int]]:
+    if before is None or after is None:
+        return None
+    delta = {k: after[k] - before.get(k, 0) for k in after}
+    return {k: v for k, v in sorted(delta.items()) if v}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.run_id = secrets.token_hex(4)
+        self.recorder = Recorder()
+        self.sellers = SellerPool(self)
+        self.event_names: List[str] = []
+        self.stripe_http = requests.Session()
+        self._rng = random.Random(args.seed)
+        self._ids = 0
+        self._lock = threading.Lock()
+        self._servers = []
+        self._app_proc: Optional[subprocess.Popen] = None
+        self._app_log = None
+        self.app_url = args.app_url
+        self.stripe_url = args.stripe_url
+        self.paciolan_sim = None
+        self.fake_stripe = None
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def rng_shuffle(self, values: List[Any]):
+        with self._lock:
+            self._rng.shuffle(values)
+
+    def remember_event(self, name: str):
+        with self._lock:
+            self.event_names.append(name)
+
+    # ------------------------------
+    # Setup / teardown
+    # ------------------------------
+    def start(self):
+        args = self.args
+        if self.app_url:
+            if not self.stripe_url:
+                raise SystemExit("--stripe-url is required with --app-url (buyers pay through it)")
+            return
+
+        self.paciolan_sim = paciolan_sim.PaciolanSimulator(
+            synthetic_events=args.synthetic_events,
+            faults=paciolan_sim.Faults(args.paciolan_latency, args.paciolan_error_rate),
+            seed=args.seed,
+        )
+        paciolan_url = _serve(self._track(paciolan_sim.make_server(self.paciolan_sim, port=0)))
+
+        app_port = _free_port()
+        self.app_url = f"http://127.0.0.1:{app_port}"
+        webhook_secret = f"whsec_{secrets.token_hex(16)}" if args.stripe_webhooks else None
+        self.fake_stripe = fake_stripe.FakeStripe(
+            webhook_url=f"{self.app_url}/webhooks/stripe" if webhook_secret else None,
+            webhook_secret=webhook_secret,
+            latency=args.stripe_latency,
+            seed=args.seed,
+        )
+        self.stripe_url = _serve(self._track(fake_stripe.make_server(self.fake_stripe, port=0)))
+
+        env = dict(os.environ)
+        env.update({
+            "MONGO_URI": args.mongo_uri,
+            "MONGO_DB_NAME": args.db_name,
+            "REDIS_URL": args.redis_url,
+            "SECRET_KEY": secrets.token_hex(),
+            "STRIPE_SECRET_KEY": "sk_test_loadtest",
+            "STRIPE_API_BASE": self.stripe_url,
+            "PACIOLAN_BASE_URL": paciolan_url,
+            "PORT": str(app_port),
+            "WEB_CONCURRENCY": str(args.workers),
+            "GUNICORN_THREADS": str(args.threads),
+            "FLASK_DEBUG": "false",
+        })
+        if webhook_secret:
+            env["STRIPE_WEBHOOK_SECRET"] = webhook_secret
+        else:
+            env.pop("STRIPE_WEBHOOK_SECRET", None)
+        for item in args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        self._app_log = tempfile.NamedTemporaryFile("w+", prefix="loadtest-app-", suffix=".log", delete=False)
+        self._app_proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{app_port}", "wsgi:app"],
+            cwd=ROOT, env=env, stdout=self._app_log, stderr=subprocess.STDOUT,
+        )
+        self._wait_ready()
+
+    def _track(self, server):
+        self._servers.append(server)
+        return server
+
+    def _wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._app_proc.poll() is not None:
+                raise SystemExit(f"The backend exited during startup; see {self._app_log.name}")
+            try:
+                if requests.get(f"{self.app_url}/readyz", timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise SystemExit(f"The backend was not ready after {timeout}s; see {self._app_log.name}")
+
+    def stop(self):
+        if self._app_proc is not None:
+            self._app_proc.terminate()
+            try:
+                self._app_proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._app_proc.kill()
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        if self._app_proc is not None and not self.args.keep_data:
+            try:
+                from pymongo import MongoClient
+                with MongoClient(self.args.mongo_uri, serverSelectionTimeoutMS=2000) as mongo:
+                    mongo.drop_database(self.args.db_name)
+            except Exception as e:
+                print(f"Could not drop {self.args.db_name}: {e}")
+
+    # ------------------------------
+    # Run
+    # ------------------------------
+    def seed(self):
+        print(f"Seeding {self.args.seed_listings} listings...")
+        for _ in range(self.args.seed_listings):
+            journey_sell(self, None)
+
+    def _virtual_user(self, deadline: float, mix: Dict[str, float], journeys: Recorder, failures: Dict[str, int]):
+        vu = AppClient(self.app_url, self.recorder)
+        try:
+            vu.register_and_login(f"buyer-{self.run_id}-{self.next_id()}@loadtest.local", "loadtest-password")
+        except JourneyFailed as e:
+            print(f"Virtual user could not log in: {e}")
+            return
+        names, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                JOURNEYS[name](self, vu)
+                ok, reason = True, "ok"
+            except JourneyFailed as e:
+                ok, reason = False, str(e)
+            journeys.record(f"journey {name}", (time.perf_counter() - start) * 1000, "ok" if ok else "failed", error=not ok)
+            if not ok:
+                with self._lock:
+                    failures[reason.split(":")[0]] += 1
+            if self.args.think_time:
+                time.sleep(random.uniform(0, self.args.think_time))
+
+    def run(self) -> Dict[str, Any]:
+        args = self.args
+        started_at = datetime.utcnow().isoformat() + "Z"
+        seed_start = time.monotonic()
+        self.seed()
+        setup = self.recorder.summary(time.monotonic() - seed_start)
+        self.recorder = Recorder()
+        for seller in self.sellers._sellers:
+            seller.client.recorder = self.recorder
+
+        mongo_before = mongo_opcounters(args.mongo_uri)
+        redis_before = redis_commandstats(args.redis_url)
+        app_before = app_dependency_counts(self.app_url)
+
+        print(f"Running {args.users} virtual users for {args.duration}s (mix {args.mix})...")
+        journeys, failures = Recorder(), defaultdict(int)
+        started = time.monotonic()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=self._virtual_user, args=(deadline, parse_mix(args.mix), journeys, failures), daemon=True)
+            for _ in range(args.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        endpoints = self.recorder.summary(elapsed)
+        total = sum(e["count"] for name, e in endpoints.items() if not name.startswith(("job ", "stripe ")))
+        mongo_ops = _delta(mongo_before, mongo_opcounters(args.mongo_uri))
+        redis_ops = _delta(redis_before, redis_commandstats(args.redis_url))
+        app_ops = _delta(app_before, app_dependency_counts(self.app_url))
+        return {
+            "run_id": self.run_id,
+            "started_at": started_at,
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+            "endpoints": endpoints,
+            "journeys": journeys.summary(elapsed),
+            "journey_failures": dict(failures),
+            "db": {
+                "mongo_opcounters": mongo_ops,
+                "mongo_ops_per_request": round(sum(mongo_ops.values()) / total, 2) if mongo_ops and total else None,
+                "redis_commands": redis_ops,
+                "redis_ops_per_request": round(sum(redis_ops.values()) / total, 2) if redis_ops and total else None,
+                "app_dependency_calls": app_ops,
+            },
+            "sellers": len(self.sellers),
+            "paciolan": self.paciolan_sim.snapshot() if self.paciolan_sim else None,
+            "stripe": self.fake_stripe.snapshot() if self.fake_stripe else None,
+            "setup": setup,
+        }
+
+
+# ------------------------------
+# Reporting
+# ------------------------------
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"\n{results['requests']} requests in {results['duration_s']}s ({results['throughput_rps']} req/s)")
+    header = f"{'endpoint':<38} {'count':>7} {'rps':>8} {'err%':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}"
+    if baseline:
+        header += f" {'p50 Δ':>8} {'p99 Δ':>8}"
+    for section in ("endpoints", "journeys"):
+        print("\n" + header)
+        for name, stats in results[section].items():
+            line = (
+                f"{name:<38} {stats['count']:>7} {stats['throughput_rps'] or 0:>8} {stats['error_rate'] * 100:>6.1f} "
+                f"{stats['p50_ms'] or 0:>9.1f} {stats['p90_ms'] or 0:>9.1f} {stats['p99_ms'] or 0:>9.1f}"
+            )
+            old = (baseline or {}).get(section, {}).get(name)
+            if baseline:
+                line += f" {_change(old and old['p50_ms'], stats['p50_ms']):>8} {_change(old and old['p99_ms'], stats['p99_ms']):>8}"
+            print(line)
+    db = results["db"]
+    print(f"\nMongoDB ops/request: {db['mongo_ops_per_request']}  Redis commands/request: {db['redis_ops_per_request']}")
+    if baseline:
+        old_db = baseline.get("db", {})
+        print(f"  baseline:          {old_db.get('mongo_ops_per_request')}  {old_db.get('redis_ops_per_request')}")
+    if results["journey_failures"]:
+        print("Journey failures: " + ", ".join(f"{k} x{v}" for k, v in results["journey_failures"].items()))
+
+
+def _change(old: Optional[float], new: Optional[float]) -> str:
+    if not old or new is None:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run the journeys")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Journey weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between journeys, seconds")
+    parser.add_argument("--seed-listings", type=int, default=200, help="Tickets posted before the timed run")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--browse-pages", type=int, default=3)
+    parser.add_argument("--seed", type=int, help="Seed for the simulators' random draws")
+    parser.add_argument("--workers", type=int, default=1, help="Gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="Request threads per worker")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra backend environment")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--db-name", default="student_section_loadtest")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"))
+    parser.add_argument("--keep-data", action="store_true", help="Don't drop the load-test database afterwards")
+    parser.add_argument("--synthetic-events", type=int, default=500, help="Paciolan events per seller")
+    parser.add_argument("--paciolan-latency", default="fixed:0", help="paciolan_sim latency spec")
+    parser.add_argument("--paciolan-error-rate", type=float, default=0.0)
+    parser.add_argument("--stripe-latency", default="fixed:0", help="Fake Stripe latency spec")
+    parser.add_argument("--stripe-webhooks", action="store_true", help="Finalize payments from fake Stripe webhooks")
+    parser.add_argument("--app-url", help="Use an already running backend instead of booting one")
+    parser.add_argument("--stripe-url", help="Fake Stripe the running backend uses (with --app-url)")
+    parser.add_argument("--out", help="Results file (default benchmarks/results/loadtest-<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    try:
+        parse_mix(args.mix)
+        paciolan_sim.parse_latency(args.paciolan_latency)
+        paciolan_sim.parse_latency(args.stripe_latency)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    harness = LoadTest(args)
+    try:
+        harness.start()
+        results = harness.run()
+    finally:
+        harness.stop()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_report(results, baseline)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Process-local clients for Mongo, Redis and Paciolan.
+
+A MongoClient (or any client holding open sockets) must not be shared across
+fork(), and in a preforking server each worker should own pools sized for its
+own threads. ProcessLocal wraps a factory and builds the client on first use in
+each process, rebuilding it if the pid changes. app.py can therefore pass these
+objects to the caches, queues and Flask-Session at import time, including in a
+server master that preloads the app, and every worker still connects on its own.
+
+    client = ProcessLocal(lambda: MongoClient(uri))
+    ssdb = client.child("student_section")
+    tickets = ssdb.child("tickets")     # used exactly like a Collection
+"""
+import os
+import threading
+from typing import Any, Callable, Optional
+
+
+class ProcessLocal:
+    def __init__(self, factory: Callable[..., Any], parent: Optional["ProcessLocal"] = None):
+        """
+        :param factory: Builds the real client; called once per process, on first use.
+            For a child, it is passed the parent's client.
+        :param parent: Rebuild whenever this ProcessLocal's client is rebuilt
+        """
+        self._factory = factory
+        self._parent = parent
+        self._lock = threading.Lock()
+        self._client = None
+        self._source = None
+        self._pid = None
+
+    def _resolve(self):
+        """
+        The real client for this process. Named so it can't shadow a client method:
+        every other attribute (including Redis GET and Collection methods) is forwarded.
+        """
+        source = self._parent._resolve() if self._parent is not None else None
+        if self._pid != os.getpid() or source is not self._source:
+            with self._lock:
+                if self._pid != os.getpid() or source is not self._source:
+                    self._client = self._factory(source) if self._parent is not None else self._factory()
+                    self._source = source
+                    self._pid = os.getpid()
+        return self._client
+
+    def reset(self):
+        """Drop this process's client (e.g. after changing pool sizes); the next use builds a new one."""
+        with self._lock:
+            self._client = None
+            self._source = None
+            self._pid = None
+
+    def child(self, key: str) -> "ProcessLocal":
+        """A ProcessLocal for self._resolve()[key], e.g. a database or collection."""
+        return ProcessLocal(lambda source: source[key], parent=self)
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
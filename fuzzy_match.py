@@ -1,126 +1,171 @@
 from datetime import datetime
 from dateutil import parser
 import re
-from fuzzywuzzy import fuzz
+from collections import defaultdict
+from typing import Dict, List, Optional
 from unidecode import unidecode
-import requests
-from flask import jsonify
+from similarity import get_scorer
 
-def fuzzy_match_event(frontend_name: str, frontend_venue: str, frontend_datetime: str, paciolan_id: str, token: str) -> dict:
+NON_WORD_RE = re.compile(r'\W+')
+
+# Only scores at or above this matter; the scorer can stop early below it.
+MATCH_CUTOFF = 90
+
+# Backend picked from FUZZY_BACKEND (default: fastest installed).
+scorer = get_scorer()
+
+# Set Specific season for now (it doesn't change in mocked response)
+SEASON_CODE = 'FB24'
+
+
+class OrdersFetchError(Exception):
+    """Raised when the patron orders endpoint returns a non-200 status."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Paciolan orders request failed with status {status_code}")
+        self.status_code = status_code
+
+
+def fetch_patron_orders(client, paciolan_id: str, season_code: str) -> dict:
     """
-    Fuzzy match an event from the Paciolan API using the frontend event details.
-    
-    :param frontend_name: The event name provided by the frontend.
-    :param frontend_venue: The venue provided by the frontend.
-    :param frontend_datetime: The event date/time in ISO 8601 format.
-    :return: The best matching event dict from Paciolan, or None if no match is found.
+    Download and decode a patron's orders for one season.
+    Raises OrdersFetchError on a non-200 response so failures are never cached.
     """
-    
-    # Set Specific season for now (it doesn't change in mocked response)
-    season_code = 'FB24'
-
-    # Normalize text: lower-case, trim whitespace, remove accents.
-    def normalize_text(s: str) -> str:
-        if s is None:
-            return ""
-        return unidecode(s).strip().lower()
-    
-    # Normalize the frontend inputs.
-    norm_name = normalize_text(frontend_name)
-    norm_venue = normalize_text(frontend_venue)
-    # Remove non-alphanumeric characters for robust comparison.
-    norm_name = re.sub(r'\W+', '', norm_name)
-    norm_venue = re.sub(r'\W+', '', norm_venue)
-    
-    # Parse the frontend datetime string.
+    response = client.get_patron_orders(paciolan_id, season_code)
+    if response.status_code != 200:
+        raise OrdersFetchError(response.status_code)
+    return response.json()
+
+
+# Normalize text: lower-case, trim whitespace, remove accents.
+def normalize_text(s: str) -> str:
+    if s is None:
+        return ""
+    return unidecode(s).strip().lower()
+
+
+# Normalized text with non-alphanumeric characters removed, for robust comparison.
+def normalize_key(s: str) -> str:
+    return NON_WORD_RE.sub('', normalize_text(s))
+
+
+# Normalized text with words kept apart, for token-set scoring.
+def normalize_tokens(s: str) -> str:
+    return NON_WORD_RE.sub(' ', normalize_text(s)).strip()
+
+
+def parse_target_datetime(frontend_datetime: str) -> datetime:
     try:
-        target_dt = datetime.fromisoformat(frontend_datetime)
+        return datetime.fromisoformat(frontend_datetime)
     except ValueError:
-        target_dt = parser.parse(frontend_datetime)
-    target_date = target_dt.date()
-    
-    # Retrieve events from Paciolan API.
-    url = f"http://localhost:3003/v2/patron/{paciolan_id}/orders/{season_code}"
-    headers = {
-        "Authorization": f"Bearer {token}",    # Use the token from get_mock_token()
-        "PAC-Application-ID": "TicketImporter/1.0",
-        "PAC-API-Key": "mock.api.key",
-        "PAC-Channel-Code": "mock.channel.code",
-        "PAC-Organization-ID": "OrganizationID",
-        "User-Agent": "StudentSection/v1.0",
-        "Accept": "application/json"
-    }
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 404:
-        return jsonify({"error": f"No tickets found for paciolan_id={paciolan_id}, season={season_code}"}), 404
-    elif response.status_code != 200:
-        return jsonify({"error": f"Mock API error: {response.status_code}"}), 502
-
-    # 6) Parse the response and build ticket documents
-    data_json = response.json()
-    event_tickets = data_json.get("value", {}).get("lineItemOHVos", [])
-    
-    best_match = None
-    best_score = 0
-    
-    for order in event_tickets:
-        print(f"Processing order ID: {order.get('id', 'N/A')}")
-        events = order.get("eventOHVos", [])
-        if not events:
-            print("No events found in this order.")
-            continue
+        return parser.parse(frontend_datetime)
+
+
+class IndexedEvent:
+    """A Paciolan event with its name and venue pre-normalized and its date pre-parsed."""
+    __slots__ = ("name_norm", "name_tokens", "venue_norm", "event_dt", "event")
+
+    def __init__(self, name_norm: str, name_tokens: str, venue_norm: str, event_dt: datetime, event: dict):
+        self.name_norm = name_norm
+        self.name_tokens = name_tokens
+        self.venue_norm = venue_norm
+        self.event_dt = event_dt
+        self.event = event
+
 
-        for event in events:
-            # Normalize Paciolan event name and venue.
-            event_name = event.get('name', '')
-            event_facility = event.get('facility', '')
-            event_name_norm = re.sub(r'\W+', '', normalize_text(event_name))
-            event_venue_norm = re.sub(r'\W+', '', normalize_text(event_facility))
-            
-            print(f"Processing event: '{event_name}' at '{event_facility}'")
-            
-            # Parse Paciolan event date/time.
+def build_event_index(orders_json: dict) -> Dict:
+    """
+    Turn a patron orders payload into {event date: [IndexedEvent, ...]}.
+    Events keep their payload order within each date so matching results are unchanged.
+    Events whose eventDtStr cannot be parsed are left out, as the matcher always skipped them.
+    """
+    index = defaultdict(list)
+    for order in orders_json.get("value", {}).get("lineItemOHVos", []):
+        for event in order.get("eventOHVos", []) or []:
             try:
                 event_dt = parser.parse(event.get('eventDtStr', ''))
-                print(f"Parsed event date: {event_dt.date()}")
             except Exception as e:
-                print(f"Failed to parse event date for event '{event_name}'. Error: {e}")
+                print(f"Failed to parse event date for event '{event.get('name', '')}'. Error: {e}")
                 continue
-            
-            # Compare only the dates.
-            if event_dt.date() != target_date:
-                print(f"Date mismatch: event date {event_dt.date()} does not equal target date {target_date}")
-                continue
-            
-            # Compute fuzzy similarity scores for event name.
-            name_score = fuzz.ratio(norm_name, event_name_norm)
-            
-            # Compute venue score and adjust if necessary.
-            venue_score = fuzz.ratio(norm_venue, event_venue_norm)
-            # If venue score is low but the event venue is a substring of the target venue, then set score to 100.
-            if venue_score < 90 and event_venue_norm in norm_venue:
-                print(f"Adjusting venue score for '{event_facility}' since it is contained in target venue.")
-                venue_score = 100
-            
-            print(f"Fuzzy scores for '{event_name}' - Name: {name_score}, Venue: {venue_score}")
-            
-            # Only consider events where both scores are high.
-            if name_score >= 90 and venue_score >= 90:
-                total_score = name_score + venue_score
-                if total_score > best_score:
-                    best_score = total_score
-                    best_match = event
-                    print(f"New best match found: '{event_name}' with score {total_score}")
-                if best_score == 200:  # Perfect match (100+100)
-                    print("Perfect match found. Exiting loop.")
-                    break
-            else:
-                print(f"Skipping event '{event_name}' due to low score.")
-        
-        if best_score == 200:
+            index[event_dt.date()].append(IndexedEvent(
+                normalize_key(event.get('name', '')),
+                normalize_tokens(event.get('name', '')),
+                normalize_key(event.get('facility', '')),
+                event_dt,
+                event
+            ))
+    return dict(index)
+
+
+def _best_match(candidates: List[IndexedEvent], norm_name: str, norm_venue: str, name_tokens: Optional[str] = None) -> Optional[dict]:
+    """
+    Score the candidates for one date; both name and venue must score at least MATCH_CUTOFF.
+    When name_tokens is given, the name score is the better of the plain and token-set scores,
+    so reordered or shortened names ("Xavier" vs "Xavier Musketeers") still match.
+    """
+    best_match = None
+    best_score = 0
+    for candidate in candidates:
+        # Compute fuzzy similarity scores for event name.
+        name_score = scorer.ratio(norm_name, candidate.name_norm, score_cutoff=MATCH_CUTOFF)
+        if name_tokens is not None and name_score < 100:
+            name_score = max(name_score, scorer.token_set_ratio(name_tokens, candidate.name_tokens, score_cutoff=MATCH_CUTOFF))
+        if name_score < MATCH_CUTOFF:
+            continue
+
+        # Compute venue score and adjust if necessary.
+        venue_score = scorer.ratio(norm_venue, candidate.venue_norm, score_cutoff=MATCH_CUTOFF)
+        # If venue score is low but the event venue is a substring of the target venue, then set score to 100.
+        if venue_score < MATCH_CUTOFF and candidate.venue_norm in norm_venue:
+            venue_score = 100
+        if venue_score < MATCH_CUTOFF:
+            continue
+
+        total_score = name_score + venue_score
+        if total_score > best_score:
+            best_score = total_score
+            best_match = candidate.event
+        if best_score == 200:  # Perfect match (100+100)
             break
+    return best_match
+
+
+def match_event(index: Dict, frontend_name: str, frontend_venue: str, frontend_datetime: str, token_set: bool = False) -> Optional[dict]:
+    """Return the best matching event from a prebuilt index, or None."""
+    target_date = parse_target_datetime(frontend_datetime).date()
+    candidates = index.get(target_date)
+    if not candidates:
+        return None
+    name_tokens = normalize_tokens(frontend_name) if token_set else None
+    return _best_match(candidates, normalize_key(frontend_name), normalize_key(frontend_venue), name_tokens)
+
+
+def fuzzy_match_event(frontend_name: str, frontend_venue: str, frontend_datetime: str, paciolan_id: str, client, orders_cache=None, token_set: bool = False) -> Optional[dict]:
+    """
+    Fuzzy match an event from the Paciolan API using the frontend event details.
+
+    :param frontend_name: The event name provided by the frontend.
+    :param frontend_venue: The venue provided by the frontend.
+    :param frontend_datetime: The event date/time in ISO 8601 format.
+    :param paciolan_id: The seller's Paciolan patron ID.
+    :param client: The shared PaciolanClient used to fetch the patron's orders.
+    :param orders_cache: Optional OrdersCache; when given, the event index is read through it.
+    :param token_set: Also accept names that match on token-set score (reordered/extra words).
+    :return: The best matching event dict from Paciolan, or None if no match is found.
+    :raises OrdersFetchError: The patron's orders couldn't be fetched (e.g. 404 for an unknown patron).
+    """
+    season_code = SEASON_CODE
+
+    # Parse the frontend datetime string up front so bad input fails before any network call.
+    parse_target_datetime(frontend_datetime)
+
+    # Retrieve the event index (built from the Paciolan orders, or the orders cache).
+    if orders_cache is not None:
+        index = orders_cache.get_derived(paciolan_id, season_code)
+    else:
+        index = build_event_index(fetch_patron_orders(client, paciolan_id, season_code))
 
+    best_match = match_event(index, frontend_name, frontend_venue, frontend_datetime, token_set)
     if not best_match:
         print("No matching event found after processing all events.")
 
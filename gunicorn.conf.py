@@ -0,0 +1,38 @@
+"""
+Gunicorn settings for the backend (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Worker model, all overridable from the environment:
+    WEB_CONCURRENCY        worker processes (default 2 x CPUs + 1)
+    GUNICORN_WORKER_CLASS  "gthread" (default) for threaded workers, or "gevent"
+                           for green threads (requires `pip install gevent`)
+    GUNICORN_THREADS       request threads per gthread worker (default 8)
+    GUNICORN_CONNECTIONS   concurrent connections per gevent worker (default 100)
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted (default 60)
+    PORT                   listen port (default 5000)
+
+Each worker builds its own Mongo, Redis and Paciolan clients after fork (see
+clients.py). Unless MONGO_MAX_POOL_SIZE / REDIS_MAX_CONNECTIONS are set, their
+pools are sized to the worker's concurrency plus the background threads
+(log shipper, hold sweeper, JOB_WORKERS job workers).
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_CONNECTIONS", "100"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# gevent has to patch the standard library before the app imports it, which only
+# happens in the worker; with threads the app is loaded once and forked.
+green = worker_class in ("gevent", "eventlet")
+preload_app = not green
+
+concurrency = worker_connections if green else threads
+background_threads = 2 + int(os.getenv("JOB_WORKERS", "4"))
+os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(concurrency + background_threads))
+os.environ.setdefault("REDIS_MAX_CONNECTIONS", str(concurrency + background_threads))
@@ -0,0 +1,263 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import redis
+from bson import ObjectId
+
+from ticket_state import PAID_STATUSES, TicketStateError, begin_release, finish_release
+
+logger = logging.getLogger(__name__)
+
+
+class TicketHolds:
+    """
+    Expiry for pending-purchase holds.
+
+    When a buyer starts a purchase the ticket is held for them until `hold_seconds`
+    from now: the deadline is stored on the ticket (hold_expires_at) and the ticket
+    id is added to a Redis sorted set scored by that deadline. A background sweeper
+    in every process claims due entries in batches (a ZREM that returns 1 is the
+    claim, so two sweepers never release the same ticket).
+
+    A hold with a PaymentIntent is first settled with `payment_status` (which cancels
+    an unpaid intent); a hold whose payment succeeded or is processing is handed to
+    `on_paid` to finish the purchase instead of being released. Otherwise a guarded
+    update moves the ticket from pending to releasing, the Paciolan transfer is
+    cancelled, and the ticket is made available. Holds that were converted,
+    cancelled or extended in the meantime are skipped; a failed Paciolan
+    cancellation leaves the ticket releasing and is retried after `retry_delay` seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        tickets_collection,
+        cancel_transfer: Callable[[str], bool],
+        hold_seconds: int = 900,
+        sweep_interval: float = 15.0,
+        batch_size: int = 100,
+        retry_delay: int = 60,
+        key: str = "ticket_holds",
+        sweeper: bool = True,
+        payment_status: Optional[Callable[[Dict], Optional[str]]] = None,
+        on_paid: Optional[Callable[[str, str], None]] = None,
+    ):
+        """
+        :param redis_client: redis.Redis instance holding the expiry sorted set
+        :param cancel_transfer: Callable(confirmation_code) returning True once the Paciolan transfer is cancelled
+        :param hold_seconds: How long a buyer keeps a ticket before it is released
+        :param sweep_interval: Seconds between sweeps for expired holds
+        :param sweeper: Run the sweeper in this process; False leaves expiry to other processes
+        :param payment_status: Callable(ticket) returning the current status of the ticket's PaymentIntent,
+            cancelling it first if it can still be cancelled. Defaults to the stored payment_status.
+        :param on_paid: Callable(ticket_id, buyer_id) finishing the purchase of an expired hold that was paid
+        """
+        self.redis = redis_client
+        self.tickets = tickets_collection
+        self.cancel_transfer = cancel_transfer
+        self.hold_seconds = hold_seconds
+        self.sweep_interval = sweep_interval
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.key = key
+        self.sweeper = sweeper
+        self.payment_status = payment_status
+        self.on_paid = on_paid
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+        self._pid = None
+
+        self.metrics = {
+            "created": 0,
+            "extended": 0,
+            "converted": 0,
+            "canceled": 0,
+            "expired": 0,
+            "paid_at_expiry": 0,
+            "release_failures": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    # ------------------------------
+    # Hold lifecycle (called from the purchase endpoints)
+    # ------------------------------
+    def new_deadline(self) -> datetime:
+        """Expiry for a hold starting now (naive UTC, like the rest of the ticket timestamps)."""
+        return datetime.utcnow() + timedelta(seconds=self.hold_seconds)
+
+    def _schedule(self, ticket_id: str, expires_at: datetime):
+        score = (expires_at - datetime(1970, 1, 1)).total_seconds()
+        try:
+            self.redis.zadd(self.key, {str(ticket_id): score})
+        except redis.RedisError as e:
+            logger.error("Failed to schedule hold expiry for ticket %s: %s", ticket_id, e)
+
+    def _unschedule(self, ticket_id: str):
+        try:
+            self.redis.zrem(self.key, str(ticket_id))
+        except redis.RedisError as e:
+            # The sweeper will find the ticket no longer pending and drop it then.
+            logger.warning("Failed to unschedule hold for ticket %s: %s", ticket_id, e)
+
+    def created(self, ticket_id: str, expires_at: datetime):
+        self._schedule(ticket_id, expires_at)
+        self._count("created")
+
+    def extended(self, ticket_id: str, expires_at: datetime):
+        self._schedule(ticket_id, expires_at)
+        self._count("extended")
+
+    def converted(self, ticket_id: str):
+        self._unschedule(ticket_id)
+        self._count("converted")
+
+    def canceled(self, ticket_id: str):
+        self._unschedule(ticket_id)
+        self._count("canceled")
+
+    # ------------------------------
+    # Expiry
+    # ------------------------------
+    def _claim_due(self, now_ts: float) -> List[str]:
+        due = self.redis.zrangebyscore(self.key, "-inf", now_ts, start=0, num=self.batch_size)
+        if not due:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for ticket_id in due:
+            pipe.zrem(self.key, ticket_id)
+        claimed = pipe.execute()
+        return [t.decode() if isinstance(t, bytes) else t for t, won in zip(due, claimed) if won]
+
+    def _release(self, ticket_id: str, now: datetime):
+        try:
+            oid = ObjectId(ticket_id)
+        except Exception:
+            return
+        ticket = self.tickets.find_one({"_id": oid, "status": {"$in": ["pending", "releasing"]}})
+        if not ticket:
+            # Confirmed or cancelled since the hold was scheduled.
+            return
+        buyer_id = ticket.get("buyer_id")
+
+        if ticket["status"] == "pending":
+            expires_at = ticket.get("hold_expires_at")
+            if expires_at and expires_at > now:
+                # The hold was extended; wait for the new deadline.
+                self._schedule(ticket_id, expires_at)
+                return
+
+            payment_status = ticket.get("payment_status")
+            if ticket.get("transaction_id") and self.payment_status is not None:
+                payment_status = self.payment_status(ticket)
+            if payment_status in PAID_STATUSES:
+                # The buyer paid (or is paying): finish the purchase rather than resell the ticket
+                self._count("paid_at_expiry")
+                if self.on_paid is not None:
+                    self.on_paid(ticket_id, str(buyer_id))
+                else:
+                    self._schedule(ticket_id, now + timedelta(seconds=self.retry_delay))
+                return
+
+            try:
+                # From here on confirm and extend can't match the ticket
+                begin_release(self.tickets, oid, buyer_id, now)
+            except TicketStateError:
+                # Converted, cancelled, paid or extended after we read it
+                return
+
+        confirmation_code = ticket.get("transfer", {}).get("confirmationCd")
+        if confirmation_code and not self.cancel_transfer(confirmation_code):
+            self._count("release_failures")
+            logger.warning("Paciolan cancel failed for expired hold on ticket %s; retrying later", ticket_id)
+            self._schedule(ticket_id, now + timedelta(seconds=self.retry_delay))
+            return
+
+        try:
+            finish_release(self.tickets, oid, buyer_id)
+        except TicketStateError:
+            return
+        self._count("expired")
+
+    def release_expired(self, now: Optional[datetime] = None) -> int:
+        """Release every hold whose deadline has passed. Returns how many tickets were claimed."""
+        now = now or datetime.utcnow()
+        now_ts = (now - datetime(1970, 1, 1)).total_seconds()
+        total = 0
+        while True:
+            batch = self._claim_due(now_ts)
+            for ticket_id in batch:
+                try:
+                    self._release(ticket_id, now)
+                except Exception as e:
+                    self._count("release_failures")
+                    logger.error("Releasing expired hold on ticket %s failed: %s", ticket_id, e)
+                    self._schedule(ticket_id, now + timedelta(seconds=self.retry_delay))
+            total += len(batch)
+            if len(batch) < self.batch_size:
+                return total
+
+    # ------------------------------
+    # Background sweeper
+    # ------------------------------
+    def ensure_worker(self):
+        # Threads don't survive a fork, so each process starts its own sweeper.
+        if not self.sweeper:
+            return
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._worker = threading.Thread(target=self._run, name="hold-expiry", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.release_expired()
+            except redis.RedisError as e:
+                logger.warning("Hold expiry sweep failed: %s", e)
+            except Exception as e:
+                logger.error("Hold expiry sweep failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.metrics)
+        try:
+            stats["scheduled"] = self.redis.zcard(self.key)
+        except redis.RedisError:
+            pass
+        return stats
+
+
+def holds_from_env(redis_client, tickets_collection, cancel_transfer, payment_status=None, on_paid=None) -> TicketHolds:
+    """
+    Build TicketHolds from TICKET_HOLD_* environment variables. The sweeper is started by
+    ensure_worker() in each serving process (not here, which may be a preforking master)
+    unless TICKET_HOLD_SWEEPER=false.
+    """
+    return TicketHolds(
+        redis_client,
+        tickets_collection,
+        cancel_transfer,
+        payment_status=payment_status,
+        on_paid=on_paid,
+        hold_seconds=int(os.getenv("TICKET_HOLD_SECONDS", "900")),
+        sweep_interval=float(os.getenv("TICKET_HOLD_SWEEP_INTERVAL", "15")),
+        batch_size=int(os.getenv("TICKET_HOLD_SWEEP_BATCH", "100")),
+        retry_delay=int(os.getenv("TICKET_HOLD_RETRY_DELAY", "60")),
+        sweeper=os.getenv("TICKET_HOLD_SWEEPER", "true").lower() == "true",
+    )
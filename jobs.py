@@ -0,0 +1,384 @@
+import os
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """Raised by a handler when retrying cannot help; the job is marked failed without further attempts."""
+
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler that is waiting on something outside the queue (e.g. a Stripe webhook).
+    The job runs again after `delay` seconds (the queue's defer_delay by default), or sooner
+    if woken, and the attempt doesn't count towards max_attempts.
+    """
+
+    def __init__(self, message: str, delay: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+class JobQueue:
+    """
+    Redis-backed job queue with a worker thread pool.
+
+    Keys (under `key_prefix`):
+        job:<id>         hash with name, key, payload, status, attempts, result, error, ...
+        key:<name>:<key> id of the queued/running job for that idempotency key
+        ready            list of job ids waiting for a worker
+        processing       list of job ids a worker has claimed (BLMOVE from ready)
+        delayed          sorted set of job ids waiting out a retry backoff, scored by due time
+        dead             list of job ids that ran out of attempts
+
+    enqueue() is idempotent per (name, key): while a job for that key is queued
+    or running, enqueueing again returns the existing job id. Handlers must be
+    idempotent too, since a job whose worker died (lease expired) is run again.
+    Failures back off exponentially with jitter up to `max_attempts`, after
+    which the job is dead-lettered. A handler that raises JobDeferred is waiting
+    rather than failing: it is re-run every `defer_delay` seconds without using
+    up attempts, and wake() re-runs it at once. Finished jobs are kept for
+    `result_ttl` so their status can be polled.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        workers: int = 4,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 120.0,
+        visibility_timeout: float = 120.0,
+        result_ttl: int = 86400,
+        defer_delay: float = 30.0,
+        poll_timeout: int = 1,
+        key_prefix: str = "jobs:",
+    ):
+        """
+        :param redis_client: redis.Redis instance created with decode_responses=True
+        :param workers: Worker threads per process
+        :param max_attempts: Attempts before a job is dead-lettered
+        :param backoff_base: Seconds before the first retry; doubles per attempt up to backoff_max
+        :param visibility_timeout: Seconds a claimed job may run before another worker reclaims it
+        :param result_ttl: Seconds a finished job's status and result are kept
+        :param defer_delay: Seconds before a deferred job (JobDeferred) runs again
+        """
+        self.redis = redis_client
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.visibility_timeout = visibility_timeout
+        self.result_ttl = result_ttl
+        self.defer_delay = defer_delay
+        self.poll_timeout = poll_timeout
+        self.key_prefix = key_prefix
+
+        self.ready_key = f"{key_prefix}ready"
+        self.processing_key = f"{key_prefix}processing"
+        self.delayed_key = f"{key_prefix}delayed"
+        self.dead_key = f"{key_prefix}dead"
+
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._next_maintenance = 0.0
+
+        self.metrics = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+            "dead_lettered": 0,
+            "deferred": 0,
+            "reclaimed": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}job:{job_id}"
+
+    def _idempotency_key(self, name: str, key: str) -> str:
+        return f"{self.key_prefix}key:{name}:{key}"
+
+    def handler(self, name: str):
+        """Decorator registering the function that runs jobs called `name`."""
+        def register(func):
+            self.handlers[name] = func
+            return func
+        return register
+
+    # ------------------------------
+    # Producer side
+    # ------------------------------
+    def enqueue(self, name: str, key: str, payload: Dict[str, Any], owner: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Queue a job unless one for (name, key) is already queued or running.
+        :param key: Idempotency key, e.g. the ticket id
+        :param owner: User allowed to read the job's status
+        Returns (job_id, created).
+        """
+        self.ensure_workers()
+        idempotency_key = self._idempotency_key(name, key)
+        job_id = uuid.uuid4().hex
+        if not self.redis.set(idempotency_key, job_id, nx=True, ex=self.result_ttl):
+            existing = self.redis.get(idempotency_key)
+            if existing and self.redis.exists(self._job_key(existing)):
+                self._count("deduplicated")
+                return existing, False
+            # The job it pointed at never made it into Redis; take the key over.
+            self.redis.set(idempotency_key, job_id, ex=self.result_ttl)
+
+        now = datetime.utcnow().isoformat() + "Z"
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "name": name,
+            "key": key,
+            "owner": owner or "",
+            "payload": json.dumps(payload),
+            "status": "queued",
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.lpush(self.ready_key, job_id)
+        pipe.execute()
+        self._count("enqueued")
+        return job_id, True
+
+    def wake(self, job_id: str) -> bool:
+        """Make a job waiting out a retry or deferral due now. Returns whether it was waiting."""
+        return bool(self.redis.zadd(self.delayed_key, {job_id: time.time()}, xx=True, ch=True))
+
+    def active_job(self, name: str, key: str) -> Optional[str]:
+        """Id of the queued or running job for (name, key), if any."""
+        return self.redis.get(self._idempotency_key(name, key))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.hgetall(self._job_key(job_id))
+        if not raw:
+            return None
+        job = {
+            "job_id": job_id,
+            "name": raw.get("name"),
+            "key": raw.get("key"),
+            "owner": raw.get("owner") or None,
+            "status": raw.get("status"),
+            "attempts": int(raw.get("attempts", 0)),
+            "created_at": raw.get("created_at"),
+            "updated_at": raw.get("updated_at"),
+            "error": raw.get("error"),
+            "result": json.loads(raw["result"]) if raw.get("result") else None,
+        }
+        return job
+
+    # ------------------------------
+    # Worker side
+    # ------------------------------
+    def _finish(self, job_id: str, job: Dict[str, str], status: str,
+                result: Any = None, error: Optional[str] = None):
+        fields = {"status": status, "updated_at": datetime.utcnow().isoformat() + "Z"}
+        if result is not None:
+            fields["result"] = json.dumps(result, default=str)
+        if error is not None:
+            fields["error"] = error
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping=fields)
+        if status == "succeeded":
+            pipe.hdel(self._job_key(job_id), "error")
+        pipe.expire(self._job_key(job_id), self.result_ttl)
+        pipe.lrem(self.processing_key, 1, job_id)
+        if status == "dead":
+            pipe.lpush(self.dead_key, job_id)
+        pipe.execute()
+        # Free the idempotency key so a later purchase of the same ticket gets a fresh job
+        idempotency_key = self._idempotency_key(job.get("name", ""), job.get("key", ""))
+        if self.redis.get(idempotency_key) == job_id:
+            self.redis.delete(idempotency_key)
+
+    def _retry_or_dead(self, job_id: str, job: Dict[str, str], attempts: int, error: str):
+        if attempts >= self.max_attempts:
+            self._count("dead_lettered")
+            logger.error("Job %s (%s) dead-lettered after %d attempts: %s", job_id, job.get("name"), attempts, error)
+            self._finish(job_id, job, "dead", error=error)
+            return
+        self._count("retried")
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1))) * random.uniform(0.5, 1.0)
+        self._delay(job_id, delay, error)
+
+    def _defer(self, job_id: str, error: str, delay: Optional[float]):
+        self._count("deferred")
+        self.redis.hincrby(self._job_key(job_id), "attempts", -1)
+        self._delay(job_id, self.defer_delay if delay is None else delay, error)
+
+    def _delay(self, job_id: str, delay: float, error: str):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "status": "retrying",
+            "error": error,
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        })
+        pipe.hdel(self._job_key(job_id), "lease_until")
+        pipe.zadd(self.delayed_key, {job_id: time.time() + delay})
+        pipe.lrem(self.processing_key, 1, job_id)
+        pipe.execute()
+
+    def run_job(self, job_id: str):
+        """Run one claimed job to completion, retry or dead letter."""
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            self.redis.lrem(self.processing_key, 1, job_id)
+            return
+        attempts = self.redis.hincrby(self._job_key(job_id), "attempts", 1)
+        self.redis.hset(self._job_key(job_id), mapping={
+            "status": "running",
+            "lease_until": time.time() + self.visibility_timeout,
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        })
+
+        handler = self.handlers.get(job["name"])
+        if handler is None:
+            self._count("failed")
+            self._finish(job_id, job, "failed", error=f"No handler for {job['name']}")
+            return
+        try:
+            result = handler(json.loads(job["payload"]))
+        except JobFailed as e:
+            self._count("failed")
+            self._finish(job_id, job, "failed", error=str(e))
+        except JobDeferred as e:
+            self._defer(job_id, str(e), e.delay)
+        except Exception as e:
+            logger.warning("Job %s (%s) attempt %d failed: %s", job_id, job["name"], attempts, e)
+            self._retry_or_dead(job_id, job, attempts, str(e))
+        else:
+            self._count("succeeded")
+            self._finish(job_id, job, "succeeded", result=result)
+
+    def _promote_due(self):
+        """Move retries whose backoff has elapsed back onto the ready list."""
+        due = self.redis.zrangebyscore(self.delayed_key, "-inf", time.time(), start=0, num=100)
+        for job_id in due:
+            # Whoever removes it from the delayed set owns the move
+            if self.redis.zrem(self.delayed_key, job_id):
+                self.redis.lpush(self.ready_key, job_id)
+
+    def _reclaim_expired(self):
+        """Requeue jobs whose worker stopped renewing them (crashed or hung past the visibility timeout)."""
+        now = time.time()
+        for job_id in self.redis.lrange(self.processing_key, 0, -1):
+            lease_until = self.redis.hget(self._job_key(job_id), "lease_until")
+            if lease_until is not None and float(lease_until) > now:
+                continue
+            if lease_until is None and self.redis.exists(self._job_key(job_id)):
+                # Claimed but not started yet; give its worker one lease before reclaiming
+                self.redis.hsetnx(self._job_key(job_id), "lease_until", now + self.visibility_timeout)
+                continue
+            if self.redis.lrem(self.processing_key, 1, job_id):
+                self._count("reclaimed")
+                job = self.redis.hgetall(self._job_key(job_id))
+                if not job:
+                    continue
+                self._retry_or_dead(job_id, job, int(job.get("attempts", 0)), "Worker lease expired")
+
+    def maintain(self):
+        self._promote_due()
+        self._reclaim_expired()
+
+    def work_once(self) -> bool:
+        """Claim and run one job, waiting up to poll_timeout. Returns whether a job ran."""
+        now = time.monotonic()
+        if now >= self._next_maintenance:
+            self._next_maintenance = now + 1.0
+            self.maintain()
+        job_id = self.redis.blmove(self.ready_key, self.processing_key, self.poll_timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return False
+        self.run_job(job_id)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.work_once()
+            except redis.RedisError as e:
+                logger.warning("Job worker Redis error: %s", e)
+                self._stop.wait(1.0)
+            except Exception as e:
+                logger.error("Job worker error: %s", e)
+
+    def ensure_workers(self):
+        # Threads don't survive a fork, so each process starts its own pool.
+        if self.workers <= 0 or (self._threads and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def run_forever(self):
+        """Run the worker pool in the foreground (for a dedicated worker process)."""
+        self.ensure_workers()
+        try:
+            while any(t.is_alive() for t in self._threads):
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.metrics)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.llen(self.ready_key)
+            pipe.llen(self.processing_key)
+            pipe.zcard(self.delayed_key)
+            pipe.llen(self.dead_key)
+            stats["ready"], stats["processing"], stats["delayed"], stats["dead"] = pipe.execute()
+        except redis.RedisError:
+            pass
+        return stats
+
+
+def queue_from_env(redis_client) -> JobQueue:
+    """
+    Build the JobQueue from JOB_* environment variables. Set JOB_WORKERS=0 on web
+    processes when jobs are run by a dedicated `flask --app app run-jobs` process.
+    """
+    return JobQueue(
+        redis_client,
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+        backoff_base=float(os.getenv("JOB_BACKOFF_BASE", "2")),
+        backoff_max=float(os.getenv("JOB_BACKOFF_MAX", "120")),
+        visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120")),
+        result_ttl=int(os.getenv("JOB_RESULT_TTL", "86400")),
+        defer_delay=float(os.getenv("JOB_DEFER_DELAY", "30")),
+    )
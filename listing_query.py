@@ -0,0 +1,139 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models import Listing
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the fields GET /tickets emits are read from Mongo.
+LISTING_PROJECTION = {
+    "_id": 1, "seller_id": 1, "school_name": 1, "event_code": 1, "event_name": 1,
+    "event_date": 1, "venue": 1, "section": 1, "row": 1, "seat": 1, "level": 1,
+    "price": 1, "currency": 1,
+}
+
+# Listings are returned in (event_date, _id) order; the cursor is the last key a page ended on.
+LISTING_SORT = [("event_date", 1), ("_id", 1)]
+
+
+class ListingQueryError(ValueError):
+    """Raised for malformed filter or cursor parameters; maps to a 400 response."""
+
+
+def encode_cursor(event_date: datetime, ticket_id: ObjectId) -> str:
+    raw = json.dumps({"d": event_date.isoformat(), "i": str(ticket_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["d"]), ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error, UnicodeError):
+        raise ListingQueryError("Invalid cursor")
+
+
+def _parse_date(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ListingQueryError(f"Invalid {name}; must be ISO-8601")
+
+
+def _parse_price(value: str, name: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        raise ListingQueryError(f"Invalid {name}; must be a number")
+
+
+def parse_listing_args(args) -> Dict[str, Any]:
+    """
+    Parse GET /tickets query parameters:
+      school, event, event_code  exact matches
+      date_from, date_to         ISO-8601, inclusive
+      price_min, price_max       numbers, inclusive
+      limit                      page size (default 50, max 200)
+      cursor                     opaque value from a previous page's "next"
+    """
+    params = {
+        "school": args.get("school") or None,
+        "event": args.get("event") or None,
+        "event_code": args.get("event_code") or None,
+        "date_from": _parse_date(args["date_from"], "date_from") if args.get("date_from") else None,
+        "date_to": _parse_date(args["date_to"], "date_to") if args.get("date_to") else None,
+        "price_min": _parse_price(args["price_min"], "price_min") if args.get("price_min") else None,
+        "price_max": _parse_price(args["price_max"], "price_max") if args.get("price_max") else None,
+        "after": decode_cursor(args["cursor"]) if args.get("cursor") else None,
+    }
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ListingQueryError("Invalid limit; must be an integer")
+    if limit < 1:
+        raise ListingQueryError("Invalid limit; must be at least 1")
+    params["limit"] = min(limit, MAX_PAGE_SIZE)
+    return params
+
+
+def build_listing_query(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Mongo filter for one page of available listings."""
+    query = {"status": "available"}
+    if params["school"]:
+        query["school_name"] = params["school"]
+    if params["event"]:
+        query["event_name"] = params["event"]
+    if params["event_code"]:
+        query["event_code"] = params["event_code"]
+
+    # Older tickets can lack event_date; they have no place in (event_date, _id) order,
+    # so they are left out here just as the listing view leaves them out
+    date_range = {"$type": "date"}
+    if params["date_from"]:
+        date_range["$gte"] = params["date_from"]
+    if params["date_to"]:
+        date_range["$lte"] = params["date_to"]
+    query["event_date"] = date_range
+
+    price_range = {}
+    if params["price_min"] is not None:
+        price_range["$gte"] = params["price_min"]
+    if params["price_max"] is not None:
+        price_range["$lte"] = params["price_max"]
+    if price_range:
+        query["price"] = price_range
+
+    after: Optional[Tuple[datetime, ObjectId]] = params["after"]
+    if after:
+        after_date, after_id = after
+        query["$or"] = [
+            {"event_date": {"$gt": after_date}},
+            {"event_date": after_date, "_id": {"$gt": after_id}},
+        ]
+    return query
+
+
+def serialize_listing(t: Dict[str, Any]) -> Listing:
+    return Listing(
+        ticket_id=t["_id"],
+        seller_id=t["seller_id"],
+        school_name=t.get("school_name", ""),
+        event_code=t.get("event_code", ""),
+        event_name=t.get("event_name", ""),
+        event_date=t.get("event_date"),
+        venue=t.get("venue", ""),
+        section=t.get("section", ""),
+        row=t.get("row", ""),
+        seat=t.get("seat", ""),
+        level=t.get("level", ""),
+        price=t.get("price", 0),
+        currency=t.get("currency", "USD"),
+    )
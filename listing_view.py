@@ -0,0 +1,346 @@
+"""
+In-process view of available listings, kept current by a MongoDB change stream.
+
+GET /tickets is served from memory when the view is fresh. Each process seeds
+the view from a find() of available tickets, then follows a change stream on
+the tickets collection. The stream is opened before the seed read, so no write
+can fall between the two. Events carry the full document (updateLookup), so
+applying one twice is harmless. The last resume token is kept, so a dropped
+connection picks up where it left off. If the token has fallen off the oplog,
+or the collection is dropped or renamed, the view reseeds.
+
+Listings are stored as models.Listing Structs (slotted, and exactly what the
+endpoint returns). Keys are (event_date, _id), the same order as the Mongo
+query. There is one sorted key list for all listings and one per school,
+event and event code, so a filtered page is a bisect plus a short scan.
+
+Change streams need a replica set; a local single-node one works (see the
+README). Against a standalone server the view logs an error and stays empty.
+GET /tickets then reads from Mongo, as it also does while the view is
+seeding or lags by more than `max_staleness` seconds.
+"""
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from listing_query import LISTING_PROJECTION, serialize_listing
+from models import Listing
+
+logger = logging.getLogger(__name__)
+
+# GET /tickets parameter -> indexed Listing field
+INDEXED_FIELDS = {"school": "school_name", "event": "event_name", "event_code": "event_code"}
+
+# Server errors meaning the resume token can no longer be used: CappedPositionLost,
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+RESYNC_ERROR_CODES = {136, 260, 280, 286}
+# "$changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+# Events after which the stream is closed for good
+RESYNC_OPERATIONS = {"invalidate", "drop", "rename", "dropDatabase"}
+
+# Only ship the fields a listing needs with each event
+CHANGE_PIPELINE = [
+    {"$project": {
+        "operationType": 1,
+        "documentKey": 1,
+        "clusterTime": 1,
+        "wallTime": 1,
+        "fullDocument.status": 1,
+        **{f"fullDocument.{field}": 1 for field in LISTING_PROJECTION},
+    }},
+]
+
+Key = Tuple[datetime, ObjectId]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Mongo returns naive UTC datetimes; query parameters may carry an offset.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _is_listed(doc: Optional[Dict[str, Any]]) -> bool:
+    return bool(doc) and doc.get("status") == "available" and isinstance(doc.get("event_date"), datetime)
+
+
+class ListingView:
+    def __init__(
+        self,
+        tickets_collection,
+        max_staleness: float = 5.0,
+        max_await_ms: int = 1000,
+        retry_delay: float = 2.0,
+    ):
+        """
+        :param tickets_collection: The tickets collection (must be on a replica set)
+        :param max_staleness: Serve from memory only if the view has caught up with the
+            stream within this many seconds
+        :param max_await_ms: How long each change stream getMore waits for new events
+        :param retry_delay: Seconds to wait before reopening the stream after an error
+        """
+        self.tickets = tickets_collection
+        self.max_staleness = max_staleness
+        self.max_await_ms = max_await_ms
+        self.retry_delay = retry_delay
+
+        self._lock = threading.RLock()
+        self._records: Dict[ObjectId, Listing] = {}
+        self._order: List[Key] = []
+        self._indexes: Dict[str, Dict[Any, List[Key]]] = {field: {} for field in INDEXED_FIELDS.values()}
+        self._resume_token = None
+        self._ready = False
+        self._synced_at: Optional[float] = None  # time.monotonic() the view was last known current
+
+        self._worker: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.metrics = {"seeds": 0, "resyncs": 0, "changes": 0, "stream_errors": 0, "served": 0, "fallbacks": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    # ------------------------------
+    # Maintenance
+    # ------------------------------
+    @staticmethod
+    def _key(listing: Listing) -> Key:
+        return listing.event_date, listing.ticket_id
+
+    def _add(self, listing: Listing):
+        self._remove(listing.ticket_id)
+        key = self._key(listing)
+        self._records[listing.ticket_id] = listing
+        insort(self._order, key)
+        for field, index in self._indexes.items():
+            insort(index.setdefault(getattr(listing, field), []), key)
+
+    def _remove(self, ticket_id: ObjectId):
+        listing = self._records.pop(ticket_id, None)
+        if listing is None:
+            return
+        key = self._key(listing)
+        del self._order[bisect_left(self._order, key)]
+        for field, index in self._indexes.items():
+            value = getattr(listing, field)
+            keys = index[value]
+            del keys[bisect_left(keys, key)]
+            if not keys:
+                del index[value]
+
+    def _apply(self, change: Dict[str, Any]):
+        ticket_id = change["documentKey"]["_id"]
+        doc = change.get("fullDocument")
+        if change["operationType"] != "delete" and _is_listed(doc):
+            self._add(serialize_listing(doc))
+        else:
+            # Deleted, no longer available, or already gone by the time the event was read
+            self._remove(ticket_id)
+
+    def _mark_synced(self, change: Optional[Dict[str, Any]] = None):
+        now = time.monotonic()
+        if change is not None:
+            # Under steady writes the stream never reports an empty batch; use the event's age instead.
+            event_time = change.get("wallTime")
+            if event_time is None and change.get("clusterTime") is not None:
+                event_time = change["clusterTime"].as_datetime()
+            if event_time is None:
+                return
+            lag = (datetime.utcnow() - _naive_utc(event_time)).total_seconds()
+            now -= max(0.0, lag)
+        if self._synced_at is None or now > self._synced_at:
+            self._synced_at = now
+
+    def seed(self):
+        """Rebuild the view from a fresh read of available tickets."""
+        with self.tickets.watch(CHANGE_PIPELINE, full_document="updateLookup") as stream:
+            # The token of the stream's opening point: replaying from it covers every
+            # write the read below might miss.
+            token = stream.resume_token
+        records, order = {}, []
+        indexes = {field: {} for field in self._indexes}
+        for doc in self.tickets.find({"status": "available"}, LISTING_PROJECTION):
+            if not isinstance(doc.get("event_date"), datetime):
+                continue
+            listing = serialize_listing(doc)
+            records[listing.ticket_id] = listing
+            key = self._key(listing)
+            order.append(key)
+            for field, index in indexes.items():
+                index.setdefault(getattr(listing, field), []).append(key)
+        order.sort()
+        for index in indexes.values():
+            for keys in index.values():
+                keys.sort()
+
+        with self._lock:
+            self._records, self._order, self._indexes = records, order, indexes
+            self._resume_token = token
+            self._ready = True
+            self._synced_at = None  # fresh again once the stream catches up past the read
+            self.metrics["seeds"] += 1
+        logger.info("Listing view seeded with %d listings", len(records))
+
+    def follow(self):
+        """Apply change events until stopped or the stream fails."""
+        with self.tickets.watch(
+            CHANGE_PIPELINE,
+            full_document="updateLookup",
+            resume_after=self._resume_token,
+            max_await_time_ms=self.max_await_ms,
+        ) as stream:
+            while not self._stop.is_set():
+                change = stream.try_next()
+                with self._lock:
+                    if change is not None and change["operationType"] in RESYNC_OPERATIONS:
+                        logger.warning("Listing view stream ended (%s); resyncing", change["operationType"])
+                        self._resume_token = None
+                        self.metrics["resyncs"] += 1
+                        return
+                    if change is not None:
+                        self._apply(change)
+                        self.metrics["changes"] += 1
+                    self._resume_token = stream.resume_token
+                    self._mark_synced(change)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._resume_token is None:
+                    self.seed()
+                self.follow()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.error("Listing view disabled: change streams need a replica set (%s)", e)
+                    return
+                self._count("stream_errors")
+                if e.code in RESYNC_ERROR_CODES:
+                    logger.warning("Listing view resume token lost (%s); resyncing", e)
+                    with self._lock:
+                        self._resume_token = None
+                        self.metrics["resyncs"] += 1
+                    continue
+                logger.warning("Listing view stream failed: %s", e)
+                self._stop.wait(self.retry_delay)
+            except PyMongoError as e:
+                self._count("stream_errors")
+                logger.warning("Listing view stream failed: %s", e)
+                self._stop.wait(self.retry_delay)
+            except Exception as e:
+                self._count("stream_errors")
+                logger.error("Listing view stream failed: %s", e)
+                self._stop.wait(self.retry_delay)
+
+    def ensure_worker(self):
+        # Threads don't survive a fork, and a forked copy of the view stops following
+        # the stream, so each process seeds and follows on its own.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready = False
+            self._resume_token = None
+            self._synced_at = None
+            self._stop = threading.Event()
+            self._worker = threading.Thread(target=self._run, name="listing-view", daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def staleness(self) -> Optional[float]:
+        """Seconds since the view was last known to match the collection, or None before that."""
+        with self._lock:
+            if not self._ready or self._synced_at is None:
+                return None
+            return time.monotonic() - self._synced_at
+
+    def query(self, params: Dict[str, Any]) -> Optional[Tuple[List[Listing], bool]]:
+        """
+        One page of listings for parse_listing_args() params, as (listings, has_more).
+        Returns None when the view isn't fresh enough and the caller should read Mongo.
+        """
+        staleness = self.staleness()
+        if staleness is None or staleness > self.max_staleness:
+            self._count("fallbacks")
+            return None
+
+        date_from = _naive_utc(params["date_from"])
+        date_to = _naive_utc(params["date_to"])
+        price_min, price_max = params["price_min"], params["price_max"]
+        after = params["after"]
+        if after is not None:
+            after = (_naive_utc(after[0]), after[1])
+        limit = params["limit"]
+        filters = [(field, params[param]) for param, field in INDEXED_FIELDS.items() if params[param]]
+
+        page: List[Listing] = []
+        with self._lock:
+            keys = self._order
+            for field, value in filters:
+                candidate = self._indexes[field].get(value, [])
+                if len(candidate) < len(keys):
+                    keys = candidate
+
+            start = 0
+            if date_from is not None:
+                start = bisect_left(keys, (date_from,))
+            if after is not None:
+                start = max(start, bisect_right(keys, after))
+
+            for i in range(start, len(keys)):
+                event_date, ticket_id = keys[i]
+                if date_to is not None and event_date > date_to:
+                    break
+                listing = self._records[ticket_id]
+                if any(getattr(listing, field) != value for field, value in filters):
+                    continue
+                if (price_min is not None or price_max is not None) and isinstance(listing.price, str):
+                    # As with Mongo's $gte/$lte, a numeric bound never matches a price stored as a string
+                    continue
+                if price_min is not None and not listing.price >= price_min:
+                    continue
+                if price_max is not None and not listing.price <= price_max:
+                    continue
+                page.append(listing)
+                if len(page) > limit:
+                    break
+            self.metrics["served"] += 1
+        return page[:limit], len(page) > limit
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["listings"] = len(self._records)
+        return stats
+
+
+def listing_view_from_env(tickets_collection) -> Optional[ListingView]:
+    """
+    Build the ListingView from LISTING_VIEW_* settings, or None if LISTING_VIEW is false.
+    The stream isn't followed until ensure_worker() is called in the serving process.
+    """
+    if os.getenv("LISTING_VIEW", "true").lower() != "true":
+        return None
+    view = ListingView(
+        tickets_collection,
+        max_staleness=float(os.getenv("LISTING_VIEW_MAX_STALENESS", "5")),
+        max_await_ms=int(os.getenv("LISTING_VIEW_MAX_AWAIT_MS", "1000")),
+        retry_delay=float(os.getenv("LISTING_VIEW_RETRY_DELAY", "2")),
+    )
+    return view
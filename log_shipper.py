@@ -0,0 +1,200 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "block", "sample")
+
+
+class LogShipper:
+    """
+    Background writer for diagnostic log entries.
+
+    submit() appends to a bounded in-memory queue and returns immediately; a worker
+    thread drains the queue with insert_many, flushing whenever batch_size entries
+    are waiting or the oldest entry is flush_interval seconds old. What happens when
+    the queue is full is controlled by overflow_policy:
+      - "drop_oldest": discard the oldest queued entry to make room
+      - "block": wait up to block_timeout seconds for room, then drop the new entry
+      - "sample": keep one in every sample_every overflowing entries (dropping the oldest), drop the rest
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        overflow_policy: str = "drop_oldest",
+        block_timeout: float = 0.05,
+        sample_every: int = 10,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.collection = collection
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.sample_every = max(1, sample_every)
+
+        self._queue = deque()
+        self._oldest_at = None
+        self._cond = threading.Condition()
+        self._overflow_seen = 0
+        self._closed = False
+        self._worker = None
+        self._pid = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+
+    # ------------------------------
+    # Producer side
+    # ------------------------------
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Queue one entry for insertion. Returns False if the entry was dropped."""
+        self._ensure_worker()
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+
+            if len(self._queue) >= self.max_queue and not self._make_room():
+                self.dropped += 1
+                return False
+
+            was_empty = not self._queue
+            if was_empty:
+                self._oldest_at = time.monotonic()
+            self._queue.append(entry)
+            self.enqueued += 1
+            # Wake the worker so it can start the age timer or flush a full batch.
+            if was_empty or len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _make_room(self) -> bool:
+        """Apply the overflow policy while holding the lock. Returns True if there is now room."""
+        if self.overflow_policy == "drop_oldest":
+            self._queue.popleft()
+            self.dropped += 1
+            return True
+
+        if self.overflow_policy == "sample":
+            self._overflow_seen += 1
+            if self._overflow_seen % self.sample_every != 0:
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+            return True
+
+        # "block": wake the worker and wait for it to drain some entries
+        self._cond.notify_all()
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._queue) >= self.max_queue and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return not self._closed
+
+    # ------------------------------
+    # Worker side
+    # ------------------------------
+    def _ensure_worker(self):
+        # A forked child inherits the queue object but not the thread, so start a fresh one.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue.clear()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._worker.start()
+
+    def _take_batch(self):
+        """Wait until a flush is due and pop the next batch (empty list once closed and drained)."""
+        with self._cond:
+            while not self._closed:
+                if len(self._queue) >= self.batch_size:
+                    break
+                if self._queue:
+                    age = time.monotonic() - self._oldest_at
+                    if age >= self.flush_interval:
+                        break
+                    self._cond.wait(self.flush_interval - age)
+                else:
+                    self._cond.wait()
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._oldest_at = time.monotonic() if self._queue else None
+            # Producers blocked on a full queue can continue now.
+            self._cond.notify_all()
+            return batch
+
+    def _write(self, batch):
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Failed to ship %d log entries: %s", len(batch), e)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            elif self._closed:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Stop accepting entries and flush what is still queued."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        worker = self._worker
+        if worker is not None and self._pid == os.getpid():
+            worker.join(timeout)
+        # Whatever the worker did not get to (or if it never started) is written inline.
+        with self._cond:
+            remaining = list(self._queue)
+            self._queue.clear()
+        for start in range(0, len(remaining), self.batch_size):
+            self._write(remaining[start:start + self.batch_size])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+        }
+
+
+def shipper_from_env(collection) -> LogShipper:
+    """Build a LogShipper configured from LOG_SHIPPER_* environment variables and flush it at exit."""
+    shipper = LogShipper(
+        collection,
+        max_queue=int(os.getenv("LOG_SHIPPER_MAX_QUEUE", "10000")),
+        batch_size=int(os.getenv("LOG_SHIPPER_BATCH_SIZE", "200")),
+        flush_interval=float(os.getenv("LOG_SHIPPER_FLUSH_INTERVAL", "1.0")),
+        overflow_policy=os.getenv("LOG_SHIPPER_OVERFLOW", "drop_oldest"),
+        block_timeout=float(os.getenv("LOG_SHIPPER_BLOCK_TIMEOUT", "0.05")),
+        sample_every=int(os.getenv("LOG_SHIPPER_SAMPLE_EVERY", "10")),
+    )
+    atexit.register(shipper.close)
+    return shipper
@@ -0,0 +1,309 @@
+"""
+Lightweight in-process metrics with a Prometheus text exposition endpoint.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock, so
+recording a sample is a dict lookup plus a bisect. init_app() adds per-route
+request timing to a Flask app and serves everything at /metrics. Outbound calls
+are timed per dependency (mongo, redis, paciolan, stripe, ...) via
+track_dependency() or the instrumented client classes below.
+
+Metrics are per process; with several workers, scrape each one or aggregate
+downstream.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+import stripe
+from redis.client import Pipeline
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count.
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """A gauge whose samples are read from a callback at scrape time, e.g. a component's stats()."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str], callback: Callable[[], Dict[Tuple, float]], type_name: str = "gauge"):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+        self.type_name = type_name
+
+    def collect(self):
+        lines = self.header()
+        for key, value in self.callback().items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric, replace: bool = False):
+        with self._lock:
+            if metric.name in self._metrics and not replace:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, labels, callback, type_name="gauge", replace=False):
+        return self.register(CallbackGauge(name, help_text, labels, callback, type_name), replace)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                lines.append(f"# {metric.name} collection failed: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ("route", "method")
+)
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status code.", ("route", "method", "status")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+dependency_duration = registry.histogram(
+    "dependency_request_duration_seconds", "Time spent in outbound calls, per dependency and operation.",
+    ("dependency", "operation")
+)
+dependency_errors = registry.counter(
+    "dependency_errors_total", "Failed outbound calls, per dependency and operation.", ("dependency", "operation")
+)
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str):
+    """Time an outbound call; exceptions are counted as errors and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        dependency_errors.inc(dependency=dependency, operation=operation)
+        raise
+    finally:
+        dependency_duration.observe(time.perf_counter() - start, dependency=dependency, operation=operation)
+
+
+# ------------------------------
+# Instrumented clients
+# ------------------------------
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command listener: times every command the driver sends, labelled by command name."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        dependency_duration.observe(event.duration_micros / 1e6, dependency="mongo", operation=event.command_name)
+
+    def failed(self, event):
+        dependency_duration.observe(event.duration_micros / 1e6, dependency="mongo", operation=event.command_name)
+        dependency_errors.inc(dependency="mongo", operation=event.command_name)
+
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        with track_dependency("redis", "pipeline"):
+            return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(redis.Redis):
+    """redis.Redis that times each command (and each pipeline flush) as the "redis" dependency."""
+
+    def execute_command(self, *args, **options):
+        with track_dependency("redis", str(args[0]).lower()):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedStripeClient(stripe.RequestsClient):
+    """Stripe HTTP client that times each API request; the operation is the resource path, e.g. /v1/payment_intents."""
+
+    def request(self, method, url, headers, post_data=None):
+        path = url.split("://", 1)[-1].split("?", 1)[0]
+        segments = path.split("/")[1:3]
+        operation = f"{method.upper()} /" + "/".join(segments)
+        with track_dependency("stripe", operation):
+            return super().request(method, url, headers, post_data)
+
+
+# ------------------------------
+# Flask integration
+# ------------------------------
+def init_app(app, endpoint: str = "/metrics"):
+    """Record per-route latency, status counts and in-flight requests, and serve /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def _record_response(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_request_duration.observe(time.perf_counter() - start, route=route, method=request.method)
+            http_requests_total.inc(route=route, method=request.method, status=str(response.status_code))
+            http_requests_in_flight.dec()
+        return response
+
+    @app.teardown_request
+    def _record_failure(exc):
+        # after_request is skipped when a view raises; account for the request here instead.
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_request_duration.observe(time.perf_counter() - start, route=route, method=request.method)
+            http_requests_total.inc(route=route, method=request.method, status="500")
+            http_requests_in_flight.dec()
+
+    @app.route(endpoint, methods=["GET"])
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def stats_callback(stats_fn: Callable[[], Dict[str, float]], only: Optional[Iterable[str]] = None,
+                   exclude: Iterable[str] = ()) -> Callable[[], Dict[Tuple, float]]:
+    """
+    Adapt a component's stats() dict into CallbackGauge samples labelled by stat name.
+    :param only: Export just these stats, e.g. the monotonic counts for a counter
+    :param exclude: Leave these stats out, e.g. the counts when exporting the rest as a gauge
+    """
+    only = None if only is None else set(only)
+    exclude = set(exclude)
+
+    def collect():
+        return {
+            (name,): value for name, value in stats_fn().items()
+            if (only is None or name in only) and name not in exclude
+        }
+    return collect
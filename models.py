@@ -0,0 +1,236 @@
+"""
+Typed document models, built on msgspec.
+
+Read endpoints convert Mongo documents into these Structs and encode the whole
+response to JSON bytes in one pass (ObjectId -> hex string, datetime -> ISO-8601),
+instead of patching each dict field by field and handing it to jsonify. Only the
+fields declared here leave the server; anything else stored on a document (e.g.
+a user's password hash, a ticket's Paciolan transfer details) is dropped.
+
+The New* Structs validate request bodies. Unknown fields are ignored, so a client
+cannot set fields such as a user's Role or a ticket's status on create.
+
+    body = decode_body(request.get_data(), NewTicket)        # RequestValidationError -> 400
+    tickets = from_docs(collection.find(query, projection(Ticket)), Ticket)
+    return json_response({"tickets": tickets})
+"""
+from datetime import datetime
+from typing import Annotated, Any, Dict, Iterable, List, Optional, Type, TypeVar, Union
+
+import msgspec
+from bson import ObjectId
+from flask import current_app
+
+T = TypeVar("T")
+
+NonEmpty = Annotated[str, msgspec.Meta(min_length=1)]
+NonNegative = Annotated[float, msgspec.Meta(ge=0)]
+
+
+class RequestValidationError(ValueError):
+    """Raised when a request body doesn't match its model; maps to a 400 response."""
+
+
+def enc_hook(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise NotImplementedError(f"Objects of type {type(obj).__name__} are not JSON serializable")
+
+
+encoder = msgspec.json.Encoder(enc_hook=enc_hook)
+
+
+def encode(obj: Any) -> bytes:
+    """JSON-encode Structs, dicts and lists of them, with ObjectIds and datetimes, to bytes."""
+    return encoder.encode(obj)
+
+
+def json_response(obj: Any, status: int = 200):
+    """A Flask JSON response whose body is encoded by msgspec."""
+    return current_app.response_class(encode(obj), status=status, mimetype="application/json")
+
+
+def decode_body(raw: Union[bytes, str], model: Type[T]) -> T:
+    """
+    Decode and validate a JSON request body.
+    Numbers sent as strings (e.g. form fields) are accepted where a number is expected.
+    """
+    if not raw:
+        raise RequestValidationError("Request body must be a JSON object")
+    try:
+        return msgspec.json.decode(raw, type=model, strict=False)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise RequestValidationError(str(e))
+
+
+def from_doc(doc: Dict[str, Any], model: Type[T]) -> T:
+    """
+    Convert one Mongo document into a model instance. Conversion is lax (a number stored
+    as a string still fills a number-only field), since older code stored request values
+    as sent; fields such as Ticket.price also accept the raw types it wrote.
+    """
+    return msgspec.convert(doc, model, strict=False)
+
+
+def from_docs(docs: Iterable[Dict[str, Any]], model: Type[T]) -> List[T]:
+    """Convert Mongo documents (any iterable, e.g. a cursor) into model instances, as from_doc does."""
+    return msgspec.convert(list(docs), List[model], strict=False)
+
+
+def projection(model: Type[msgspec.Struct]) -> Dict[str, int]:
+    """A Mongo projection reading only the fields model declares, so dropped fields aren't fetched either."""
+    return {field.encode_name: 1 for field in msgspec.structs.fields(model)}
+
+
+def _check_event_date(value: str):
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Invalid event_date format; must be ISO-8601")
+
+
+# ------------------------------
+# Request bodies
+# ------------------------------
+class NewTicket(msgspec.Struct):
+    """POST /tickets"""
+    event_name: NonEmpty
+    event_date: str
+    venue: NonEmpty
+    price: NonNegative
+    school_name: Optional[str] = None
+    currency: str = "USD"
+
+    def __post_init__(self):
+        _check_event_date(self.event_date)
+        self.school_name = (self.school_name or "").strip() or "public"
+
+    @property
+    def event_datetime(self) -> datetime:
+        return datetime.fromisoformat(self.event_date)
+
+
+class NewAttendance(msgspec.Struct):
+    """POST /Attend"""
+    event_name: NonEmpty
+    event_date: str
+    venue: NonEmpty
+    school_name: Optional[str] = None
+
+    def __post_init__(self):
+        _check_event_date(self.event_date)
+        self.school_name = (self.school_name or "").strip() or "public"
+
+    @property
+    def event_datetime(self) -> datetime:
+        return datetime.fromisoformat(self.event_date)
+
+
+class NewUser(msgspec.Struct, omit_defaults=True):
+    """POST /users/register. A missing or blank School becomes "public"."""
+    email: NonEmpty
+    password: NonEmpty
+    FirstName: Optional[str] = None
+    LastName: Optional[str] = None
+    phone: Union[str, int, None] = None
+    School: Optional[str] = None
+
+    def __post_init__(self):
+        self.School = (self.School or "").strip() or "public"
+
+
+class LoginRequest(msgspec.Struct):
+    """POST /users/login"""
+    email: NonEmpty
+    password: NonEmpty
+
+
+# ------------------------------
+# Documents / responses
+# ------------------------------
+class Ticket(msgspec.Struct, rename={"id": "_id"}, omit_defaults=True):
+    """A ticket as its seller or buyer sees it (GET /tickets/mine)."""
+    id: ObjectId
+    seller_id: ObjectId
+    event_name: str = ""
+    event_date: Optional[datetime] = None
+    venue: Optional[str] = None
+    school_name: Optional[str] = None
+    # Tickets listed before request validation may hold any string the client sent
+    price: Union[float, str, None] = None
+    currency: Optional[str] = None
+    status: Optional[str] = None
+    is_transferrable: Optional[bool] = None
+    buyer_id: Optional[ObjectId] = None
+    hold_expires_at: Optional[datetime] = None
+    payment_status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class Listing(msgspec.Struct):
+    """One available ticket in GET /tickets. Every field is always present."""
+    ticket_id: ObjectId
+    seller_id: ObjectId
+    school_name: str = ""
+    event_code: str = ""
+    event_name: str = ""
+    event_date: Optional[datetime] = None
+    venue: str = ""
+    section: Union[str, int] = ""
+    row: Union[str, int] = ""
+    seat: Union[str, int] = ""
+    level: str = ""
+    price: Union[float, str] = 0
+    currency: str = "USD"
+
+
+class Attendance(msgspec.Struct, rename={"id": "_id"}, omit_defaults=True):
+    """A public-event attendance record (GET /attendance)."""
+    id: ObjectId
+    attendee_id: ObjectId
+    event_name: str = ""
+    event_date: Optional[datetime] = None
+    venue: Optional[str] = None
+    school_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class UserProfile(msgspec.Struct, rename={"id": "_id"}, omit_defaults=True):
+    """The logged-in user's own profile. Never includes the password hash."""
+    id: ObjectId
+    email: str
+    FirstName: Optional[str] = None
+    LastName: Optional[str] = None
+    phone: Union[str, int, None] = None
+    School: Optional[str] = None
+    Role: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    third_party_account: Optional[Dict[str, Any]] = None
+    stripe_account: Optional[Dict[str, Any]] = None
+
+
+class PublicProfile(msgspec.Struct):
+    """What any logged-in user may see of another user."""
+    email: Optional[str] = None
+
+
+class Schedule(msgspec.Struct, omit_defaults=True):
+    """A stored schedule (GET /schedule/retrieve); games are passed through as parsed."""
+    event_type: str
+    school_name: str = ""
+    year: Union[str, int, None] = None
+    games: List[Dict[str, Any]] = msgspec.field(default_factory=list)
+    user_id: Any = None
+    last_updated: Optional[datetime] = None
+
+
+class ScheduleEvents(msgspec.Struct):
+    year: Union[str, int, None] = None
+    event_type: Optional[str] = None
+    games: Optional[List[Dict[str, Any]]] = None
+
+
+class SchoolSchedules(msgspec.Struct, rename={"school_name": "_id"}):
+    """One school's schedules, as grouped by GET /schedule/all."""
+    school_name: Optional[str]
+    events: List[ScheduleEvents]
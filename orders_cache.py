@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class OrdersCache:
+    """
+    Two-tier cache for decoded Paciolan patron orders, keyed by (paciolan_id, season_code).
+
+    Tier 1 is an in-process LRU, tier 2 is a Redis hash per patron (one field per season)
+    so every worker shares what any of them has fetched. An entry is:
+      - fresh for `ttl` seconds: served straight from cache
+      - stale for a further `stale_ttl` seconds: served from cache while one background
+        refresh fetches a new copy (stale-while-revalidate)
+      - expired after that: fetched synchronously
+    Redis failures are logged and treated as misses; they never fail the request.
+
+    invalidate() bumps a per-patron generation counter in Redis. Entries remember the
+    generation they were fetched under, and one whose generation is behind is a miss,
+    so an invalidation in one worker also drops the LRU copies held by the others.
+
+    If `derive` is given, get_derived() returns derive(orders), computed once per
+    in-process entry (e.g. the fuzzy matcher's event index). Derived values are never
+    written to Redis.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        fetch: Callable[[str, str], Dict[str, Any]],
+        ttl: int = 300,
+        stale_ttl: int = 900,
+        max_entries: int = 256,
+        key_prefix: str = "pac_orders:",
+        refresh_workers: int = 2,
+        derive: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
+        """
+        :param redis_client: redis.Redis instance for the shared tier (None disables it)
+        :param fetch: Callable(paciolan_id, season_code) returning the decoded orders payload
+        :param derive: Optional Callable(orders) whose result is cached alongside the orders in-process
+        """
+        self.redis = redis_client
+        self.fetch = fetch
+        self.derive = derive
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.key_prefix = key_prefix
+        self.refresh_workers = refresh_workers
+
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        self._executor_pid = None
+
+        self.metrics = {
+            "hits_local": 0,
+            "hits_redis": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations": 0,
+        }
+
+    def _redis_key(self, paciolan_id: str) -> str:
+        return f"{self.key_prefix}{paciolan_id}"
+
+    def _generation_key(self, paciolan_id: str) -> str:
+        return f"{self.key_prefix}{paciolan_id}:generation"
+
+    def _generation(self, paciolan_id: str) -> Optional[int]:
+        """The patron's current generation, or None if Redis is unavailable (entries are then trusted)."""
+        if self.redis is None:
+            return None
+        try:
+            return int(self.redis.get(self._generation_key(paciolan_id)) or 0)
+        except (redis.RedisError, ValueError) as e:
+            logger.warning("Orders cache generation read failed: %s", e)
+            return None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    # ------------------------------
+    # Tier 1: in-process LRU
+    # ------------------------------
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, entry):
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    # ------------------------------
+    # Tier 2: Redis
+    # ------------------------------
+    def _redis_get(self, paciolan_id: str, season_code: str):
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.hget(self._redis_key(paciolan_id), season_code)
+        except redis.RedisError as e:
+            logger.warning("Orders cache Redis read failed: %s", e)
+            return None
+        if not raw:
+            return None
+        try:
+            stored = json.loads(raw)
+            return [stored["fetched_at"], stored["orders"], None, stored.get("generation")]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _redis_set(self, paciolan_id: str, season_code: str, entry):
+        if self.redis is None:
+            return
+        fetched_at, orders, generation = entry[0], entry[1], entry[3]
+        key = self._redis_key(paciolan_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, season_code, json.dumps({"fetched_at": fetched_at, "orders": orders, "generation": generation}))
+            pipe.expire(key, self.ttl + self.stale_ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Orders cache Redis write failed: %s", e)
+
+    # ------------------------------
+    # Public API
+    # ------------------------------
+    def get(self, paciolan_id: str, season_code: str) -> Dict[str, Any]:
+        """Return the decoded orders payload, fetching it only on a miss or hard expiry."""
+        return self._get_entry(paciolan_id, season_code)[1]
+
+    def get_derived(self, paciolan_id: str, season_code: str) -> Any:
+        """Return derive(orders) for the cached payload, computing it at most once per entry."""
+        entry = self._get_entry(paciolan_id, season_code)
+        derived = entry[2]
+        if derived is None:
+            derived = self.derive(entry[1])
+            entry[2] = derived
+        return derived
+
+    def _get_entry(self, paciolan_id: str, season_code: str) -> list:
+        key = (paciolan_id, season_code)
+        now = time.time()
+        generation = self._generation(paciolan_id)
+
+        entry = self._local_get(key)
+        if entry is not None and generation is not None and entry[3] != generation:
+            # Invalidated (possibly by another worker) since this copy was fetched
+            entry = None
+        tier = "hits_local"
+        if entry is None or now - entry[0] >= self.ttl:
+            # Another worker may already have refreshed this patron's orders.
+            shared = self._redis_get(paciolan_id, season_code)
+            if shared is not None and generation is not None and shared[3] != generation:
+                # Written by a fetch that started before the last invalidation
+                shared = None
+            if shared is not None and (entry is None or shared[0] > entry[0]):
+                entry = shared
+                tier = "hits_redis"
+                self._local_set(key, entry)
+
+        if entry is not None:
+            age = now - entry[0]
+            if age < self.ttl:
+                self._count(tier)
+                return entry
+            if age < self.ttl + self.stale_ttl:
+                self._count("stale_served")
+                self._refresh_in_background(paciolan_id, season_code)
+                return entry
+
+        self._count("misses")
+        return self._load(paciolan_id, season_code)
+
+    def _load(self, paciolan_id: str, season_code: str) -> list:
+        # Read before fetching: an invalidation that lands mid-fetch makes this entry stale
+        generation = self._generation(paciolan_id)
+        orders = self.fetch(paciolan_id, season_code)
+        entry = [time.time(), orders, None, generation]
+        self._local_set((paciolan_id, season_code), entry)
+        self._redis_set(paciolan_id, season_code, entry)
+        return entry
+
+    def _refresh_in_background(self, paciolan_id: str, season_code: str):
+        key = (paciolan_id, season_code)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix="orders-refresh"
+                )
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        executor.submit(self._refresh, paciolan_id, season_code)
+
+    def _refresh(self, paciolan_id: str, season_code: str):
+        try:
+            self._load(paciolan_id, season_code)
+            self._count("refreshes")
+        except Exception as e:
+            self._count("refresh_errors")
+            logger.warning("Background refresh of orders for %s/%s failed: %s", paciolan_id, season_code, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard((paciolan_id, season_code))
+
+    def invalidate(self, paciolan_id: str, season_code: Optional[str] = None):
+        """
+        Drop cached orders for one season of a patron, or for all of their seasons.
+        This clears the shared Redis copy and this process's LRU, and bumps the patron's
+        generation so other workers drop their LRU copies (of every season) on next use.
+        """
+        with self._lock:
+            for key in list(self._local):
+                if key[0] == paciolan_id and (season_code is None or key[1] == season_code):
+                    del self._local[key]
+            self.metrics["invalidations"] += 1
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            if season_code is None:
+                pipe.delete(self._redis_key(paciolan_id))
+            else:
+                pipe.hdel(self._redis_key(paciolan_id), season_code)
+            # Entries fetched before now are hard-expired within ttl + stale_ttl, and so is the generation
+            pipe.incr(self._generation_key(paciolan_id))
+            pipe.expire(self._generation_key(paciolan_id), self.ttl + self.stale_ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Orders cache Redis invalidation failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["local_entries"] = len(self._local)
+        return stats
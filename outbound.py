@@ -0,0 +1,320 @@
+"""
+Shared policy for outbound HTTP calls: timeouts, retries and circuit breakers.
+
+Each upstream (Paciolan, Stripe, schedule hosts) gets an OutboundPolicy:
+  - connect and read timeouts, passed to requests as (connect, read)
+  - bounded retries with full-jitter exponential backoff on connection errors,
+    timeouts and 429/502/503/504. Only idempotent calls are retried; other calls
+    are retried only when the connection was never made (ConnectTimeout), so the
+    request cannot have reached the upstream.
+  - a circuit breaker per upstream, opened after `failure_threshold` failures in a
+    row (connection errors, timeouts, 5xx). While open, calls fail fast with
+    CircuitOpenError. After `reset_timeout` seconds one trial call is let through
+    (half-open). If it succeeds the circuit closes; if it fails it opens again.
+
+    policy = policy_from_env("paciolan", "PACIOLAN", connect_timeout=3, read_timeout=10)
+    response = policy.call(lambda: session.get(url, timeout=policy.timeout))
+
+Settings are read from <PREFIX>_CONNECT_TIMEOUT, _READ_TIMEOUT, _RETRIES,
+_BACKOFF_BASE, _BACKOFF_MAX, _BREAKER_FAILURES and _BREAKER_RESET. Breakers are
+per process. circuit_states() and outbound_stats() feed the /metrics callbacks.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+import stripe
+
+from metrics import InstrumentedStripeClient
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, dependency: str, upstream: str, retry_after: float):
+        target = f"{dependency} ({upstream})" if upstream else dependency
+        super().__init__(f"{target} is unavailable; circuit open for another {retry_after:.0f}s")
+        self.dependency = dependency
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, dependency: str, upstream: str = "", failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.dependency = dependency
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def acquire(self):
+        """Admit a call, or raise CircuitOpenError. Every admitted call must end in success(), failure() or release()."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(self.dependency, self.upstream, max(remaining, 0.0))
+
+    def success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit for %s %s closed", self.dependency, self.upstream)
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def failure(self) -> bool:
+        """Record a failed call; returns whether this opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                logger.warning("Circuit for %s %s opened after %d failures", self.dependency, self.upstream, self._failures)
+                return True
+            return False
+
+    def release(self):
+        """End an admitted call that says nothing about the upstream's health (e.g. a bad URL)."""
+        with self._lock:
+            self._probing = False
+
+
+class OutboundPolicy:
+    def __init__(
+        self,
+        dependency: str,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_upstreams: int = 256,
+    ):
+        """
+        :param dependency: Metrics label, e.g. "paciolan"
+        :param retries: Extra attempts after the first (idempotent calls only)
+        :param backoff_base: Backoff before retry n is uniform(0, min(backoff_max, backoff_base * 2**n)) seconds
+        :param max_upstreams: Breakers kept for per-host policies (least recently used are dropped)
+        """
+        self.dependency = dependency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_upstreams = max_upstreams
+
+        self._lock = threading.Lock()
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self.metrics = {"calls": 0, "retries": 0, "failures": 0, "timeouts": 0, "short_circuited": 0, "opened": 0}
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def breaker(self, upstream: str = "") -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(upstream)
+            if breaker is None:
+                breaker = self._breakers[upstream] = CircuitBreaker(
+                    self.dependency, upstream, self.failure_threshold, self.reset_timeout
+                )
+                while len(self._breakers) > self.max_upstreams:
+                    self._breakers.popitem(last=False)
+            else:
+                self._breakers.move_to_end(upstream)
+            return breaker
+
+    def backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            # Honour the upstream's Retry-After, but never wait longer than backoff_max
+            delay = max(delay, min(float(retry_after), self.backoff_max))
+        return delay
+
+    def guard(self, upstream: str = "") -> CircuitBreaker:
+        """Admit one call through the upstream's breaker; for clients that do their own retries."""
+        breaker = self.breaker(upstream)
+        try:
+            breaker.acquire()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+        self._count("calls")
+        return breaker
+
+    def record_failure(self, breaker: CircuitBreaker, timeout: bool = False):
+        self._count("failures")
+        if timeout:
+            self._count("timeouts")
+        if breaker.failure():
+            self._count("opened")
+
+    def call(self, send: Callable[[], Any], upstream: str = "", idempotent: bool = True) -> Any:
+        """
+        Run send() (one HTTP request returning a requests.Response) under this policy.
+        Returns the last response, which may still have a retryable status once retries
+        run out. Raises CircuitOpenError while the circuit is open, or the last
+        requests exception.
+        """
+        attempt = 0
+        while True:
+            breaker = self.guard(upstream)
+            try:
+                response = send()
+            except requests.RequestException as e:
+                network_error = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                if network_error:
+                    self.record_failure(breaker, timeout=isinstance(e, requests.Timeout))
+                else:
+                    breaker.release()
+                retryable = (idempotent and network_error) or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= self.retries:
+                    raise
+                response = None
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if response.status_code >= 500:
+                    self.record_failure(breaker)
+                else:
+                    breaker.success()
+                if not (idempotent and response.status_code in RETRY_STATUSES) or attempt >= self.retries:
+                    return response
+                response.close()
+
+            self._count("retries")
+            time.sleep(self.backoff(attempt, response))
+            attempt += 1
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.upstream: breaker.state for breaker in breakers}
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.metrics)
+
+
+class GuardedStripeClient(InstrumentedStripeClient):
+    """
+    Stripe HTTP client with the policy's timeouts and circuit breaker. Retries are left
+    to stripe-python (stripe.max_network_retries), which backs off with jitter and sends
+    an idempotency key with every POST.
+    """
+
+    def __init__(self, policy: OutboundPolicy, **kwargs):
+        super().__init__(timeout=policy.timeout, **kwargs)
+        self.policy = policy
+
+    def request(self, method, url, headers, post_data=None):
+        try:
+            breaker = self.policy.guard()
+        except CircuitOpenError as e:
+            raise stripe.APIConnectionError(str(e), should_retry=False) from e
+        try:
+            content, status_code, response_headers = super().request(method, url, headers, post_data)
+        except stripe.APIConnectionError as e:
+            self.policy.record_failure(breaker, timeout="timed out" in str(e).lower())
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        if status_code >= 500:
+            self.policy.record_failure(breaker)
+        else:
+            breaker.success()
+        return content, status_code, response_headers
+
+
+# ------------------------------
+# Configuration and metrics
+# ------------------------------
+_policies: Dict[str, OutboundPolicy] = {}
+
+
+def policy_from_env(dependency: str, env_prefix: str, **defaults) -> OutboundPolicy:
+    """
+    Build (and register for metrics) the policy for one dependency from <env_prefix>_* settings.
+    :param defaults: OutboundPolicy arguments used when a setting is unset
+    """
+    def setting(name: str, argument: str, cast, default):
+        value = os.getenv(f"{env_prefix}_{name}")
+        return cast(value if value is not None else defaults.get(argument, default))
+
+    policy = OutboundPolicy(
+        dependency,
+        connect_timeout=setting("CONNECT_TIMEOUT", "connect_timeout", float, 3.0),
+        read_timeout=setting("READ_TIMEOUT", "read_timeout", float, 10.0),
+        retries=setting("RETRIES", "retries", int, 2),
+        backoff_base=setting("BACKOFF_BASE", "backoff_base", float, 0.2),
+        backoff_max=setting("BACKOFF_MAX", "backoff_max", float, 2.0),
+        failure_threshold=setting("BREAKER_FAILURES", "failure_threshold", int, 5),
+        reset_timeout=setting("BREAKER_RESET", "reset_timeout", float, 30.0),
+    )
+    _policies[dependency] = policy
+    return policy
+
+
+def circuit_states() -> Dict[Tuple, float]:
+    """CallbackGauge samples: 0 closed, 1 half-open, 2 open, per (dependency, upstream)."""
+    return {
+        (name, upstream): STATE_VALUES[state]
+        for name, policy in list(_policies.items())
+        for upstream, state in policy.states().items()
+    }
+
+
+def outbound_stats() -> Dict[Tuple, float]:
+    """CallbackGauge samples of each policy's counters, per (dependency, stat)."""
+    return {
+        (name, stat): value
+        for name, policy in list(_policies.items())
+        for stat, value in policy.stats().items()
+    }
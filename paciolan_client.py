@@ -0,0 +1,237 @@
+import time
+import uuid
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import track_dependency, dependency_errors
+from outbound import IDEMPOTENT_METHODS, CircuitOpenError, OutboundPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class PaciolanError(Exception):
+    """Raised when the Paciolan API cannot be reached or returns an unusable response."""
+
+
+class PaciolanUnavailableError(PaciolanError):
+    """Raised when Paciolan timed out, refused the connection, or its circuit is open."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PaciolanClient:
+    """
+    Shared client for the (mock) Paciolan API.
+
+    One instance is meant to be created per process and reused by every helper:
+      - a pooled requests.Session keeps TCP connections alive between calls
+      - the bearer token is cached and refreshed shortly before it expires
+      - concurrent refreshes are coalesced so only one thread hits /v1/auth/token
+      - every request gets its headers from headers(), so they are built in one place
+      - every request goes through an OutboundPolicy: connect/read timeouts, retries for
+        idempotent calls, and a circuit breaker that fails fast while Paciolan is down
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        distributor_code: str,
+        user_agent: str,
+        channel_code: str,
+        application_id: str,
+        api_key: str,
+        organization_id: str = "OrganizationID",
+        pool_size: int = 10,
+        token_ttl: int = 3600,
+        token_refresh_margin: int = 60,
+        on_token_fetch=None,
+        policy: Optional[OutboundPolicy] = None,
+    ):
+        """
+        :param base_url: e.g. "http://localhost:3003"
+        :param pool_size: Max keep-alive connections held open to Paciolan
+        :param token_ttl: Seconds a token is assumed valid when the auth response carries no expiry
+        :param token_refresh_margin: Refresh the token this many seconds before it expires
+        :param on_token_fetch: Optional callback(status_code) invoked after every token request
+        :param policy: Timeouts, retries and circuit breaker for every call (defaults to OutboundPolicy("paciolan"))
+        """
+        self.base_url = base_url.rstrip("/")
+        self.distributor_code = distributor_code
+        self.user_agent = user_agent
+        self.channel_code = channel_code
+        self.application_id = application_id
+        self.api_key = api_key
+        self.organization_id = organization_id
+        self.token_ttl = token_ttl
+        self.token_refresh_margin = token_refresh_margin
+        self.on_token_fetch = on_token_fetch
+        self.policy = policy or OutboundPolicy("paciolan")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    # ------------------------------
+    # Token handling
+    # ------------------------------
+    def _token_is_fresh(self) -> bool:
+        return (
+            self._token is not None
+            and time.monotonic() < self._token_expires_at - self.token_refresh_margin
+        )
+
+    def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """
+        Return a valid bearer token, fetching a new one only when the cached one
+        is missing or about to expire. Threads that arrive while a refresh is in
+        flight wait on the lock and then reuse the token it produced.
+        """
+        if not force_refresh and self._token_is_fresh():
+            return self._token
+
+        stale_token = self._token
+        with self._token_lock:
+            # Another thread may have refreshed while we were waiting.
+            if self._token_is_fresh() and (not force_refresh or self._token != stale_token):
+                return self._token
+            return self._fetch_token()
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
+
+    def _fetch_token(self) -> Optional[str]:
+        url = f"{self.base_url}/v1/auth/token"
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": self.user_agent,
+            "Accept": "application/json",
+            "Request-ID": self.generate_request_id(),
+        }
+        # Fetching a token changes nothing upstream, so it is retried like a GET
+        response = self._send("POST", url, "auth_token", idempotent=True, headers=headers)
+        if self.on_token_fetch is not None:
+            self.on_token_fetch(response.status_code)
+        if response.status_code != 200:
+            logger.error("Paciolan token request failed with status %s", response.status_code)
+            return None
+
+        body = response.json()
+        token = body.get("accessToken")
+        if not token:
+            return None
+        ttl = body.get("expiresIn") or body.get("expires_in") or self.token_ttl
+        try:
+            ttl = int(ttl)
+        except (TypeError, ValueError):
+            ttl = self.token_ttl
+        self._token = token
+        self._token_expires_at = time.monotonic() + ttl
+        return token
+
+    # ------------------------------
+    # Request helpers
+    # ------------------------------
+    @staticmethod
+    def generate_request_id() -> str:
+        return str(uuid.uuid4())
+
+    def headers(self, token: Optional[str] = None, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Build the standard Paciolan header set for an authenticated call."""
+        headers = {
+            "User-Agent": self.user_agent,
+            "PAC-Channel-Code": self.channel_code,
+            "PAC-Application-ID": self.application_id,
+            "PAC-API-Key": self.api_key,
+            "PAC-Organization-ID": self.organization_id,
+            "Request-ID": self.generate_request_id(),
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def request(self, method: str, path: str, operation: str = None, **kwargs) -> requests.Response:
+        """
+        Send an authenticated request over the pooled session.
+        A 401 invalidates the cached token and the call is retried once with a fresh one.
+        :param operation: Low-cardinality name the call is timed under (defaults to the method)
+        """
+        token = self.get_token()
+        if not token:
+            raise PaciolanError("Unable to retrieve Paciolan token")
+
+        url = f"{self.base_url}{path}"
+        operation = operation or method.lower()
+        extra_headers = kwargs.pop("headers", None)
+        response = self._send(method, url, operation, headers=self.headers(token, extra_headers), **kwargs)
+        if response.status_code == 401:
+            token = self.get_token(force_refresh=True)
+            if not token:
+                raise PaciolanError("Unable to refresh Paciolan token")
+            response = self._send(method, url, operation, headers=self.headers(token, extra_headers), **kwargs)
+        return response
+
+    def _send(self, method: str, url: str, operation: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        One call under the outbound policy; each attempt is timed separately.
+        Raises PaciolanUnavailableError on timeouts, connection errors and an open circuit.
+        """
+        def attempt():
+            with track_dependency("paciolan", operation):
+                response = self.session.request(method, url, timeout=self.policy.timeout, **kwargs)
+            if response.status_code >= 500:
+                dependency_errors.inc(dependency="paciolan", operation=operation)
+            return response
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        try:
+            return self.policy.call(attempt, idempotent=idempotent)
+        except CircuitOpenError as e:
+            raise PaciolanUnavailableError(str(e), retry_after=e.retry_after) from e
+        except requests.RequestException as e:
+            logger.warning("Paciolan %s failed: %s", operation, e)
+            raise PaciolanUnavailableError(f"Paciolan {operation} failed: {e}") from e
+
+    # ------------------------------
+    # Paciolan endpoints
+    # ------------------------------
+    def get_account(self, user_name: str) -> requests.Response:
+        return self.request("GET", "/v2/accounts", operation="get_account", params={"userName": user_name})
+
+    def get_patron_orders(self, paciolan_id: str, season_code: str) -> requests.Response:
+        return self.request("GET", f"/v2/patron/{paciolan_id}/orders/{season_code}", operation="get_patron_orders")
+
+    def create_transfer(self, payload: Dict[str, Any]) -> requests.Response:
+        return self.request(
+            "POST", "/v1/tickets/transfer", operation="create_transfer",
+            params={"distributorCode": self.distributor_code}, json=payload
+        )
+
+    def accept_transfer(self, transfer_id: str) -> requests.Response:
+        return self.request(
+            "POST", "/v1/tickets/transfer/accept", operation="accept_transfer",
+            params={"distributorCode": self.distributor_code}, json={"transferId": transfer_id}
+        )
+
+    def cancel_transfer(self, confirmation_code: str) -> requests.Response:
+        return self.request(
+            "DELETE", f"/v1/tickets/transfer/{confirmation_code}", operation="cancel_transfer",
+            params={"distributorCode": self.distributor_code}
+        )
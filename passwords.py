@@ -0,0 +1,267 @@
+"""
+Password hashing off the request threads, and login throttling.
+
+bcrypt is deliberately slow (~250ms at cost 12), so a burst of logins on a game day
+would otherwise pin every request thread in a worker. PasswordHasher runs hashpw /
+checkpw in a small per-process pool and admits at most `max_pending` calls at once
+(queued plus running). Past that, callers get HasherBusyError with a Retry-After
+estimate and the route answers 503 instead of queueing more work.
+
+LoginThrottle counts failed logins per client IP and per account in Redis over a
+fixed window. Once either count reaches its limit, further attempts are refused
+with 429 before any bcrypt work is done. A successful login clears the account's
+count.
+
+Hashes record their cost, so after BCRYPT_ROUNDS changes each user's hash is
+upgraded (or downgraded) the next time they log in; see PasswordHasher.needs_rehash.
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Tuple
+
+import bcrypt
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing pool already has max_pending calls in flight."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Password hashing is saturated; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+# Run in the pool processes, so they must be importable module-level functions
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Not a bcrypt hash
+        return False
+
+
+def hash_cost(hashed: str) -> int:
+    """The cost (log2 rounds) recorded in a bcrypt hash such as "$2b$12$...", or 0 if unreadable."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 16, wait_timeout: float = 10.0):
+        """
+        :param rounds: bcrypt cost for new hashes
+        :param workers: Hashing processes per web worker; 0 hashes on the calling thread
+        :param max_pending: Calls admitted at once (queued plus running) before HasherBusyError
+        :param wait_timeout: Seconds a caller waits for its result before giving up with HasherBusyError
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pool = None
+        self._pool_pid = None
+        # Moving average of one call's duration, for Retry-After estimates
+        self._avg_seconds = 0.25
+
+        self.metrics = {"hashed": 0, "verified": 0, "rejected": 0, "timeouts": 0, "pool_restarts": 0}
+        atexit.register(self.shutdown)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _get_pool(self, replace: bool = False) -> ProcessPoolExecutor:
+        """One pool per process, created on first use and recreated after a fork or a broken pool."""
+        with self._lock:
+            if replace or self._pool is None or self._pool_pid != os.getpid():
+                if replace:
+                    self.metrics["pool_restarts"] += 1
+                # Web workers already run Mongo monitors, job workers and other threads; a fork
+                # could copy one of their held locks into a child, so start workers from a forkserver
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self) -> float:
+        """Rough seconds until a full queue drains."""
+        with self._lock:
+            return self._avg_seconds * self.max_pending / max(1, self.workers)
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.metrics["rejected"] += 1
+                busy = True
+            else:
+                self._pending += 1
+                busy = False
+        if busy:
+            raise HasherBusyError(self.retry_after())
+
+        started = time.monotonic()
+
+        def done(_=None):
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._pending -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                done()
+        try:
+            try:
+                future = self._get_pool().submit(fn, *args)
+            except BrokenProcessPool:
+                future = self._get_pool(replace=True).submit(fn, *args)
+        except BaseException:
+            done()
+            raise
+        # The slot is freed when the call finishes, not when the caller stops waiting,
+        # so abandoned calls still count against max_pending
+        future.add_done_callback(done)
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            raise HasherBusyError(self.retry_after())
+
+    def hash(self, password: str) -> str:
+        """bcrypt hash of password at the configured cost, as a string for storage."""
+        hashed = self._run(_hashpw, password.encode("utf-8"), self.rounds)
+        self._count("hashed")
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        ok = self._run(_checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+        self._count("verified")
+        return ok
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """Whether a stored hash was made at a different cost than the one configured now."""
+        return hash_cost(hashed) != self.rounds
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["pending"] = self._pending
+        return stats
+
+
+class LoginThrottle:
+    def __init__(
+        self,
+        redis_client,
+        max_ip_failures: int = 50,
+        max_account_failures: int = 10,
+        window: int = 900,
+        key_prefix: str = "login_failures",
+    ):
+        """
+        :param redis_client: redis.Redis instance (decode_responses=True) holding the counters
+        :param max_ip_failures: Failed logins from one IP per window before it is refused
+        :param max_account_failures: Failed logins for one email per window before it is refused
+        :param window: Seconds a counter lives after its first failure
+        """
+        self.redis = redis_client
+        self.max_ip_failures = max_ip_failures
+        self.max_account_failures = max_account_failures
+        self.window = window
+        self.key_prefix = key_prefix
+
+        self._lock = threading.Lock()
+        self.metrics = {"failures": 0, "throttled": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _keys(self, ip: str, account: str) -> Tuple[str, str]:
+        return f"{self.key_prefix}:ip:{ip}", f"{self.key_prefix}:account:{account.strip().lower()}"
+
+    def retry_after(self, ip: str, account: str) -> int:
+        """Seconds until this IP and account may try again; 0 when the attempt is allowed."""
+        ip_key, account_key = self._keys(ip, account)
+        try:
+            ip_failures, account_failures = self.redis.mget(ip_key, account_key)
+            blocked = []
+            if ip_failures and int(ip_failures) >= self.max_ip_failures:
+                blocked.append(ip_key)
+            if account_failures and int(account_failures) >= self.max_account_failures:
+                blocked.append(account_key)
+            if not blocked:
+                return 0
+            retry_after = max(self.redis.ttl(key) for key in blocked)
+        except redis.RedisError as e:
+            # Let the login through rather than lock everyone out while Redis is down
+            logger.warning("Login throttle check failed: %s", e)
+            return 0
+        self._count("throttled")
+        return max(1, retry_after)
+
+    def failed(self, ip: str, account: str):
+        """Count a failed login against the IP and the account; the window starts at the first failure."""
+        self._count("failures")
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            for key in self._keys(ip, account):
+                pipe.set(key, 0, ex=self.window, nx=True)
+                pipe.incr(key)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to record login failure: %s", e)
+
+    def succeeded(self, account: str):
+        try:
+            self.redis.delete(self._keys("", account)[1])
+        except redis.RedisError as e:
+            logger.warning("Failed to reset login failures: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.metrics)
+
+
+def hasher_from_env() -> PasswordHasher:
+    """Build the PasswordHasher from BCRYPT_ROUNDS and PASSWORD_HASH_* environment variables."""
+    return PasswordHasher(
+        rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16")),
+        wait_timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+    )
+
+
+def throttle_from_env(redis_client) -> LoginThrottle:
+    """Build the LoginThrottle from LOGIN_* environment variables."""
+    return LoginThrottle(
+        redis_client,
+        max_ip_failures=int(os.getenv("LOGIN_MAX_IP_FAILURES", "50")),
+        max_account_failures=int(os.getenv("LOGIN_MAX_ACCOUNT_FAILURES", "10")),
+        window=int(os.getenv("LOGIN_THROTTLE_WINDOW", "900")),
+    )
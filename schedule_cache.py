@@ -0,0 +1,182 @@
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if we still own it, so a slow holder can't release someone else's lock.
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class ScheduleCache:
+    """
+    Redis cache of serialized /schedule responses.
+
+    A response is keyed by the endpoint, the sorted set of schools the caller may see,
+    the query parameters, and the current version of each of those schools. Uploading
+    a school's schedule bumps its version (invalidate()), so every cached response that
+    included that school stops being read; the orphaned entries expire after `ttl`.
+
+    Bodies are stored already serialized, so a hit is returned without touching Mongo
+    or re-encoding JSON. On a miss only one caller per key (across all workers) runs
+    the query; the others wait briefly for its result instead of stampeding Mongo.
+    Redis failures are logged and fall through to computing the response directly.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        ttl: int = 3600,
+        lock_ttl: int = 10,
+        wait_timeout: float = 5.0,
+        poll_interval: float = 0.05,
+        key_prefix: str = "schedule_cache:",
+        cacheable_statuses: Iterable[int] = (200, 404),
+    ):
+        """
+        :param redis_client: redis.Redis instance (None disables caching)
+        :param ttl: Seconds a cached response is kept
+        :param lock_ttl: Seconds the single-flight lock is held at most, should its holder die
+        :param wait_timeout: Seconds a caller waits for another caller's result before computing it itself
+        :param cacheable_statuses: Response statuses worth caching; anything else is recomputed every time
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.key_prefix = key_prefix
+        self.cacheable_statuses = set(cacheable_statuses)
+
+        self._lock = threading.Lock()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "waited_hits": 0,
+            "wait_timeouts": 0,
+            "invalidations": 0,
+            "redis_errors": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _version_key(self, school: str) -> str:
+        return f"{self.key_prefix}ver:{school}"
+
+    def _response_key(self, endpoint: str, schools, versions, params: Dict[str, Optional[str]]) -> str:
+        raw = json.dumps(
+            [endpoint, schools, [v or 0 for v in versions], sorted(params.items())],
+            separators=(",", ":"), default=str
+        )
+        return f"{self.key_prefix}resp:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def _read(self, key: str) -> Optional[Tuple[str, int]]:
+        raw = self.redis.get(key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        status, _, body = raw.partition(":")
+        return body, int(status)
+
+    def get_or_compute(
+        self,
+        endpoint: str,
+        schools: Iterable[str],
+        params: Dict[str, Optional[str]],
+        compute: Callable[[], Tuple[str, int]],
+    ) -> Tuple[str, int]:
+        """
+        Return (serialized body, status) for this request, from cache when possible.
+        :param schools: Schools whose schedules the response may contain
+        :param params: Query parameters that change the response
+        :param compute: Callable returning (serialized body, status); exceptions propagate and nothing is cached
+        """
+        if self.redis is None:
+            return compute()
+
+        schools = sorted(set(schools))
+        try:
+            versions = self.redis.mget([self._version_key(s) for s in schools])
+            key = self._response_key(endpoint, schools, versions, params)
+            cached = self._read(key)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.warning("Schedule cache Redis read failed: %s", e)
+            return compute()
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        self._count("misses")
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.warning("Schedule cache lock failed: %s", e)
+            return compute()
+
+        if not acquired:
+            cached = self._wait_for(key)
+            if cached is not None:
+                self._count("waited_hits")
+                return cached
+            self._count("wait_timeouts")
+
+        try:
+            body, status = compute()
+            if status in self.cacheable_statuses:
+                try:
+                    self.redis.set(key, f"{status}:{body}", ex=self.ttl)
+                except redis.RedisError as e:
+                    self._count("redis_errors")
+                    logger.warning("Schedule cache Redis write failed: %s", e)
+            return body, status
+        finally:
+            if acquired:
+                try:
+                    self.redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+                except redis.RedisError as e:
+                    logger.warning("Schedule cache lock release failed: %s", e)
+
+    def _wait_for(self, key: str) -> Optional[Tuple[str, int]]:
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                cached = self._read(key)
+            except redis.RedisError:
+                return None
+            if cached is not None:
+                return cached
+        return None
+
+    def invalidate(self, school: str):
+        """Bump a school's version so every cached response that included it is bypassed."""
+        self._count("invalidations")
+        if self.redis is None:
+            return
+        try:
+            self.redis.incr(self._version_key(school))
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.error("Schedule cache invalidation for %r failed: %s", school, e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.metrics)
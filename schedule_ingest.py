@@ -0,0 +1,490 @@
+"""
+Schedule ingestion shared by POST /schedule/upload, POST /schedule/bulk and the
+`flask --app app ingest-schedules` command.
+
+A bulk run fetches every URL source concurrently on a bounded thread pool (with
+connect/read timeouts, retries, a circuit breaker per host and a size limit), parses the HTML in a process pool, and
+writes all schedules that parsed and validated in a single unordered bulk_write
+of upserts keyed by (school_name, event_type). Every source gets an entry in the
+returned report, whether it was written or why it wasn't.
+
+Schedules ingested from a URL remember the page's ETag/Last-Modified and a hash
+of their normalized games (the "source" subdocument). refresh_schedules()
+revisits those URLs with conditional requests: a 304 or an unchanged hash costs
+one small request and no parsing or rewrite, and a real change $sets only the
+games that differ.
+"""
+import os
+import re
+import json
+import hashlib
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.compat import chardet
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from outbound import CircuitOpenError, OutboundPolicy, policy_from_env
+from schedule_parser import parse_html_schedule, DEFAULT_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+FETCH_HEADERS = {"User-Agent": "Mozilla/5.0"}
+# Timeouts, retries and a circuit breaker per schedule host, from SCHEDULE_FETCH_* settings
+FETCH_POLICY = policy_from_env("schedule", "SCHEDULE_FETCH", connect_timeout=5.0, read_timeout=20.0)
+FETCH_CONNECT_TIMEOUT = FETCH_POLICY.connect_timeout
+FETCH_READ_TIMEOUT = FETCH_POLICY.read_timeout
+FETCH_WORKERS = int(os.getenv("SCHEDULE_FETCH_WORKERS", "8"))
+PARSE_WORKERS = int(os.getenv("SCHEDULE_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+DAY_OF_WEEK_RE = re.compile(r'\s*\(.*\)')
+
+
+class ScheduleFetchError(Exception):
+    """Raised when a schedule URL can't be downloaded."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ScheduleValidationError(Exception):
+    """Raised when a parsed schedule is missing fields or has unparseable dates."""
+
+    def __init__(self, message: str, payload: Dict[str, Any]):
+        """:param payload: JSON error body for the API response"""
+        super().__init__(message)
+        self.payload = payload
+
+
+class ScheduleSource:
+    """One schedule to ingest: either a URL to fetch or HTML already in hand."""
+
+    def __init__(self, label: str, url: Optional[str] = None, html: Optional[str] = None):
+        self.label = label
+        self.url = url
+        self.html = html
+
+
+def sources_from_json(items) -> List[ScheduleSource]:
+    """
+    Build sources from a JSON list of {"url": ...} or {"custom_schedule": "<html>"} objects.
+    Raises ValueError describing the first malformed entry.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("sources must be a non-empty list")
+    sources = []
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and isinstance(item.get("url"), str) and item["url"]:
+            sources.append(ScheduleSource(item["url"], url=item["url"]))
+        elif isinstance(item, dict) and isinstance(item.get("custom_schedule"), str):
+            sources.append(ScheduleSource(f"custom_schedule[{i}]", html=item["custom_schedule"]))
+        else:
+            raise ValueError(f"sources[{i}] must have a 'url' or 'custom_schedule' string")
+    return sources
+
+
+# ------------------------------
+# Fetching
+# ------------------------------
+class SchedulePage:
+    """A fetched schedule page; html is None when the server answered 304 Not Modified."""
+
+    def __init__(self, url: str, html: Optional[str], etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        self.url = url
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def not_modified(self) -> bool:
+        return self.html is None
+
+
+def fetch_schedule_page(url: str, http: Optional[requests.Session] = None,
+                        timeout: Tuple[float, float] = (FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+                        max_bytes: int = DEFAULT_MAX_BYTES, etag: Optional[str] = None,
+                        last_modified: Optional[str] = None, policy: OutboundPolicy = FETCH_POLICY) -> SchedulePage:
+    """
+    Download a schedule page, giving up after `timeout` (connect, read) seconds or once
+    the body exceeds `max_bytes`. Decodes the body the same way response.text would.
+    Connection errors, timeouts and 429/502/503/504 answers are retried under `policy`, and a
+    host whose circuit is open fails fast.
+    :param etag: Validator from a previous fetch, sent as If-None-Match
+    :param last_modified: Validator from a previous fetch, sent as If-Modified-Since
+    """
+    getter = http or requests
+    headers = dict(FETCH_HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        response = policy.call(
+            lambda: getter.get(url, headers=headers, timeout=timeout, stream=True), upstream=urlsplit(url).hostname or ""
+        )
+        with response:
+            new_etag = response.headers.get("ETag") or etag
+            new_last_modified = response.headers.get("Last-Modified") or last_modified
+            if response.status_code == 304 and (etag or last_modified):
+                return SchedulePage(url, None, new_etag, new_last_modified)
+            if response.status_code != 200:
+                raise ScheduleFetchError(f"Failed to fetch schedule from URL (HTTP {response.status_code})",
+                                         response.status_code)
+            chunks = []
+            total = 0
+            for chunk in response.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > max_bytes:
+                    raise ScheduleFetchError(f"Schedule exceeds the {max_bytes} byte limit")
+                chunks.append(chunk)
+            content = b"".join(chunks)
+            encoding = response.encoding or (chardet.detect(content)["encoding"] if chardet else None) or "utf-8"
+    except (requests.RequestException, CircuitOpenError) as e:
+        raise ScheduleFetchError(f"Failed to fetch schedule from URL: {e}")
+    try:
+        html = content.decode(encoding, errors="replace")
+    except LookupError:
+        html = content.decode("utf-8", errors="replace")
+    return SchedulePage(url, html, new_etag, new_last_modified)
+
+
+# ------------------------------
+# Validation and normalization
+# ------------------------------
+def prepare_schedule(schedule_data: Dict[str, Any], user_id) -> Dict[str, Any]:
+    """
+    Validate a parsed schedule and normalize it for storage, in place:
+    event_type is lifted to the schedule level, game dates become MM/DD/YYYY
+    (rolling the year over when the month goes backwards), and user_id and
+    last_updated are set. Raises ScheduleValidationError.
+    """
+    year = schedule_data.get("year", "")
+    event_type = schedule_data.get("event_type")
+
+    # If event_type wasn't found, maybe it's in the first game's data
+    if not event_type and schedule_data.get("games"):
+        event_type = schedule_data["games"][0].get("event_type", "")
+
+    # Check for missing required fields (school_name is optional)
+    missing_fields = []
+    if not year:
+        missing_fields.append("year")
+    if not event_type:
+        missing_fields.append("event_type")
+
+    if missing_fields:
+        raise ScheduleValidationError("Missing required fields", {
+            "error": "Missing required fields",
+            "missing_fields": missing_fields,
+            "schedule_data": schedule_data
+        })
+
+    # Store event_type at the schedule level
+    schedule_data["event_type"] = event_type
+
+    # Associate the schedule with the uploading user
+    schedule_data["user_id"] = user_id
+
+    # Date parsing logic (still uses year)
+    try:
+        current_year = int(year)
+    except (TypeError, ValueError):
+        raise ScheduleValidationError("Invalid year", {"error": f"Invalid year '{year}'"})
+    previous_dt = None
+
+    for game in schedule_data.get("games", []):
+        raw_date = game.get("date", "")
+        if raw_date:
+            # Remove any day-of-week info, e.g. "(Fri)"
+            clean_date = DAY_OF_WEEK_RE.sub('', raw_date).strip()
+            try:
+                dt = datetime.strptime(f"{clean_date} {current_year}", "%b %d %Y")
+                # If this date's month is less than a previous date's month, assume rollover to next year
+                if previous_dt and dt.month < previous_dt.month:
+                    current_year += 1
+                    dt = datetime.strptime(f"{clean_date} {current_year}", "%b %d %Y")
+            except Exception as e:
+                raise ScheduleValidationError("Failed to parse game date", {
+                    "error": f"Failed to parse game date '{raw_date}': {str(e)}"
+                })
+
+            game["date"] = dt.strftime("%m/%d/%Y")
+            previous_dt = dt
+
+        # Remove event_type from individual games
+        if "event_type" in game:
+            game.pop("event_type")
+
+    schedule_data["last_updated"] = datetime.utcnow()
+    return schedule_data
+
+
+def schedule_filter(schedule_data: Dict[str, Any]) -> Dict[str, Any]:
+    # (If school_name is blank, that's okay; it just means they're "public" or unknown school events.)
+    return {"school_name": schedule_data.get("school_name", ""), "event_type": schedule_data["event_type"]}
+
+
+def games_hash(games: List[Dict[str, Any]]) -> str:
+    """Stable hash of normalized games, used to skip rewrites when a page re-renders identically."""
+    raw = json.dumps(games, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def attach_source(schedule_data: Dict[str, Any], page: SchedulePage) -> Dict[str, Any]:
+    """Record where a prepared schedule came from so refresh_schedules() can revisit it."""
+    schedule_data["source"] = {
+        "url": page.url,
+        "etag": page.etag,
+        "last_modified": page.last_modified,
+        "games_hash": games_hash(schedule_data.get("games", [])),
+        "checked_at": datetime.utcnow(),
+    }
+    return schedule_data
+
+
+def _schedule_update(schedule_data: Dict[str, Any]) -> Dict[str, Any]:
+    update = {"$set": schedule_data}
+    if "source" not in schedule_data:
+        # A file or manual upload replaces a URL-registered schedule; stop refreshing it from the URL.
+        update["$unset"] = {"source": ""}
+    return update
+
+
+def upsert_schedule(collection, schedule_data: Dict[str, Any]) -> bool:
+    """Write one prepared schedule; returns True if it created a new document."""
+    result = collection.update_one(schedule_filter(schedule_data), _schedule_update(schedule_data), upsert=True)
+    return result.upserted_id is not None
+
+
+# ------------------------------
+# Bulk ingestion
+# ------------------------------
+_pool_lock = threading.Lock()
+_parse_pool = None
+_parse_pool_pid = None
+
+
+def _get_parse_pool(workers: int, replace: bool = False) -> ProcessPoolExecutor:
+    """One parse pool per process, created on first use and recreated after a fork
+    or when a worker died and broke the pool."""
+    global _parse_pool, _parse_pool_pid
+    with _pool_lock:
+        if replace or _parse_pool is None or _parse_pool_pid != os.getpid():
+            # By now this process runs Mongo monitors and other background threads; forking it
+            # could copy a held lock into a child, so workers come from a clean forkserver.
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+            _parse_pool_pid = os.getpid()
+        return _parse_pool
+
+
+def _shutdown_parse_pool():
+    if _parse_pool is not None and _parse_pool_pid == os.getpid():
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown_parse_pool)
+
+
+def _submit_parse(html: str, parse_workers: int) -> Future:
+    if parse_workers > 0:
+        try:
+            return _get_parse_pool(parse_workers).submit(parse_html_schedule, html)
+        except BrokenProcessPool:
+            return _get_parse_pool(parse_workers, replace=True).submit(parse_html_schedule, html)
+    future = Future()
+    try:
+        future.set_result(parse_html_schedule(html))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def ingest_schedules(
+    sources: List[ScheduleSource],
+    collection,
+    user_id,
+    fetch_workers: int = FETCH_WORKERS,
+    parse_workers: int = PARSE_WORKERS,
+    http: Optional[requests.Session] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch, parse, validate and upsert many schedules at once.
+    :param parse_workers: Size of the parse process pool; 0 parses in this process
+    :return: One report dict per source, in input order, with "status" of
+             "created", "updated", "superseded" (a later source had the same
+             school/event type) or "error" (with "error" explaining why)
+    """
+    reports = [{"source": s.label, "status": "error"} for s in sources]
+    parse_futures = {}
+    pages = {}
+
+    # 1) Fetch URLs concurrently, handing each page to the parse pool as it arrives
+    url_sources = [i for i, s in enumerate(sources) if s.url]
+    for i, s in enumerate(sources):
+        if not s.url:
+            parse_futures[i] = _submit_parse(s.html or "", parse_workers)
+    if url_sources:
+        with ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(url_sources))),
+                                thread_name_prefix="schedule-fetch") as fetch_pool:
+            fetches = {fetch_pool.submit(fetch_schedule_page, sources[i].url, http): i for i in url_sources}
+            for fetch in as_completed(fetches):
+                i = fetches[fetch]
+                try:
+                    pages[i] = fetch.result()
+                except ScheduleFetchError as e:
+                    reports[i]["error"] = str(e)
+                    continue
+                parse_futures[i] = _submit_parse(pages[i].html, parse_workers)
+
+    # 2) Collect parse results and validate them
+    prepared = {}
+    for i, future in sorted(parse_futures.items()):
+        try:
+            schedule_data = future.result()
+        except Exception as e:
+            logger.warning("Parsing schedule from %s failed: %s", sources[i].label, e)
+            reports[i]["error"] = f"Failed to parse schedule: {e}"
+            continue
+        if not schedule_data:
+            reports[i]["error"] = "Failed to parse or retrieve schedule"
+            continue
+        try:
+            prepare_schedule(schedule_data, user_id)
+        except ScheduleValidationError as e:
+            reports[i]["error"] = e.payload.get("error", str(e))
+            if "missing_fields" in e.payload:
+                reports[i]["missing_fields"] = e.payload["missing_fields"]
+            continue
+        if i in pages:
+            attach_source(schedule_data, pages[i])
+        key = tuple(schedule_filter(schedule_data).values())
+        reports[i].update({"school_name": key[0], "event_type": key[1], "games": len(schedule_data.get("games", []))})
+        # Later sources win when two resolve to the same schedule
+        if key in prepared:
+            reports[prepared[key][0]]["status"] = "superseded"
+        prepared[key] = (i, schedule_data)
+
+    # 3) One round trip for every write
+    writes = sorted(prepared.values(), key=lambda item: item[0])
+    if not writes:
+        return reports
+    operations = [UpdateOne(schedule_filter(doc), _schedule_update(doc), upsert=True) for _, doc in writes]
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        upserted = set(result.upserted_ids)
+        failed = {}
+    except BulkWriteError as e:
+        upserted = {u["index"] for u in e.details.get("upserted", [])}
+        failed = {err["index"]: err.get("errmsg", "write failed") for err in e.details.get("writeErrors", [])}
+
+    for op_index, (i, _) in enumerate(writes):
+        if op_index in failed:
+            reports[i]["error"] = f"Failed to write schedule: {failed[op_index]}"
+        else:
+            reports[i]["status"] = "created" if op_index in upserted else "updated"
+    return reports
+
+
+# ------------------------------
+# Incremental refresh
+# ------------------------------
+REFRESH_PROJECTION = {"school_name": 1, "event_type": 1, "year": 1, "user_id": 1, "games": 1, "source": 1}
+
+
+def _refresh_one(doc: Dict[str, Any], http: Optional[requests.Session]) -> Tuple[Dict[str, Any], Optional[UpdateOne]]:
+    """Conditionally re-fetch one URL-registered schedule and return (report, update or None)."""
+    source = doc["source"]
+    report = {"school_name": doc.get("school_name", ""), "event_type": doc.get("event_type"),
+              "url": source["url"], "status": "error"}
+    now = datetime.utcnow()
+    try:
+        page = fetch_schedule_page(source["url"], http, etag=source.get("etag"),
+                                   last_modified=source.get("last_modified"))
+    except ScheduleFetchError as e:
+        report["error"] = str(e)
+        return report, None
+
+    validators = {"source.etag": page.etag, "source.last_modified": page.last_modified, "source.checked_at": now}
+    if page.not_modified:
+        report["status"] = "not_modified"
+        return report, UpdateOne({"_id": doc["_id"]}, {"$set": validators})
+
+    schedule_data = parse_html_schedule(page.html)
+    if not schedule_data:
+        report["error"] = "Failed to parse schedule"
+        return report, None
+    try:
+        prepare_schedule(schedule_data, doc.get("user_id"))
+    except ScheduleValidationError as e:
+        report["error"] = e.payload.get("error", str(e))
+        return report, None
+
+    new_games = schedule_data.get("games", [])
+    new_hash = games_hash(new_games)
+    if new_hash == source.get("games_hash"):
+        report["status"] = "unchanged"
+        return report, UpdateOne({"_id": doc["_id"]}, {"$set": validators})
+
+    # Only the games that differ are rewritten; a different number of games replaces the list.
+    old_games = doc.get("games", [])
+    changes = dict(validators)
+    if len(old_games) == len(new_games):
+        changed = [i for i, (old, new) in enumerate(zip(old_games, new_games)) if old != new]
+        for i in changed:
+            changes[f"games.{i}"] = new_games[i]
+        report["changed_games"] = len(changed)
+    else:
+        changes["games"] = new_games
+        report["changed_games"] = len(new_games)
+    if schedule_data.get("year") != doc.get("year"):
+        changes["year"] = schedule_data.get("year")
+    changes["source.games_hash"] = new_hash
+    changes["last_updated"] = now
+    report["status"] = "updated"
+    return report, UpdateOne({"_id": doc["_id"]}, {"$set": changes})
+
+
+def refresh_schedules(collection, fetch_workers: int = FETCH_WORKERS,
+                      http: Optional[requests.Session] = None,
+                      query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Revisit every schedule registered by URL (or those matching `query`) and apply
+    what changed in one bulk_write. Meant to run periodically, e.g. daily from cron.
+    :return: One report per schedule with "status" of "not_modified" (304),
+             "unchanged" (same games hash), "updated" (with "changed_games") or "error"
+    """
+    selector = {"source.url": {"$exists": True}}
+    if query:
+        selector.update(query)
+    docs = list(collection.find(selector, REFRESH_PROJECTION))
+    if not docs:
+        return []
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(docs))),
+                            thread_name_prefix="schedule-refresh") as fetch_pool:
+        for report, update in fetch_pool.map(lambda doc: _refresh_one(doc, http), docs):
+            results.append((report, update))
+
+    operations = [update for _, update in results if update is not None]
+    if operations:
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            written = [report for report, update in results if update is not None]
+            for index in failed:
+                written[index]["status"] = "error"
+                written[index]["error"] = "Failed to write schedule"
+    return [report for report, _ in results]
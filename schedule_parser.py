@@ -1,11 +1,31 @@
+import os
 import re
+import codecs
 import logging
-from typing import Optional, Dict, Any
+from html.parser import HTMLParser
+from typing import Optional, Dict, Any, Iterator, List
 from bs4 import BeautifulSoup
 
 logger = logging.getLogger(__name__)
 
-def parse_html_schedule(html_content: str) -> Optional[Dict[str, Any]]:
+# "fast" streams the markup through html.parser and falls back to html5lib for anything it
+# can't extract exactly the way html5lib would; "html5lib" always builds the full tree.
+BACKENDS = ("fast", "html5lib")
+DEFAULT_BACKEND = os.getenv("SCHEDULE_PARSER_BACKEND", "fast")
+DEFAULT_MAX_BYTES = int(os.getenv("SCHEDULE_MAX_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+COLUMN_SPLIT_RE = re.compile(r"\s{2,}")
+YEAR_RE = re.compile(r"\b(\d{4})\b")
+LEGACY_HEADER_RE = re.compile(r"\bDate\b.*\bTime\b.*\bAt\b.*\bOpponent\b.*\bLocation\b", re.IGNORECASE)
+DYNAMIC_COLUMNS = {"date", "time", "at", "opponent", "location", "result"}
+
+
+class ScheduleTooLargeError(ValueError):
+    """Raised when a streamed schedule exceeds the configured byte limit."""
+
+
+def parse_html_schedule(html_content: str, backend: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     Attempts to parse HTML schedule data in one of two ways:
 
@@ -24,9 +44,89 @@ def parse_html_schedule(html_content: str) -> Optional[Dict[str, Any]]:
        - line[3]: the header row (any subset of date/time/at/opponent/location/result)
        - lines[4+]: game lines, each having at least date/time/location.
 
-    If one approach fails, it falls back to the other. If both fail, returns None.
+    Legacy wins if it finds any games, otherwise dynamic is used. If both fail, returns None.
+    The text is taken from the first <pre> if present, else from the whole document.
+    :param backend: "fast" or "html5lib" (defaults to SCHEDULE_PARSER_BACKEND)
     """
+    return parse_schedule_lines(extract_schedule_lines(html_content, backend))
 
+
+def parse_schedule_stream(stream, max_bytes: Optional[int] = None, backend: Optional[str] = None,
+                          encoding: str = "utf-8") -> Optional[Dict[str, Any]]:
+    """
+    Parse a schedule from a binary file-like object (e.g. an uploaded file) without
+    reading it into memory first. With the fast backend, reading stops as soon as the
+    schedule's <pre> block has been closed.
+    :param max_bytes: Raise ScheduleTooLargeError once more than this many bytes have been read
+    """
+    backend = _resolve_backend(backend)
+    chunks = _read_chunks(stream, DEFAULT_MAX_BYTES if max_bytes is None else max_bytes, encoding)
+    if backend == "html5lib":
+        return parse_schedule_lines(_html5lib_lines("".join(chunks)))
+
+    received = []
+    extractor = _ScheduleTextExtractor()
+    try:
+        for text in chunks:
+            received.append(text)
+            extractor.feed(text)
+            if extractor.done:
+                break
+        else:
+            extractor.close()
+        lines = extractor.lines()
+    except _Unsupported as e:
+        logger.debug("Fast schedule extraction unsupported (%s); falling back to html5lib.", e)
+        received.extend(chunks)
+        lines = _html5lib_lines("".join(received))
+    return parse_schedule_lines(lines)
+
+
+def extract_schedule_lines(html_content: str, backend: Optional[str] = None) -> List[str]:
+    """Return the non-blank, stripped text lines of the schedule's <pre> block (or whole document)."""
+    if _resolve_backend(backend) == "html5lib":
+        return _html5lib_lines(html_content)
+
+    extractor = _ScheduleTextExtractor()
+    try:
+        for start in range(0, len(html_content), CHUNK_SIZE):
+            extractor.feed(html_content[start:start + CHUNK_SIZE])
+            if extractor.done:
+                break
+        else:
+            extractor.close()
+        return extractor.lines()
+    except _Unsupported as e:
+        logger.debug("Fast schedule extraction unsupported (%s); falling back to html5lib.", e)
+        return _html5lib_lines(html_content)
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown schedule parser backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def _read_chunks(stream, max_bytes: int, encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    total = 0
+    while True:
+        data = stream.read(CHUNK_SIZE)
+        if not data:
+            break
+        total += len(data)
+        if total > max_bytes:
+            raise ScheduleTooLargeError(f"Schedule exceeds the {max_bytes} byte limit")
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _html5lib_lines(html_content: str) -> List[str]:
     soup = BeautifulSoup(html_content, "html5lib")
 
     # Attempt to extract text from <pre> if present:
@@ -37,163 +137,268 @@ def parse_html_schedule(html_content: str) -> Optional[Dict[str, Any]]:
         schedule_text = soup.get_text("\n", strip=True)
 
     # Clean up lines
-    lines = [l.strip() for l in schedule_text.split("\n") if l.strip()]
-
-    # 1) Attempt the 'legacy' GoBearcats approach
-    schedule_data_legacy = _try_legacy_format(lines)
-    if schedule_data_legacy is not None and schedule_data_legacy.get("games"):
-        return schedule_data_legacy
-
-    # 2) If the legacy approach failed (or no games found), 
-    #    attempt the 'dynamic / schedule builder' approach
-    schedule_data_dynamic = _try_dynamic_format(lines)
-    if schedule_data_dynamic is not None and schedule_data_dynamic.get("games"):
-        return schedule_data_dynamic
-
-    # If both approaches yield no valid games, return None
-    logger.error("No valid games parsed in either legacy or dynamic approach.")
-    return None
-
-def _try_legacy_format(lines) -> Optional[Dict[str, Any]]:
-    """
-    Legacy approach:
-      - lines[0]: school name
-      - lines[1]: might have a year
-      - find a row with 'Date' 'Time' 'At' 'Opponent' 'Location'
-      - parse lines after that, expecting at least 5 columns
-    """
-    if len(lines) < 2:
-        logger.debug("Legacy format check: not enough lines to parse.")
-        return None
-
-    school_name = lines[0].strip()
+    return [l.strip() for l in schedule_text.split("\n") if l.strip()]
 
-    # Attempt to find a 4-digit year in line[1]
-    import re
-    year_match = re.search(r"\b(\d{4})\b", lines[1])
-    year = year_match.group(1) if year_match else ""
 
-    # Find the header row that contains "Date ... Time ... At ... Opponent ... Location"
-    header_pattern = re.compile(r"\bDate\b.*\bTime\b.*\bAt\b.*\bOpponent\b.*\bLocation\b", re.IGNORECASE)
-    start_index = None
-    for i, line in enumerate(lines):
-        if header_pattern.search(line):
-            start_index = i + 1
-            break
-
-    if start_index is None:
-        logger.debug("Legacy format check: Could not find matching header row.")
-        return None
-
-    # We have a potential start index for game lines
-    schedule_data = {
-        "school_name": school_name,
-        "year": year,
-        # no "event_type" known in legacy approach, but you could guess from line[1] if you want
-        "games": []
-    }
-
-    # parse lines from start_index forward
-    for line in lines[start_index:]:
-        if not line.strip():
-            continue
-
-        # Split by multiple spaces
-        parts = re.split(r"\s{2,}", line.strip())
-        if len(parts) < 5:
-            # Possibly not enough columns for date/time/at/opponent/location
-            logger.debug("Legacy: skipping malformed line: %s", line)
-            continue
+# ------------------------------
+# Fast path: incremental <pre> text extraction
+# ------------------------------
+class _Unsupported(Exception):
+    """Markup where html.parser's view could differ from html5lib's tree; use html5lib instead."""
 
-        # Unpack the first 5 columns
-        date, time, at, opponent, location = parts[:5]
-        result = parts[5] if len(parts) > 5 else "TBD"
-
-        game = {
-            "date": date,
-            "time": time,
-            "home_or_away": "Home" if at.strip().lower() == "home" else "Away",
-            "opponent": opponent,
-            "location": location,
-            "result": result
-        }
-        schedule_data["games"].append(game)
 
-    if not schedule_data["games"]:
-        logger.debug("Legacy format check: no games found after parsing.")
-        return None
+# Tags that may appear inside the extracted text without changing how html5lib splits it
+# into text nodes. Anything else (block elements, tables, scripts, stray end tags, ...) can
+# make html5lib move or merge text, so the fast path gives up rather than guess.
+_INLINE_TAGS = {
+    "a", "abbr", "b", "big", "cite", "code", "em", "font", "i", "kbd", "mark", "q", "s",
+    "samp", "small", "span", "strike", "strong", "sub", "sup", "tt", "u", "var",
+}
+_VOID_TAGS = {"br", "img", "wbr"}
+# Elements whose content html5lib treats as raw text or re-parents; a <pre> seen while one
+# of them is open may not be the element html5lib's find("pre") returns.
+_OPAQUE_TAGS = {
+    "frameset", "iframe", "math", "noembed", "noframes", "noscript", "plaintext", "select",
+    "svg", "table", "template", "textarea", "title", "xmp",
+}
 
-    logger.debug("Legacy format succeeded with %d games.", len(schedule_data["games"]))
-    return schedule_data
 
-def _try_dynamic_format(lines) -> Optional[Dict[str, Any]]:
+class _ScheduleTextExtractor(HTMLParser):
     """
-    Dynamic approach (schedule builder):
-      - line[0] = school_name
-      - line[1] = year
-      - line[2] = event_type
-      - line[3] = header row
-      - line[4+] = game lines
-
-    We look for columns among {date, time, at, opponent, location, result}.
-    We skip lines that don't at least have date/time/location.
+    Collects the text nodes html5lib's get_text() would see for the first <pre>, or for
+    the whole document when there is no <pre>, while the markup is fed in chunks.
+    Raises _Unsupported as soon as the markup leaves the subset handled exactly.
     """
-    if len(lines) < 4:
-        logger.debug("Dynamic format check: not enough lines for 4-line header approach.")
-        return None
-
-    school_name = lines[0]         # line 1
-    year = lines[1]               # line 2
-    event_type = lines[2]         # line 3
-    header_line = lines[3]        # line 4
 
-    # If year isn't 4 digits, we won't treat that as a fail, but just note it
-    # If event_type is empty, also not a fail, but might lead to no event_type
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self._in_pre = False
+        self._pre_nodes = []
+        self._pre_stack = []
+        self._opaque = []
+        # Whole-document text, only used when no <pre> turns up
+        self._doc_nodes = []
+        self._doc_stack = []
+        self._doc_supported = True
+        self._buffer = []
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        if "<" in text or "\x00" in text:
+            # A literal "<" that html.parser passed through as text may be a tag to html5lib.
+            if self._in_pre:
+                raise _Unsupported("'<' or NUL in <pre> text")
+            self._doc_supported = False
+            return
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if self._in_pre:
+            self._pre_nodes.append(text)
+        elif self._doc_supported:
+            self._doc_nodes.append(text)
+
+    def handle_data(self, data):
+        if not self.done and (self._in_pre or self._doc_supported):
+            self._buffer.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self._flush()
+        if self._in_pre:
+            if tag in _VOID_TAGS:
+                return
+            if tag not in _INLINE_TAGS or (tag == "a" and "a" in self._pre_stack):
+                raise _Unsupported(f"<{tag}> inside <pre>")
+            self._pre_stack.append(tag)
+            return
+
+        if self._opaque and self._opaque[-1] in ("textarea", "title"):
+            # html5lib reads these as plain text, so this "tag" is really text to it.
+            raise _Unsupported(f"<{tag}> inside <{self._opaque[-1]}>")
+        if tag == "pre":
+            if self._opaque:
+                raise _Unsupported(f"<pre> inside <{self._opaque[-1]}>")
+            self._in_pre = True
+            return
+        if tag in _OPAQUE_TAGS:
+            if tag == "plaintext":
+                raise _Unsupported("<plaintext>")
+            self._opaque.append(tag)
+        self._doc_tag(tag, start=True)
+
+    def handle_startendtag(self, tag, attrs):
+        # HTML ignores the self-closing slash on non-void elements: <b/> opens a <b>.
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        self._flush()
+        if self._in_pre:
+            if tag == "pre":
+                self._in_pre = False
+                self.done = True
+            elif self._pre_stack and self._pre_stack[-1] == tag:
+                self._pre_stack.pop()
+            else:
+                raise _Unsupported(f"</{tag}> inside <pre>")
+            return
+
+        if self._opaque and self._opaque[-1] in ("textarea", "title") and tag != self._opaque[-1]:
+            raise _Unsupported(f"</{tag}> inside <{self._opaque[-1]}>")
+        if tag in self._opaque:
+            while self._opaque.pop() != tag:
+                pass
+        self._doc_tag(tag, start=False)
+
+    def _doc_tag(self, tag, start):
+        if not self._doc_supported:
+            return
+        if tag in _VOID_TAGS and start:
+            return
+        if tag not in _INLINE_TAGS:
+            self._doc_supported = False
+        elif start:
+            if tag == "a" and "a" in self._doc_stack:
+                self._doc_supported = False
+            self._doc_stack.append(tag)
+        elif self._doc_stack and self._doc_stack[-1] == tag:
+            self._doc_stack.pop()
+        else:
+            self._doc_supported = False
+
+    def handle_comment(self, data):
+        if not self.done:
+            self._flush()
+
+    def handle_pi(self, data):
+        if not self.done:
+            self._flush()
+
+    def handle_decl(self, decl):
+        if self.done:
+            return
+        self._flush()
+        if self._in_pre:
+            raise _Unsupported("declaration inside <pre>")
+        self._doc_supported = False
+
+    def unknown_decl(self, data):
+        if not self.done:
+            raise _Unsupported(f"<![{data[:10]}")
+
+    def feed(self, data):
+        try:
+            super().feed(data)
+        except AssertionError as e:
+            raise _Unsupported(str(e))
+
+    def close(self):
+        try:
+            super().close()
+        except AssertionError as e:
+            raise _Unsupported(str(e))
+        if not self.done:
+            self._flush()
+
+    def lines(self) -> List[str]:
+        if self.done or self._in_pre:
+            nodes = self._pre_nodes
+        elif self._doc_supported:
+            nodes = self._doc_nodes
+        else:
+            raise _Unsupported("no <pre> and the document is not plain text")
+        return [l.strip() for node in nodes for l in node.split("\n") if l.strip()]
+
+
+# ------------------------------
+# Format detection
+# ------------------------------
+def parse_schedule_lines(lines: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Detect the legacy and dynamic formats in a single pass over the lines,
+    splitting each line into columns once for both.
+    """
+    count = len(lines)
 
-    # We'll parse columns in the header
-    header_columns = re.split(r"\s{2,}", header_line.strip())
-    if len(header_columns) < 2:
-        # fallback single-space
-        header_columns = header_line.strip().split()
+    # Legacy: games follow the first "Date Time At Opponent Location" header row
+    legacy_games = []
+    legacy_started = False
 
-    valid_cols = {"date", "time", "at", "opponent", "location", "result"}
+    # Dynamic: line[3] is the header row, games from line[4] on
+    dynamic_games = []
     col_positions = {}
-    for idx, col in enumerate(header_columns):
-        col_lower = col.strip().lower()
-        if col_lower in valid_cols:
-            col_positions[idx] = col_lower
-
-    # Parse the subsequent lines as games
-    games = []
-    for line in lines[4:]:
-        parts = re.split(r"\s{2,}", line.strip())
-        if len(parts) < 2:
-            parts = line.strip().split()
-        if not parts:
-            continue
-
-        game_obj = {}
-        for idx, val in enumerate(parts):
-            if idx in col_positions:
-                col_name = col_positions[idx]
-                game_obj[col_name] = val.strip()
+    if count >= 4:
+        header_columns = COLUMN_SPLIT_RE.split(lines[3].strip())
+        if len(header_columns) < 2:
+            header_columns = lines[3].strip().split()
+        for idx, col in enumerate(header_columns):
+            col_lower = col.strip().lower()
+            if col_lower in DYNAMIC_COLUMNS:
+                col_positions[idx] = col_lower
 
-        # Enforce date/time/location so partial lines don't slip through
-        if "date" not in game_obj or "time" not in game_obj or "location" not in game_obj:
-            logger.debug("Dynamic: skipping line missing required columns: %s", line)
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
             continue
+        parts = None
+
+        if legacy_started:
+            parts = COLUMN_SPLIT_RE.split(line)
+            if len(parts) >= 5:
+                date, time, at, opponent, location = parts[:5]
+                legacy_games.append({
+                    "date": date,
+                    "time": time,
+                    "home_or_away": "Home" if at.strip().lower() == "home" else "Away",
+                    "opponent": opponent,
+                    "location": location,
+                    "result": parts[5] if len(parts) > 5 else "TBD"
+                })
+            else:
+                logger.debug("Legacy: skipping malformed line: %s", line)
+        elif count >= 2 and LEGACY_HEADER_RE.search(line):
+            legacy_started = True
+
+        # Legacy wins whenever it finds a game, so dynamic parsing can stop once it has one.
+        if i >= 4 and not legacy_games:
+            if parts is None:
+                parts = COLUMN_SPLIT_RE.split(line)
+            if len(parts) < 2:
+                parts = line.split()
+            game_obj = {}
+            for idx, val in enumerate(parts):
+                if idx in col_positions:
+                    game_obj[col_positions[idx]] = val.strip()
+            # Enforce date/time/location so partial lines don't slip through
+            if "date" in game_obj and "time" in game_obj and "location" in game_obj:
+                dynamic_games.append(game_obj)
+            else:
+                logger.debug("Dynamic: skipping line missing required columns: %s", line)
+
+    if legacy_games:
+        year_match = YEAR_RE.search(lines[1])
+        logger.debug("Legacy format succeeded with %d games.", len(legacy_games))
+        return {
+            "school_name": lines[0].strip(),
+            "year": year_match.group(1) if year_match else "",
+            # no "event_type" known in legacy approach
+            "games": legacy_games
+        }
 
-        games.append(game_obj)
-
-    if not games:
-        logger.debug("Dynamic format check: no valid games found.")
-        return None
+    if dynamic_games:
+        logger.debug("Dynamic format succeeded with %d games.", len(dynamic_games))
+        return {
+            "school_name": lines[0],
+            "year": lines[1],
+            "event_type": lines[2],
+            "games": dynamic_games
+        }
 
-    schedule_data = {
-        "school_name": school_name,
-        "year": year,
-        "event_type": event_type,
-        "games": games
-    }
-    logger.debug("Dynamic format succeeded with %d games.", len(games))
-    return schedule_data
+    # If both approaches yield no valid games, return None
+    logger.error("No valid games parsed in either legacy or dynamic approach.")
+    return None
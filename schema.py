@@ -0,0 +1,159 @@
+"""
+Declared MongoDB indexes and the hot queries they exist to serve.
+
+INDEXES is the single list of indexes the app relies on; ensure_indexes()
+creates them (idempotently) and HOT_QUERIES lists the request-path queries
+that must never fall back to a collection scan. verify_hot_queries() runs
+explain() on each one and raises IndexVerificationError if any winning plan
+contains a COLLSCAN.
+
+Both are exposed as Flask CLI commands in app.py:
+    flask --app app ensure-indexes
+    flask --app app verify-indexes
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from listing_query import LISTING_SORT, build_listing_query, encode_cursor, parse_listing_args
+
+logger = logging.getLogger(__name__)
+
+
+class IndexVerificationError(RuntimeError):
+    """Raised when a hot query's winning plan scans a whole collection."""
+
+
+class IndexSpec:
+    def __init__(self, collection: str, keys: Sequence[Tuple[str, int]], name: str,
+                 unique: bool = False, partial: Optional[Dict[str, Any]] = None):
+        """
+        :param keys: [(field, direction), ...] as passed to create_index
+        :param name: Explicit index name, so re-running never creates a duplicate under a generated name
+        :param partial: partialFilterExpression; documents outside it are not indexed (or uniqueness-checked)
+        """
+        self.collection = collection
+        self.keys = list(keys)
+        self.name = name
+        self.unique = unique
+        self.partial = partial
+
+    def options(self) -> Dict[str, Any]:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.partial:
+            options["partialFilterExpression"] = self.partial
+        return options
+
+
+class HotQuery:
+    def __init__(self, name: str, collection: str, filter: Dict[str, Any],
+                 sort: Optional[List[Tuple[str, int]]] = None):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+
+
+# Listings and attendance records share the tickets collection: listings carry
+# seller_id, attendance records carry attendee_id. The unique indexes below are
+# partial so each one only constrains its own kind of document.
+INDEXES = [
+    IndexSpec("tickets", [("status", ASCENDING), ("event_date", ASCENDING), ("_id", ASCENDING)],
+              name="status_event_date_id"),
+    IndexSpec("tickets", [("seller_id", ASCENDING), ("event_name", ASCENDING)],
+              name="seller_event_unique", unique=True,
+              partial={"seller_id": {"$exists": True}}),
+    IndexSpec("tickets", [("buyer_id", ASCENDING)],
+              name="buyer_id", partial={"buyer_id": {"$exists": True}}),
+    IndexSpec("tickets", [("transaction_id", ASCENDING)],
+              name="transaction_id", partial={"transaction_id": {"$exists": True}}),
+    IndexSpec("tickets", [("attendee_id", ASCENDING), ("event_name", ASCENDING)],
+              name="attendee_event_unique", unique=True,
+              partial={"attendee_id": {"$exists": True}}),
+    IndexSpec("users", [("email", ASCENDING)], name="email_unique", unique=True),
+    IndexSpec("schedules", [("school_name", ASCENDING), ("event_type", ASCENDING)],
+              name="school_event_type_unique", unique=True),
+]
+
+_SAMPLE_ID = ObjectId()
+
+HOT_QUERIES = [
+    HotQuery("GET /tickets", "tickets", build_listing_query(parse_listing_args({})), sort=LISTING_SORT),
+    HotQuery("GET /tickets next page", "tickets",
+             build_listing_query(parse_listing_args({"cursor": encode_cursor(datetime(2026, 1, 1), _SAMPLE_ID)})),
+             sort=LISTING_SORT),
+    HotQuery("POST /tickets duplicate check", "tickets",
+             {"seller_id": _SAMPLE_ID, "event_name": "sample"}),
+    HotQuery("GET /tickets/mine", "tickets",
+             {"$or": [{"seller_id": _SAMPLE_ID}, {"buyer_id": _SAMPLE_ID}]}),
+    HotQuery("POST /webhooks/stripe", "tickets", {"transaction_id": "pi_sample"}),
+    HotQuery("POST /Attend duplicate check", "tickets",
+             {"attendee_id": _SAMPLE_ID, "event_name": "sample"}),
+    HotQuery("GET /attendance", "tickets", {"attendee_id": _SAMPLE_ID}),
+    HotQuery("login / register", "users", {"email": "sample@example.com"}),
+    HotQuery("POST /schedule/upload", "schedules", {"school_name": "public", "event_type": "sample"}),
+    HotQuery("GET /schedule/all", "schedules", {"school_name": {"$in": ["public", "sample"]}}),
+]
+
+
+def ensure_indexes(db, indexes: Sequence[IndexSpec] = INDEXES) -> List[Tuple[IndexSpec, Optional[str]]]:
+    """
+    Create every declared index. Existing indexes with the same name and options
+    are left alone, so this is safe to run on every startup.
+    Returns [(spec, error_message_or_None), ...]; failures (e.g. duplicates that
+    block a unique index, or an index of the same name with different options)
+    are logged rather than raised so one bad index doesn't stop the rest.
+    """
+    results = []
+    for spec in indexes:
+        try:
+            db[spec.collection].create_index(spec.keys, **spec.options())
+            results.append((spec, None))
+        except OperationFailure as e:
+            logger.error("Could not create index %s.%s: %s", spec.collection, spec.name, e)
+            results.append((spec, str(e)))
+    return results
+
+
+def _plan_stages(plan: Any):
+    """Yield every stage name in an explain() plan tree, whatever its nesting."""
+    if isinstance(plan, dict):
+        stage = plan.get("stage")
+        if stage:
+            yield stage
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_stages(db, query: HotQuery) -> List[str]:
+    cursor = db[query.collection].find(query.filter)
+    if query.sort:
+        cursor = cursor.sort(query.sort)
+    explanation = cursor.explain()
+    return list(_plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {})))
+
+
+def verify_hot_queries(db, queries: Sequence[HotQuery] = HOT_QUERIES) -> Dict[str, List[str]]:
+    """
+    explain() each hot query and raise IndexVerificationError naming every query
+    whose winning plan includes a COLLSCAN. Returns {query name: plan stages}.
+    """
+    plans = {}
+    scans = []
+    for query in queries:
+        stages = explain_stages(db, query)
+        plans[query.name] = stages
+        if "COLLSCAN" in stages:
+            scans.append(f"{query.name} ({query.collection} {query.filter})")
+    if scans:
+        raise IndexVerificationError("Collection scan on hot path: " + "; ".join(scans))
+    return plans
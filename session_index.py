@@ -0,0 +1,174 @@
+import time
+import logging
+from typing import List, Optional
+
+from flask_session import Session
+from flask_session.defaults import Defaults
+from flask_session.base import ServerSideSessionInterface
+from flask_session.redis import RedisSessionInterface
+
+logger = logging.getLogger(__name__)
+
+USER_INDEX_PREFIX = "user_sessions:"
+
+
+def user_index_key(user_id: str) -> str:
+    return f"{USER_INDEX_PREFIX}{user_id}"
+
+
+class IndexedRedisSessionInterface(RedisSessionInterface):
+    """
+    Redis session storage that also maintains a per-user index of session keys.
+
+    Every logged-in session is recorded in a sorted set user_sessions:<user_id>,
+    scored by the session's expiry timestamp. Entries past their expiry are pruned
+    whenever the set is written or read, and the set itself expires together with
+    the user's newest session, so looking up or clearing a user's sessions costs
+    O(sessions of that user) instead of a SCAN over every session in Redis.
+    """
+
+    def __init__(self, app, client, **kwargs):
+        # RedisSessionInterface only accepts a redis.Redis instance; the app passes a
+        # per-process proxy (clients.ProcessLocal) so workers don't share the master's pool.
+        self.client = client
+        ServerSideSessionInterface.__init__(self, app, **kwargs)
+
+    def _upsert_session(self, session_lifetime, session, store_id: str) -> None:
+        user_id = session.get("user_id")
+        if not user_id:
+            super()._upsert_session(session_lifetime, session, store_id)
+            return
+
+        ttl = int(session_lifetime.total_seconds())
+        now = time.time()
+        index_key = user_index_key(user_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(name=store_id, value=self.serializer.encode(session), ex=ttl)
+        pipe.zadd(index_key, {store_id: now + ttl})
+        pipe.zremrangebyscore(index_key, "-inf", now)
+        pipe.expire(index_key, ttl)
+        pipe.execute()
+
+    def _delete_session(self, store_id: str) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(store_id)
+        pipe.delete(store_id)
+        serialized_session_data, _ = pipe.execute()
+        if not serialized_session_data:
+            return
+        try:
+            user_id = self.serializer.decode(serialized_session_data).get("user_id")
+        except Exception:
+            return
+        if user_id:
+            self.client.zrem(user_index_key(user_id), store_id)
+
+
+class IndexedSession(Session):
+    """Flask-Session extension that installs IndexedRedisSessionInterface for SESSION_TYPE='redis'."""
+
+    def _get_interface(self, app):
+        config = app.config
+        if config.get("SESSION_TYPE", Defaults.SESSION_TYPE).lower() != "redis":
+            return super()._get_interface(app)
+
+        return IndexedRedisSessionInterface(
+            app=app,
+            client=config.get("SESSION_REDIS", Defaults.SESSION_REDIS),
+            key_prefix=config.get("SESSION_KEY_PREFIX", Defaults.SESSION_KEY_PREFIX),
+            use_signer=config.get("SESSION_USE_SIGNER", Defaults.SESSION_USE_SIGNER),
+            permanent=config.get("SESSION_PERMANENT", Defaults.SESSION_PERMANENT),
+            sid_length=config.get("SESSION_ID_LENGTH", Defaults.SESSION_ID_LENGTH),
+            serialization_format=config.get(
+                "SESSION_SERIALIZATION_FORMAT", Defaults.SESSION_SERIALIZATION_FORMAT
+            ),
+        )
+
+
+def _as_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def get_user_sessions(client, user_id: str) -> List[str]:
+    """Return the live session keys for a user, newest first."""
+    index_key = user_index_key(user_id)
+    pipe = client.pipeline(transaction=False)
+    pipe.zremrangebyscore(index_key, "-inf", time.time())
+    pipe.zrevrange(index_key, 0, -1)
+    _, members = pipe.execute()
+    return [_as_str(m) for m in members]
+
+
+def get_latest_user_session(client, user_id: str) -> Optional[str]:
+    sessions = get_user_sessions(client, user_id)
+    return sessions[0] if sessions else None
+
+
+def delete_user_sessions(client, user_id: str) -> int:
+    """Delete every session belonging to a user, plus the index itself, in one pipeline."""
+    store_ids = get_user_sessions(client, user_id)
+    pipe = client.pipeline(transaction=False)
+    for store_id in store_ids:
+        pipe.delete(store_id)
+    pipe.delete(user_index_key(user_id))
+    pipe.execute()
+    return len(store_ids)
+
+
+def backfill_session_index(client, serializer, key_prefix: str = Defaults.SESSION_KEY_PREFIX, batch_size: int = 500) -> int:
+    """
+    One-time backfill: walk every existing session key (all SCAN pages) and add
+    the logged-in ones to their user's index. Safe to run more than once.
+    Returns the number of sessions indexed.
+    """
+    indexed = 0
+    batch = []
+
+    def flush(keys):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        results = pipe.execute()
+
+        now = time.time()
+        write = client.pipeline(transaction=False)
+        touched = set()
+        count = 0
+        for key, data, ttl in zip(keys, results[0::2], results[1::2]):
+            if not data or ttl is None or ttl < 0:
+                continue
+            try:
+                user_id = serializer.decode(data).get("user_id")
+            except Exception:
+                logger.debug("Skipping undecodable session %s", key)
+                continue
+            if not user_id:
+                continue
+            index_key = user_index_key(user_id)
+            write.zadd(index_key, {_as_str(key): now + ttl})
+            touched.add(index_key)
+            count += 1
+        write.execute()
+
+        # Each index lives as long as the newest session it holds.
+        touched = list(touched)
+        pipe = client.pipeline(transaction=False)
+        for index_key in touched:
+            pipe.zrange(index_key, -1, -1, withscores=True)
+        newest = pipe.execute()
+        pipe = client.pipeline(transaction=False)
+        for index_key, members in zip(touched, newest):
+            if members:
+                pipe.expireat(index_key, int(members[0][1]) + 1)
+        pipe.execute()
+        return count
+
+    for key in client.scan_iter(match=f"{key_prefix}*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            indexed += flush(batch)
+            batch = []
+    if batch:
+        indexed += flush(batch)
+    return indexed
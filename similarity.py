@@ -0,0 +1,131 @@
+import os
+import logging
+from difflib import SequenceMatcher
+
+logger = logging.getLogger(__name__)
+
+# Backends in order of preference when FUZZY_BACKEND is "auto".
+BACKENDS = ("rapidfuzz", "levenshtein", "difflib")
+
+
+def _round(score: float) -> int:
+    # Same rounding as fuzzywuzzy.utils.intr so scores stay identical to fuzz.ratio.
+    return int(round(score))
+
+
+class Scorer:
+    """
+    String similarity on a 0-100 integer scale, compatible with fuzzywuzzy's fuzz.ratio.
+
+    ratio() and token_set_ratio() take an optional score_cutoff: when the (rounded)
+    score would be below it, 0 is returned, which lets backends bail out early.
+    Subclasses implement _ratio() returning an unrounded 0-100 float (or 0.0 once they
+    know the score is below `cutoff`).
+    """
+
+    name = "base"
+
+    def _ratio(self, s1: str, s2: str, cutoff: float) -> float:
+        raise NotImplementedError
+
+    def ratio(self, s1: str, s2: str, score_cutoff: int = 0) -> int:
+        if s1 is None or s2 is None:
+            return 0
+        if s1 == s2:
+            return 100
+        if not s1 or not s2:
+            return 0
+        # A raw score of cutoff - 0.5 still rounds up to the cutoff.
+        score = _round(self._ratio(s1, s2, max(0.0, score_cutoff - 0.5)))
+        return score if score >= score_cutoff else 0
+
+    def token_set_ratio(self, s1: str, s2: str, score_cutoff: int = 0) -> int:
+        """
+        Order-insensitive score for space-separated tokens, e.g. "xavier" vs
+        "xavier musketeers" scores 100. Inputs are expected to be normalized already.
+        """
+        if s1 is None or s2 is None:
+            return 0
+        tokens1 = set(s1.split())
+        tokens2 = set(s2.split())
+        if not tokens1 or not tokens2:
+            return 0
+
+        sorted_sect = " ".join(sorted(tokens1 & tokens2))
+        combined_1to2 = (sorted_sect + " " + " ".join(sorted(tokens1 - tokens2))).strip()
+        combined_2to1 = (sorted_sect + " " + " ".join(sorted(tokens2 - tokens1))).strip()
+
+        best = 0
+        for a, b in ((sorted_sect, combined_1to2), (sorted_sect, combined_2to1), (combined_1to2, combined_2to1)):
+            best = max(best, self.ratio(a, b, score_cutoff=max(score_cutoff, best)))
+            if best == 100:
+                break
+        return best if best >= score_cutoff else 0
+
+
+class DifflibScorer(Scorer):
+    """Pure-Python fallback: the same SequenceMatcher fuzzywuzzy uses without python-Levenshtein."""
+
+    name = "difflib"
+
+    def _ratio(self, s1: str, s2: str, cutoff: float) -> float:
+        matcher = SequenceMatcher(None, s1, s2)
+        # Cheap upper bounds first; skip the full comparison when they already miss the cutoff.
+        if cutoff and 100 * matcher.real_quick_ratio() < cutoff:
+            return 0.0
+        if cutoff and 100 * matcher.quick_ratio() < cutoff:
+            return 0.0
+        return 100 * matcher.ratio()
+
+
+class LevenshteinScorer(Scorer):
+    """C edit-distance backend from the python-Levenshtein package."""
+
+    name = "levenshtein"
+
+    def __init__(self):
+        import Levenshtein
+        self._lev_ratio = Levenshtein.ratio
+
+    def _ratio(self, s1: str, s2: str, cutoff: float) -> float:
+        return 100 * self._lev_ratio(s1, s2, score_cutoff=cutoff / 100)
+
+
+class RapidFuzzScorer(Scorer):
+    """C++ edit-distance backend from rapidfuzz, with native score_cutoff early exit."""
+
+    name = "rapidfuzz"
+
+    def __init__(self):
+        from rapidfuzz import fuzz
+        self._rf_ratio = fuzz.ratio
+
+    def _ratio(self, s1: str, s2: str, cutoff: float) -> float:
+        return self._rf_ratio(s1, s2, score_cutoff=cutoff)
+
+
+_SCORER_CLASSES = {
+    "rapidfuzz": RapidFuzzScorer,
+    "levenshtein": LevenshteinScorer,
+    "difflib": DifflibScorer,
+}
+
+
+def get_scorer(backend: str = None) -> Scorer:
+    """
+    Build a scorer for the requested backend ("rapidfuzz", "levenshtein", "difflib"
+    or "auto"). Defaults to the FUZZY_BACKEND environment variable, then "auto",
+    which picks the fastest backend that is installed.
+    """
+    backend = (backend or os.getenv("FUZZY_BACKEND", "auto")).lower()
+    if backend != "auto":
+        if backend not in _SCORER_CLASSES:
+            raise ValueError(f"Unknown similarity backend: {backend}")
+        return _SCORER_CLASSES[backend]()
+
+    for name in BACKENDS:
+        try:
+            return _SCORER_CLASSES[name]()
+        except ImportError:
+            continue
+    return DifflibScorer()
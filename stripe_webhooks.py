@@ -0,0 +1,114 @@
+"""
+Stripe webhook ingestion.
+
+Stripe posts every event to /webhooks/stripe. The signature is checked against
+STRIPE_WEBHOOK_SECRET, the event is recorded in the stripe_events collection
+under its event id (so Stripe's retries and duplicate deliveries are applied
+once), and payment_intent.* events copy the PaymentIntent's status onto the
+pending ticket whose transaction_id it is. Events can arrive out of order, so a ticket
+only takes a status from an event at least as new as the last one applied.
+
+sign_payload() builds a valid Stripe-Signature header; tools/send_stripe_webhook.py
+uses it to deliver fake events to a local backend.
+"""
+import hmac
+import json
+import time
+import logging
+from datetime import datetime
+from hashlib import sha256
+from typing import Any, Dict, Optional
+
+import stripe
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_INTENT_EVENTS = {
+    "payment_intent.succeeded",
+    "payment_intent.processing",
+    "payment_intent.payment_failed",
+    "payment_intent.requires_action",
+    "payment_intent.canceled",
+}
+
+
+class WebhookError(ValueError):
+    """The request was not a validly signed Stripe event."""
+
+
+def verify_event(payload: str, signature: Optional[str], secret: str, tolerance: int = 300) -> Dict[str, Any]:
+    """
+    Check the Stripe-Signature header and return the event as a dict.
+    :param payload: The raw request body, exactly as received
+    :param tolerance: Seconds a signature timestamp may lag behind now (replay protection)
+    """
+    if not signature:
+        raise WebhookError("Missing Stripe-Signature header")
+    try:
+        stripe.WebhookSignature.verify_header(payload, signature, secret, tolerance)
+    except stripe.SignatureVerificationError as e:
+        raise WebhookError(str(e))
+    try:
+        return json.loads(payload)
+    except ValueError:
+        raise WebhookError("Invalid JSON payload")
+
+
+def sign_payload(payload: str, secret: str, timestamp: Optional[int] = None) -> str:
+    """Stripe-Signature header value for payload, as Stripe would send it."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode("utf-8"), f"{timestamp}.{payload}".encode("utf-8"), sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def record_event(events_collection, event: Dict[str, Any]) -> bool:
+    """Store the event under its id. Returns False if it was already recorded."""
+    obj = event.get("data", {}).get("object", {})
+    try:
+        events_collection.insert_one({
+            "_id": event["id"],
+            "type": event.get("type"),
+            "created": event.get("created"),
+            "object_id": obj.get("id"),
+            "received_at": datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def forget_event(events_collection, event_id: str):
+    """Drop a recorded event whose processing failed, so Stripe's retry is applied."""
+    events_collection.delete_one({"_id": event_id})
+
+
+def apply_payment_intent_event(tickets_collection, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Copy a payment_intent.* event's status (and the buyer_id from its metadata) onto its
+    pending ticket. Returns the updated ticket (_id, status, buyer_id, payment_status,
+    payment_buyer_id, transfer.transferId), or None when no pending ticket uses this
+    PaymentIntent or a newer event has already been applied.
+    """
+    intent = event["data"]["object"]
+    created = event.get("created", 0)
+    return tickets_collection.find_one_and_update(
+        {
+            "transaction_id": intent["id"],
+            # A released ticket drops its PaymentIntent; never let a late event reach a later buyer
+            "status": "pending",
+            "$or": [
+                {"payment_event_created": {"$exists": False}},
+                {"payment_event_created": {"$lte": created}},
+            ],
+        },
+        {"$set": {
+            "payment_status": intent.get("status"),
+            "payment_event_created": created,
+            "payment_buyer_id": (intent.get("metadata") or {}).get("buyer_id"),
+            "payment_updated_at": datetime.utcnow(),
+        }},
+        projection={"status": 1, "buyer_id": 1, "payment_status": 1, "payment_buyer_id": 1, "transfer.transferId": 1},
+        return_document=ReturnDocument.AFTER,
+    )
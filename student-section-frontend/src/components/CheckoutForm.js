@@ -3,6 +3,26 @@ import { useStripe, useElements, CardElement } from '@stripe/react-stripe-js';
 import { useLocation, useNavigate } from 'react-router-dom';
 import { useParams } from 'react-router-dom';
 
+// Transfers are finished by a background job on the backend; poll it until it's done
+const waitForJob = async (statusUrl, { interval = 1000, timeout = 60000 } = {}) => {
+  const deadline = Date.now() + timeout;
+  while (Date.now() < deadline) {
+    const res = await fetch(`http://localhost:5000${statusUrl}`, { credentials: 'include' });
+    const job = await res.json();
+    if (!res.ok) {
+      throw new Error(job.error || 'Unable to check purchase status.');
+    }
+    if (job.status === 'succeeded') {
+      return job.result;
+    }
+    if (job.status === 'failed' || job.status === 'dead') {
+      throw new Error(job.error || 'Purchase was paid but could not be finalized.');
+    }
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+  throw new Error('Purchase is still being finalized. Check My Tickets shortly.');
+};
+
 const CheckoutForm = () => {
   const stripe = useStripe();
   const elements = useElements();
@@ -98,9 +118,10 @@ const CheckoutForm = () => {
             setErrorMessage(backendError);
             return;
           }
-          setSuccessMessage('Payment successful! 🎉 Ticket transfer completed.');
           purchaseFinalized.current = true;  // mark as finalized to prevent cancellation
           clearInterval(timerId.current);
+          await waitForJob(confirmData.status_url);
+          setSuccessMessage('Payment successful! 🎉 Ticket transfer completed.');
           // Redirect to the homepage after a brief delay
           setTimeout(() => {
             navigate('/');
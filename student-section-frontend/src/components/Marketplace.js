@@ -5,13 +5,23 @@ import { useNavigate } from 'react-router-dom';
 function Marketplace() {
   const [listings, setListings] = useState([]);
   const [message, setMessage] = useState('');
+  // Cursor for the next page of listings; null once the last page is loaded
+  const [nextCursor, setNextCursor] = useState(null);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    // Fetch available tickets from backend
-    axios.get('http://localhost:5000/tickets')
-      .then(res => setListings(res.data.tickets))
+  // Fetch a page of available tickets from backend; a cursor appends the page after it
+  const fetchListings = (cursor = null) => {
+    const params = cursor ? { cursor } : {};
+    axios.get('http://localhost:5000/tickets', { params })
+      .then(res => {
+        setListings(prev => (cursor ? [...prev, ...res.data.tickets] : res.data.tickets));
+        setNextCursor(res.data.next);
+      })
       .catch(err => console.error(err));
+  };
+
+  useEffect(() => {
+    fetchListings();
   }, []);
 
   const handlePurchase = async (ticketId, sellerId) => {
@@ -66,6 +76,11 @@ function Marketplace() {
           </tbody>
         </table>
       )}
+      {nextCursor && (
+        <button onClick={() => fetchListings(nextCursor)}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
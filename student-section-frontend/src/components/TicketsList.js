@@ -4,6 +4,8 @@ import axios from 'axios';
 function TicketsList({ location }) {
   const [tickets, setTickets] = useState([]);
   const [message, setMessage] = useState('');
+  // Cursor for the next page of listings; null once the last page is loaded
+  const [nextCursor, setNextCursor] = useState(null);
 
   // Check if event filtering info was passed via navigation state
   const eventFilter = location?.state || {};
@@ -12,15 +14,16 @@ function TicketsList({ location }) {
     fetchTickets();
   }, []);
 
-  const fetchTickets = () => {
-    axios.get('http://localhost:5000/tickets', { withCredentials: true })
+  const fetchTickets = (cursor = null) => {
+    // Filter by event on the server when an event filter is provided
+    const params = eventFilter.event_name ? { event: eventFilter.event_name } : {};
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    axios.get('http://localhost:5000/tickets', { params, withCredentials: true })
       .then(res => {
-        let fetched = res.data.tickets;
-        // Filter tickets if event_filter is provided (by event_name and/or event_date)
-        if (eventFilter.event_name) {
-          fetched = fetched.filter(ticket => ticket.event_name === eventFilter.event_name);
-        }
-        setTickets(fetched);
+        setTickets(prev => (cursor ? [...prev, ...res.data.tickets] : res.data.tickets));
+        setNextCursor(res.data.next);
       })
       .catch(err => console.error(err));
   };
@@ -71,6 +74,11 @@ function TicketsList({ location }) {
           </tbody>
         </table>
       )}
+      {nextCursor && (
+        <button onClick={() => fetchTickets(nextCursor)} className="btn btn-secondary">
+          Load more
+        </button>
+      )}
     </div>
   );
 }
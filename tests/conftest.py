@@ -0,0 +1,46 @@
+"""
+Shared fixtures. The app is imported with nothing listening on its MongoDB and Redis
+ports (every client a test uses is swapped for mongomock or fakeredis), and with
+background workers and the process pool for password hashing turned off.
+"""
+import os
+import sys
+
+import fakeredis
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update(
+    MONGO_URI="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200",
+    REDIS_URL="redis://127.0.0.1:1",
+    MONGO_ENSURE_INDEXES="false",
+    TICKET_HOLD_SWEEPER="false",
+    LISTING_VIEW="false",
+    JOB_WORKERS="0",
+    PASSWORD_HASH_WORKERS="0",
+    BCRYPT_ROUNDS="4",
+)
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """The app module, with its users collection, log shipper and login throttle on fakes."""
+    import app as app_module
+    from clients import ProcessLocal
+
+    mongo = ProcessLocal(mongomock.MongoClient)
+    ssdb = mongo.child("student_section")
+    monkeypatch.setattr(app_module, "users_collection", ssdb.child("users"))
+    monkeypatch.setattr(app_module.log_shipper, "collection", ssdb.child("apilogs"))
+    monkeypatch.setattr(app_module.login_throttle, "redis", ProcessLocal(lambda: fakeredis.FakeRedis(decode_responses=True)))
+    return app_module
+
+
+@pytest.fixture
+def app(app_module):
+    """A new app from create_app(), with its session store on fakeredis."""
+    from clients import ProcessLocal
+
+    return app_module.create_app({"TESTING": True, "SESSION_REDIS": ProcessLocal(fakeredis.FakeRedis)})
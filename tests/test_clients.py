@@ -0,0 +1,43 @@
+"""
+ProcessLocal must forward every client attribute, including Redis GET, which
+Flask-Session uses to load the session on each request.
+
+Runs without MongoDB or Redis (mongomock and fakeredis stand in for them):
+    python -m pytest tests
+"""
+import fakeredis
+import mongomock
+
+from clients import ProcessLocal
+
+
+def test_forwards_redis_get():
+    redis_client = ProcessLocal(lambda: fakeredis.FakeRedis(decode_responses=True))
+    redis_client.set("key", "value")
+    assert redis_client.get("key") == "value"
+
+
+def test_forwards_collection_methods():
+    users = ProcessLocal(mongomock.MongoClient).child("student_section").child("users")
+    users.insert_one({"email": "a@example.edu"})
+    assert users.find_one({"email": "a@example.edu"})["email"] == "a@example.edu"
+
+
+def test_login_round_trip_through_proxied_session_store(app):
+    client = app.test_client()
+    credentials = {"email": "fan@example.edu", "password": "go-team"}
+
+    assert client.post("/users/register", json=credentials).status_code == 201
+    assert client.post("/users/login", json=credentials).status_code == 200
+
+    # The session cookie is now loaded with a Redis GET through the proxy
+    response = client.get("/users/me")
+    assert response.status_code == 200
+    assert response.get_json()["email"] == credentials["email"]
+
+
+def test_create_app_builds_a_new_app_each_call(app_module):
+    first, second = app_module.create_app(), app_module.create_app({"TESTING": True})
+    assert first is not second
+    assert not first.testing and second.testing
+    assert "api.list_tickets" in first.view_functions and "api.list_tickets" in second.view_functions
@@ -0,0 +1,88 @@
+"""
+Expired holds: unpaid ones are released, paid ones are finished, and nothing can
+confirm or extend a hold while its Paciolan transfer is being cancelled.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+import fakeredis
+import mongomock
+import pytest
+from bson import ObjectId
+
+from holds import TicketHolds
+from ticket_state import TicketStateError, extend_hold, hold_ticket, record_payment, record_transfer
+
+
+@pytest.fixture
+def tickets():
+    return mongomock.MongoClient().db.tickets
+
+
+def _expired_hold(tickets, payment_status=None):
+    ticket_id = tickets.insert_one({"status": "available", "seller_id": ObjectId()}).inserted_id
+    buyer_id = str(ObjectId())
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    hold_ticket(tickets, ticket_id, buyer_id, expired)
+    record_transfer(tickets, ticket_id, buyer_id, "T1", "url", "CC1")
+    if payment_status:
+        record_payment(tickets, ticket_id, buyer_id, "pi_1", payment_status, expired)
+    return ticket_id, buyer_id
+
+
+def _holds(tickets, **kwargs):
+    kwargs.setdefault("cancel_transfer", lambda code: True)
+    return TicketHolds(fakeredis.FakeRedis(decode_responses=True), tickets, sweeper=False, **kwargs)
+
+
+def test_unpaid_hold_is_released(tickets):
+    ticket_id, _ = _expired_hold(tickets, "requires_payment_method")
+    canceled = []
+    holds = _holds(tickets, cancel_transfer=lambda code: canceled.append(code) or True,
+                   payment_status=lambda ticket: "canceled")
+
+    holds._release(str(ticket_id), datetime.utcnow())
+
+    ticket = tickets.find_one({"_id": ticket_id})
+    assert canceled == ["CC1"]
+    assert ticket["status"] == "available"
+    assert "buyer_id" not in ticket and "transaction_id" not in ticket
+
+
+@pytest.mark.parametrize("status", ["succeeded", "processing"])
+def test_paid_hold_is_finished_not_released(tickets, status):
+    ticket_id, buyer_id = _expired_hold(tickets, "requires_payment_method")
+    paid = []
+    holds = _holds(tickets, payment_status=lambda ticket: status,
+                   on_paid=lambda ticket_id, buyer_id: paid.append((ticket_id, buyer_id)))
+
+    holds._release(str(ticket_id), datetime.utcnow())
+
+    assert paid == [(str(ticket_id), buyer_id)]
+    assert tickets.find_one({"_id": ticket_id})["status"] == "pending"
+
+
+def test_stored_paid_status_blocks_release(tickets):
+    ticket_id, _ = _expired_hold(tickets, "succeeded")
+    holds = _holds(tickets)
+
+    holds._release(str(ticket_id), datetime.utcnow())
+
+    assert tickets.find_one({"_id": ticket_id})["status"] == "pending"
+
+
+def test_hold_cannot_be_extended_while_releasing(tickets):
+    ticket_id, buyer_id = _expired_hold(tickets)
+    cancel_results = [False, True]
+    holds = _holds(tickets, cancel_transfer=lambda code: cancel_results.pop(0))
+
+    # Paciolan fails: the ticket stays releasing, and a late extend can't revive it
+    holds._release(str(ticket_id), datetime.utcnow())
+    assert tickets.find_one({"_id": ticket_id})["status"] == "releasing"
+    with pytest.raises(TicketStateError):
+        extend_hold(tickets, ticket_id, buyer_id, datetime.utcnow() + timedelta(minutes=15))
+
+    # The retry finishes the release
+    holds._release(str(ticket_id), datetime.utcnow())
+    assert tickets.find_one({"_id": ticket_id})["status"] == "available"
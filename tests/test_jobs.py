@@ -0,0 +1,61 @@
+"""
+A job waiting on something outside the queue (JobDeferred) must not run out of
+attempts, and wake() must run it as soon as that something arrives.
+
+    python -m pytest tests
+"""
+import fakeredis
+
+from jobs import JobDeferred, JobQueue
+
+
+def _queue(**kwargs):
+    return JobQueue(fakeredis.FakeRedis(decode_responses=True), workers=0, poll_timeout=1, **kwargs)
+
+
+def test_deferred_job_keeps_its_attempts():
+    queue = _queue(max_attempts=2, defer_delay=0)
+    paid = []
+
+    @queue.handler("transfer.accept")
+    def accept(payload):
+        if not paid:
+            raise JobDeferred("Payment has not been completed yet")
+        return {"confirmationCode": "C1"}
+
+    job_id, _ = queue.enqueue("transfer.accept", "t1", {})
+    for _ in range(5):
+        queue.work_once()
+        queue.maintain()
+    assert queue.get(job_id)["status"] == "retrying"
+    assert queue.get(job_id)["attempts"] == 0
+
+    paid.append(True)
+    queue.work_once()
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded" and job["result"] == {"confirmationCode": "C1"}
+    assert queue.stats()["deferred"] == 5
+
+
+def test_wake_runs_a_waiting_job_now():
+    queue = _queue(defer_delay=3600)
+    runs = []
+
+    @queue.handler("transfer.accept")
+    def accept(payload):
+        runs.append(1)
+        if len(runs) == 1:
+            raise JobDeferred("Payment has not been completed yet")
+        return {}
+
+    job_id, _ = queue.enqueue("transfer.accept", "t1", {})
+    queue.work_once()
+    queue.maintain()
+    assert not queue.work_once()
+
+    # The webhook arrives: enqueueing again finds the waiting job, and waking it makes it due
+    assert queue.enqueue("transfer.accept", "t1", {}) == (job_id, False)
+    assert queue.wake(job_id)
+    queue.maintain()
+    assert queue.work_once()
+    assert queue.get(job_id)["status"] == "succeeded"
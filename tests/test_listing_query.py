@@ -0,0 +1,42 @@
+"""
+GET /tickets pages through listings in (event_date, _id) order, and tickets
+without an event_date must not break the cursor.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+
+from listing_query import (
+    LISTING_SORT, build_listing_query, encode_cursor, parse_listing_args, serialize_listing
+)
+
+
+def _page(tickets, args):
+    params = parse_listing_args(args)
+    docs = list(tickets.find(build_listing_query(params)).sort(LISTING_SORT).limit(params["limit"]))
+    return [serialize_listing(doc) for doc in docs]
+
+
+def test_pages_skip_tickets_without_event_date():
+    tickets = mongomock.MongoClient().db.tickets
+    start = datetime(2026, 9, 1)
+    dated = [
+        tickets.insert_one({"status": "available", "seller_id": ObjectId(), "event_date": start + timedelta(days=i)}).inserted_id
+        for i in range(5)
+    ]
+    tickets.insert_one({"status": "available", "seller_id": ObjectId()})
+    tickets.insert_one({"status": "available", "seller_id": ObjectId(), "event_date": None})
+
+    seen, args = [], {"limit": "2"}
+    while True:
+        page = _page(tickets, args)
+        seen.extend(listing.ticket_id for listing in page)
+        if len(page) < 2:
+            break
+        last = page[-1]
+        args = {"limit": "2", "cursor": encode_cursor(last.event_date, last.ticket_id)}
+
+    assert seen == dated
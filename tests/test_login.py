@@ -0,0 +1,36 @@
+"""
+POST /users/login validates its body before any throttling or bcrypt work.
+
+    python -m pytest tests
+"""
+import pytest
+
+
+@pytest.mark.parametrize("body", [
+    {"email": 1, "password": "x"},
+    {"email": "fan@example.edu", "password": ["x"]},
+    {"email": "", "password": "x"},
+    {"email": "fan@example.edu"},
+    [],
+])
+def test_malformed_credentials_are_rejected(app, body):
+    response = app.test_client().post("/users/login", json=body)
+    assert response.status_code == 400
+
+
+def test_missing_body_is_rejected(app):
+    response = app.test_client().post("/users/login")
+    assert response.status_code == 400
+
+
+def test_failed_logins_are_throttled_per_account(app, app_module, monkeypatch):
+    monkeypatch.setattr(app_module.login_throttle, "max_account_failures", 2)
+    client = app.test_client()
+    credentials = {"email": "fan@example.edu", "password": "go-team"}
+    assert client.post("/users/register", json=credentials).status_code == 201
+
+    wrong = dict(credentials, password="wrong")
+    assert [client.post("/users/login", json=wrong).status_code for _ in range(3)] == [401, 401, 429]
+    response = client.post("/users/login", json=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
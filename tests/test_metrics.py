@@ -0,0 +1,26 @@
+"""
+Component counts are exported as Prometheus counters, and their levels as gauges.
+
+    python -m pytest tests
+"""
+
+
+def _metric_types(text):
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE "))
+
+
+def test_component_counts_are_counters(app):
+    types = _metric_types(app.test_client().get("/metrics").get_data(as_text=True))
+
+    for name in ("ticket_holds_events", "job_queue_events", "password_hash_events", "outbound_calls"):
+        assert types[f"{name}_total"] == "counter"
+    assert types["ticket_holds_events"] == "gauge"
+    assert types["outbound_circuit_state"] == "gauge"
+    assert "outbound_calls" not in types
+
+
+def test_counter_and_gauge_split_one_stats_dict(app):
+    text = app.test_client().get("/metrics").get_data(as_text=True)
+    assert 'password_hash_events_total{stat="hashed"}' in text
+    assert 'password_hash_events{stat="pending"}' in text
+    assert 'password_hash_events{stat="hashed"}' not in text
@@ -0,0 +1,40 @@
+"""
+Read models must load documents written before request bodies were validated.
+
+    python -m pytest tests
+"""
+from bson import ObjectId
+
+from models import NewUser, Schedule, Ticket, UserProfile, decode_body, encode, from_doc, from_docs, projection
+
+
+def test_ticket_price_as_sent_by_the_old_sell_form():
+    seller = ObjectId()
+    docs = [
+        {"_id": ObjectId(), "seller_id": seller, "price": "12.50"},
+        {"_id": ObjectId(), "seller_id": seller, "price": 12.5},
+    ]
+    tickets = from_docs(docs, Ticket)
+    assert [ticket.price for ticket in tickets] == ["12.50", 12.5]
+
+
+def test_profile_with_numeric_phone():
+    profile = from_doc({"_id": ObjectId(), "email": "fan@example.edu", "phone": 5135551234, "password": "x"}, UserProfile)
+    assert profile.phone == 5135551234
+    assert b"password" not in encode(profile)
+
+
+def test_lax_conversion_of_string_values():
+    ticket = from_doc({"_id": ObjectId(), "seller_id": ObjectId(), "is_transferrable": "true"}, Ticket)
+    assert ticket.is_transferrable is True
+
+
+def test_register_with_numeric_phone():
+    user = decode_body(b'{"email": "fan@example.edu", "password": "x", "phone": 5135551234}', NewUser)
+    assert user.phone == 5135551234
+
+
+def test_projection_reads_only_declared_fields():
+    assert projection(UserProfile)["_id"] == 1
+    assert "password" not in projection(UserProfile)
+    assert "source" not in projection(Schedule)
@@ -0,0 +1,52 @@
+"""
+An invalidation in one worker must reach the in-process copies held by the others.
+
+    python -m pytest tests
+"""
+import time
+
+import fakeredis
+
+from orders_cache import OrdersCache
+
+
+def _workers(count):
+    """OrdersCaches sharing one Redis, as separate worker processes would, and the fetch log."""
+    server = fakeredis.FakeServer()
+    fetched = []
+
+    def fetch(paciolan_id, season_code):
+        fetched.append((paciolan_id, season_code))
+        return {"orders": len(fetched)}
+
+    caches = [
+        OrdersCache(fakeredis.FakeRedis(server=server, decode_responses=True), fetch, derive=lambda orders: orders["orders"])
+        for _ in range(count)
+    ]
+    return caches, fetched
+
+
+def test_invalidation_reaches_other_workers():
+    (a, b), fetched = _workers(2)
+    assert a.get("P1", "F25") == {"orders": 1}
+    assert b.get_derived("P1", "F25") == 1
+    assert b.get("P1", "F25") == {"orders": 1}
+    assert len(fetched) == 1
+
+    a.invalidate("P1")
+
+    assert b.get_derived("P1", "F25") == 2
+    assert a.get("P1", "F25") == {"orders": 2}
+    assert len(fetched) == 2
+
+
+def test_fetch_racing_an_invalidation_is_not_shared():
+    (a, b), fetched = _workers(2)
+    # a's fetch started before the invalidation and finished after it
+    entry = [0, {"orders": "old"}, None, a._generation("P1")]
+    a.invalidate("P1")
+    entry[0] = time.time()
+    a._redis_set("P1", "F25", entry)
+
+    assert b.get("P1", "F25") == {"orders": 1}
+    assert fetched == [("P1", "F25")]
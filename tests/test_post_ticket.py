@@ -0,0 +1,33 @@
+"""
+POST /tickets answers with an error status, not a 500, when Paciolan can't return
+the seller's orders.
+
+    python -m pytest tests
+"""
+import pytest
+
+from fuzzy_match import OrdersFetchError
+
+
+@pytest.mark.parametrize("status_code, expected", [(404, 404), (500, 502)])
+def test_orders_fetch_error(app, app_module, monkeypatch, status_code, expected):
+    def fail(paciolan_id, season_code):
+        raise OrdersFetchError(status_code)
+
+    monkeypatch.setattr(app_module, "tickets_collection", app_module.users_collection.database.tickets)
+    monkeypatch.setattr(app_module.orders_cache, "redis", None)
+    monkeypatch.setattr(app_module.orders_cache, "fetch", fail)
+    user_id = app_module.users_collection.insert_one(
+        {"email": "seller@example.edu", "third_party_account": {"paciolan_id": "P1"}}
+    ).inserted_id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = str(user_id)
+    response = client.post("/tickets", json={
+        "event_name": "Football vs Xavier", "event_date": "2026-09-05T19:00:00", "venue": "Nippert Stadium",
+        "price": 40, "school_name": "University of Cincinnati",
+    })
+
+    assert response.status_code == expected
+    assert "error" in response.get_json()
@@ -0,0 +1,54 @@
+"""
+Every hot query in schema.py is served by one of the declared indexes.
+
+explain() needs a real MongoDB (mongomock has no query planner). The tests run
+against TEST_MONGO_URI, in a throwaway database that is dropped afterwards, and
+are skipped when no server answers there:
+    TEST_MONGO_URI=mongodb://127.0.0.1:27017 python -m pytest tests
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from schema import IndexVerificationError, ensure_indexes, verify_hot_queries
+
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://127.0.0.1:27017")
+
+
+@pytest.fixture
+def db():
+    client = MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {TEST_MONGO_URI}")
+    name = f"student_section_test_{uuid.uuid4().hex[:8]}"
+    database = client[name]
+    # Enough documents that the planner has a real choice to make
+    start = datetime(2026, 9, 1)
+    database.tickets.insert_many([
+        {"status": "available", "seller_id": ObjectId(), "event_name": f"game {i}", "event_date": start + timedelta(days=i)}
+        for i in range(50)
+    ])
+    database.users.insert_one({"email": "fan@example.edu"})
+    database.schedules.insert_one({"school_name": "public", "event_type": "football"})
+    yield database
+    client.drop_database(name)
+    client.close()
+
+
+def test_hot_queries_use_declared_indexes(db):
+    assert [error for _, error in ensure_indexes(db) if error] == []
+    plans = verify_hot_queries(db)
+    assert all("COLLSCAN" not in stages for stages in plans.values())
+
+
+def test_missing_index_is_reported(db):
+    with pytest.raises(IndexVerificationError):
+        verify_hot_queries(db)
@@ -0,0 +1,63 @@
+"""
+A released ticket must not carry its last buyer's payment into the next purchase.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from stripe_webhooks import apply_payment_intent_event
+from ticket_state import hold_ticket, record_payment, release_ticket
+
+
+def _succeeded(intent_id, buyer_id, created):
+    return {
+        "type": "payment_intent.succeeded",
+        "created": created,
+        "data": {"object": {"id": intent_id, "status": "succeeded", "metadata": {"buyer_id": buyer_id}}},
+    }
+
+
+@pytest.fixture
+def tickets():
+    return mongomock.MongoClient().db.tickets
+
+
+def test_release_clears_payment(tickets):
+    ticket_id = tickets.insert_one({"status": "available", "seller_id": ObjectId()}).inserted_id
+    buyer_a = str(ObjectId())
+    deadline = datetime.utcnow() + timedelta(minutes=15)
+
+    hold_ticket(tickets, ticket_id, buyer_a, deadline)
+    record_payment(tickets, ticket_id, buyer_a, "pi_a", "requires_payment_method", deadline)
+    apply_payment_intent_event(tickets, _succeeded("pi_a", buyer_a, 100))
+    release_ticket(tickets, ticket_id, buyer_a)
+
+    ticket = tickets.find_one({"_id": ticket_id})
+    for field in ("transaction_id", "payment_status", "payment_event_created", "payment_buyer_id"):
+        assert field not in ticket
+
+
+def test_late_event_does_not_reach_next_buyer(tickets):
+    ticket_id = tickets.insert_one({"status": "available", "seller_id": ObjectId()}).inserted_id
+    buyer_a, buyer_b = str(ObjectId()), str(ObjectId())
+    deadline = datetime.utcnow() + timedelta(minutes=15)
+
+    # A starts paying, then their hold is released and B holds the ticket
+    hold_ticket(tickets, ticket_id, buyer_a, deadline)
+    record_payment(tickets, ticket_id, buyer_a, "pi_a", "requires_payment_method", deadline)
+    release_ticket(tickets, ticket_id, buyer_a)
+    hold_ticket(tickets, ticket_id, buyer_b, deadline)
+
+    # A pays with the old client_secret: nothing matches
+    assert apply_payment_intent_event(tickets, _succeeded("pi_a", buyer_a, 200)) is None
+    assert "payment_status" not in tickets.find_one({"_id": ticket_id})
+
+    # B's own payment is applied and attributed to B
+    record_payment(tickets, ticket_id, buyer_b, "pi_b", "requires_payment_method", deadline)
+    ticket = apply_payment_intent_event(tickets, _succeeded("pi_b", buyer_b, 300))
+    assert ticket["payment_status"] == "succeeded"
+    assert ticket["payment_buyer_id"] == buyer_b
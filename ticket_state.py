@@ -0,0 +1,207 @@
+"""
+Purchase state transitions for ticket listings.
+
+    available --hold_ticket--> pending --mark_sold--> sold
+                                  |
+                                  +--release_ticket--> available
+                                  |
+                                  +--begin_release--> releasing --finish_release--> available
+
+An expired hold goes through releasing: once the ticket is there, no confirm or
+extend can touch it, so its Paciolan transfer can be cancelled before it is
+made available again.
+
+Each transition is a single find_one_and_update whose filter carries every
+precondition (status, buyer, seller != buyer), so there is no window between
+checking a ticket and writing it, and the happy path costs one round trip.
+Only when the filter matches nothing is the ticket read again, to report why
+with the same status codes and messages the endpoints have always returned.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+# Payment states in which a hold must not be released: the buyer has paid, or is paying
+PAID_STATUSES = ("succeeded", "processing")
+
+# Reverts a pending ticket to available and clears the buyer, hold, payment and transfer fields,
+# so the next buyer's purchase can't inherit this buyer's PaymentIntent or its status.
+RELEASE_UPDATE = {
+    "$set": {"status": "available"},
+    "$unset": {
+        "buyer_id": "",
+        "hold_expires_at": "",
+        "transaction_id": "",
+        "payment_status": "",
+        "payment_event_created": "",
+        "payment_buyer_id": "",
+        "transfer.transferId": "",
+        "transfer.url": "",
+        "transfer.confirmationCd": ""
+    }
+}
+
+WRONG_BUYER = "Ticket is pending for a different user"
+
+
+class TicketStateError(Exception):
+    """A transition's preconditions did not hold; carries the HTTP status to respond with."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _object_id(ticket_id) -> ObjectId:
+    try:
+        return ObjectId(ticket_id)
+    except (InvalidId, TypeError):
+        raise TicketStateError("Ticket not found", 404)
+
+
+def _explain(collection, oid: ObjectId, status: str, buyer_id: Optional[ObjectId],
+             wrong_buyer: str, conflict: str) -> TicketStateError:
+    """Work out which precondition failed; only called after the guarded write matched nothing."""
+    ticket = collection.find_one({"_id": oid}, {"status": 1, "buyer_id": 1, "seller_id": 1})
+    if not ticket:
+        return TicketStateError("Ticket not found", 404)
+    if ticket.get("status") != status:
+        return TicketStateError(f"Ticket is not {status}", 400)
+    if status == "available":
+        if buyer_id is not None and ticket.get("seller_id") == buyer_id:
+            return TicketStateError("Cannot purchase your own ticket", 400)
+    elif buyer_id is not None and ticket.get("buyer_id") != buyer_id:
+        return TicketStateError(wrong_buyer, 403)
+    # Every precondition holds now, so the ticket changed between the write and this read.
+    return TicketStateError(conflict, 409)
+
+
+def _transition(collection, ticket_id, status: str, buyer_id, update: Dict[str, Any],
+                extra_filter: Optional[Dict[str, Any]] = None, wrong_buyer: str = WRONG_BUYER,
+                conflict: str = "Ticket may have been updated",
+                projection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    oid = _object_id(ticket_id)
+    buyer = ObjectId(buyer_id) if buyer_id is not None else None
+    query = {"_id": oid, "status": status}
+    if buyer is not None:
+        if status == "available":
+            query["seller_id"] = {"$ne": buyer}
+        else:
+            query["buyer_id"] = buyer
+    if extra_filter:
+        query.update(extra_filter)
+
+    ticket = collection.find_one_and_update(
+        query, update, projection=projection, return_document=ReturnDocument.AFTER
+    )
+    if ticket is None:
+        raise _explain(collection, oid, status, buyer, wrong_buyer, conflict)
+    return ticket
+
+
+def hold_ticket(collection, ticket_id, buyer_id, hold_expires_at: datetime) -> Dict[str, Any]:
+    """available -> pending for buyer_id, provided they aren't the seller. Returns the held ticket."""
+    return _transition(
+        collection, ticket_id, "available", buyer_id,
+        {"$set": {"status": "pending", "buyer_id": ObjectId(buyer_id), "hold_expires_at": hold_expires_at}},
+        conflict="Ticket purchase could not be initiated; ticket may have been updated"
+    )
+
+
+def record_transfer(collection, ticket_id, buyer_id, transfer_id: str, transfer_url: str,
+                    confirmation_code: str) -> Dict[str, Any]:
+    """Store the Paciolan transfer started for a pending purchase."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id,
+        {"$set": {
+            "transfer.transferId": transfer_id,
+            "transfer.url": transfer_url,
+            "transfer.confirmationCd": confirmation_code
+        }},
+        conflict="Ticket hold has expired",
+        projection={"_id": 1}
+    )
+
+
+def get_pending(collection, ticket_id, buyer_id, wrong_buyer: str = WRONG_BUYER) -> Dict[str, Any]:
+    """Read a ticket that must be pending for buyer_id, in one query on the happy path."""
+    oid = _object_id(ticket_id)
+    buyer = ObjectId(buyer_id)
+    ticket = collection.find_one({"_id": oid, "status": "pending", "buyer_id": buyer})
+    if ticket is None:
+        raise _explain(collection, oid, "pending", buyer, wrong_buyer, "Ticket may have been updated")
+    return ticket
+
+
+def record_payment(collection, ticket_id, buyer_id, intent_id: str, payment_status: str,
+                   hold_expires_at: datetime) -> Dict[str, Any]:
+    """Store the PaymentIntent for a pending purchase and restart its hold."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id,
+        {"$set": {
+            "transaction_id": intent_id,
+            "payment_status": payment_status,
+            "payment_timestamp": datetime.utcnow(),
+            "hold_expires_at": hold_expires_at
+        },
+         # Webhook ordering and the paying buyer restart with the new PaymentIntent
+         "$unset": {"payment_event_created": "", "payment_buyer_id": ""}},
+        conflict="Ticket hold has expired",
+        projection={"_id": 1}
+    )
+
+
+def release_ticket(collection, ticket_id, buyer_id,
+                   extra_filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """pending -> available, clearing the buyer and transfer fields."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id, RELEASE_UPDATE, extra_filter=extra_filter,
+        conflict="Ticket purchase cancellation could not be finalized; ticket may have been updated",
+        projection={"_id": 1}
+    )
+
+
+def begin_release(collection, ticket_id, buyer_id, now: datetime) -> Dict[str, Any]:
+    """pending -> releasing for a hold that expired by `now` and whose payment hasn't gone through."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id,
+        {"$set": {"status": "releasing"}},
+        extra_filter={"hold_expires_at": {"$lte": now}, "payment_status": {"$nin": list(PAID_STATUSES)}},
+        conflict="Ticket hold was extended, paid or converted",
+        projection={"_id": 1}
+    )
+
+
+def finish_release(collection, ticket_id, buyer_id) -> Dict[str, Any]:
+    """releasing -> available, once the hold's Paciolan transfer is cancelled."""
+    return _transition(
+        collection, ticket_id, "releasing", buyer_id, RELEASE_UPDATE,
+        conflict="Ticket release could not be finalized; ticket may have been updated",
+        projection={"_id": 1}
+    )
+
+
+def mark_sold(collection, ticket_id, buyer_id, confirmation_code: str) -> Dict[str, Any]:
+    """pending -> sold, recording the accepted transfer's confirmation code."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id,
+        {"$set": {"status": "sold", "transfer.confirmationCd": confirmation_code},
+         "$unset": {"hold_expires_at": ""}},
+        wrong_buyer="Ticket is not pending for this user",
+        conflict="Ticket purchase could not be finalized; ticket may have been updated",
+        projection={"_id": 1}
+    )
+
+
+def extend_hold(collection, ticket_id, buyer_id, hold_expires_at: datetime) -> Dict[str, Any]:
+    """Push a pending purchase's hold out to hold_expires_at."""
+    return _transition(
+        collection, ticket_id, "pending", buyer_id,
+        {"$set": {"hold_expires_at": hold_expires_at}},
+        conflict="Ticket hold has expired",
+        projection={"_id": 1}
+    )
@@ -0,0 +1,257 @@
+"""
+Minimal in-memory Stripe API for local load tests.
+
+    python tools/fake_stripe.py --port 12111
+    python tools/fake_stripe.py --webhook-url http://127.0.0.1:5000/webhooks/stripe --webhook-secret whsec_test
+
+Run the backend with STRIPE_API_BASE=http://127.0.0.1:12111 and any
+STRIPE_SECRET_KEY. Implements the PaymentIntent calls the backend and checkout
+make:
+    POST /v1/payment_intents                 create (status requires_payment_method)
+    GET  /v1/payment_intents/<id>            retrieve
+    POST /v1/payment_intents/<id>/confirm    what Stripe.js does when the buyer pays
+    POST /v1/payment_intents/<id>/cancel
+
+With --webhook-url and --webhook-secret, confirm and cancel also deliver a
+signed payment_intent.* event, after --webhook-delay seconds. --decline-rate
+makes that fraction of confirms fail like a declined card. --latency takes the
+same specs as paciolan_sim.py.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from paciolan_sim import parse_latency  # noqa: E402
+from send_stripe_webhook import build_event, send_event  # noqa: E402
+
+
+def _form_to_dict(body: bytes) -> Dict[str, Any]:
+    """Decode Stripe's form encoding, including one level of brackets (metadata[key]=value)."""
+    params: Dict[str, Any] = {}
+    for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items():
+        if "[" in key and key.endswith("]"):
+            outer, inner = key[:-1].split("[", 1)
+            params.setdefault(outer, {})[inner] = values[0]
+        else:
+            params[key] = values[0]
+    return params
+
+
+def _stripe_error(status: int, message: str, code: str = "resource_missing") -> Tuple[int, Dict[str, Any]]:
+    return status, {"error": {"type": "invalid_request_error", "code": code, "message": message}}
+
+
+class FakeStripe:
+    def __init__(
+        self,
+        webhook_url: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        webhook_delay: float = 0.0,
+        decline_rate: float = 0.0,
+        latency: str = "fixed:0",
+        seed: Optional[int] = None,
+    ):
+        """
+        :param webhook_url: Where to deliver payment_intent.* events (needs webhook_secret)
+        :param webhook_delay: Seconds between a confirm/cancel and its event
+        :param decline_rate: Fraction of confirms that fail as a declined card
+        :param latency: Delay before every response, as a paciolan_sim latency spec
+        """
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.webhook_delay = webhook_delay
+        self.decline_rate = decline_rate
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._intents: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"created": 0, "retrieved": 0, "succeeded": 0, "declined": 0, "canceled": 0,
+                      "webhooks_sent": 0, "webhook_failures": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def dispatch(self, method: str, path: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            delay = self.sample_latency(self._rng)
+        if delay:
+            time.sleep(delay)
+
+        parts = [p for p in path.split("/") if p]
+        if parts[:2] != ["v1", "payment_intents"]:
+            return _stripe_error(404, f"Unrecognized request URL ({method}: {path})", code="url_invalid")
+        if len(parts) == 2 and method == "POST":
+            return self.create(params)
+        if len(parts) == 3 and method == "GET":
+            return self.retrieve(parts[2])
+        if len(parts) == 4 and method == "POST" and parts[3] in ("confirm", "cancel"):
+            return self.confirm(parts[2]) if parts[3] == "confirm" else self.cancel(parts[2])
+        return _stripe_error(404, f"Unrecognized request URL ({method}: {path})", code="url_invalid")
+
+    def create(self, params: Dict[str, Any]):
+        try:
+            amount = int(params["amount"])
+        except (KeyError, ValueError):
+            return _stripe_error(400, "Missing required param: amount.", code="parameter_missing")
+        intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": amount,
+            "currency": params.get("currency", "usd"),
+            "status": "requires_payment_method",
+            "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:24]}",
+            "metadata": params.get("metadata", {}),
+            "created": int(time.time()),
+            "livemode": False,
+            "last_payment_error": None,
+        }
+        with self._lock:
+            self._intents[intent_id] = intent
+            self.stats["created"] += 1
+        return 200, intent
+
+    def retrieve(self, intent_id: str):
+        with self._lock:
+            intent = self._intents.get(intent_id)
+            if intent is None:
+                return _stripe_error(404, f"No such payment_intent: '{intent_id}'")
+            self.stats["retrieved"] += 1
+            return 200, dict(intent)
+
+    def confirm(self, intent_id: str):
+        with self._lock:
+            intent = self._intents.get(intent_id)
+            if intent is None:
+                return _stripe_error(404, f"No such payment_intent: '{intent_id}'")
+            if intent["status"] in ("succeeded", "canceled"):
+                return _stripe_error(400, f"This PaymentIntent's status is {intent['status']}.", code="payment_intent_unexpected_state")
+            declined = self._rng.random() < self.decline_rate
+            if declined:
+                intent["last_payment_error"] = {"code": "card_declined", "message": "Your card was declined."}
+                self.stats["declined"] += 1
+            else:
+                intent["status"] = "succeeded"
+                intent["last_payment_error"] = None
+                self.stats["succeeded"] += 1
+            intent = dict(intent)
+        event_type = "payment_intent.payment_failed" if declined else "payment_intent.succeeded"
+        self._notify(intent, event_type)
+        return 200, intent
+
+    def cancel(self, intent_id: str):
+        with self._lock:
+            intent = self._intents.get(intent_id)
+            if intent is None:
+                return _stripe_error(404, f"No such payment_intent: '{intent_id}'")
+            if intent["status"] == "succeeded":
+                return _stripe_error(400, "This PaymentIntent's status is succeeded.", code="payment_intent_unexpected_state")
+            intent["status"] = "canceled"
+            self.stats["canceled"] += 1
+            intent = dict(intent)
+        self._notify(intent, "payment_intent.canceled")
+        return 200, intent
+
+    def _notify(self, intent: Dict[str, Any], event_type: str):
+        if not (self.webhook_url and self.webhook_secret):
+            return
+
+        def deliver():
+            if self.webhook_delay:
+                time.sleep(self.webhook_delay)
+            event = build_event(intent["id"], event_type, amount=intent["amount"], metadata=intent["metadata"])
+            try:
+                response = send_event(self.webhook_url, event, self.webhook_secret)
+                ok = response.status_code < 300
+            except Exception:
+                ok = False
+            self._count("webhooks_sent" if ok else "webhook_failures")
+
+        threading.Thread(target=deliver, daemon=True).start()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, payment_intents=len(self._intents))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Request-Id", f"req_{uuid.uuid4().hex[:14]}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        params = _form_to_dict(raw or parts.query.encode("utf-8"))
+        fake: FakeStripe = self.server.fake_stripe
+        if parts.path == "/_fake/stats" and self.command == "GET":
+            return self._send(200, fake.snapshot())
+        status, body = fake.dispatch(self.command, parts.path, params)
+        self._send(status, body)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+
+def make_server(fake: FakeStripe, host: str = "127.0.0.1", port: int = 12111, verbose: bool = False) -> ThreadingHTTPServer:
+    """An HTTP server for fake; call serve_forever() (e.g. on a thread) to start it. Port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.fake_stripe = fake
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a minimal fake Stripe API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--webhook-url")
+    parser.add_argument("--webhook-secret", default=os.getenv("STRIPE_WEBHOOK_SECRET"))
+    parser.add_argument("--webhook-delay", type=float, default=0.0)
+    parser.add_argument("--decline-rate", type=float, default=0.0)
+    parser.add_argument("--latency", default="fixed:0", help="Latency spec in ms, e.g. lognormal:150:0.4")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+    try:
+        fake = FakeStripe(args.webhook_url, args.webhook_secret, args.webhook_delay, args.decline_rate, args.latency, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = make_server(fake, args.host, args.port, verbose=args.verbose)
+    print(f"Fake Stripe listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+"""
+Local stand-in for the (Mockoon) Paciolan API, with latency and fault injection.
+
+    python tools/paciolan_sim.py                                  # http://127.0.0.1:3003, fixtures only
+    python tools/paciolan_sim.py --synthetic-events 5000 --latency lognormal:80:0.6 --error-rate 0.02
+    python tools/paciolan_sim.py --route-latency create_transfer=uniform:200:900 --timeout-rate 0.01
+
+Serves every route PaciolanClient calls:
+    POST   /v1/auth/token
+    GET    /v2/accounts?userName=
+    GET    /v2/patron/<id>/orders/<season>
+    POST   /v1/tickets/transfer
+    POST   /v1/tickets/transfer/accept
+    DELETE /v1/tickets/transfer/<confirmationCd>
+
+Accounts and orders come from "UC Ticket Data". Like the Mockoon mock, a patron
+with an orders fixture gets all of it whatever season is requested.
+--synthetic-events N adds N generated events in the requested season; they are
+deterministic per patron and season, so every run sees the same payloads.
+Unknown userNames get a synthetic account whose id is derived from the name.
+
+Faults are drawn per request, independently for each route (named as in
+PaciolanClient's metrics: auth_token, get_account, get_patron_orders,
+create_transfer, accept_transfer, cancel_transfer):
+  --latency SPEC        delay before responding, in ms:
+                        fixed:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exp:MEAN
+  --error-rate P        fraction of requests answered with --error-status (default 503)
+  --timeout-rate P      fraction of requests that hang --timeout-seconds, then drop the connection
+  --route-latency / --route-error-rate / --route-timeout-rate ROUTE=VALUE override one route
+
+While running, GET /_sim/stats returns per-route counters, and POST /_sim/config
+with {"latency": ..., "error_rate": ..., "timeout_rate": ..., "routes": {ROUTE: {...}}}
+changes the faults without a restart. Point the backend at it with
+PACIOLAN_BASE_URL=http://127.0.0.1:<port>.
+"""
+import os
+import re
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "UC Ticket Data")
+ACCOUNT_FIXTURES = ("accounts.json", "MitchellAccount.json")
+ORDER_FIXTURES = ("deactickets.json", "mitchellticket.json", "shmeegtickets.json")
+
+ROUTES = ("auth_token", "get_account", "get_patron_orders", "create_transfer", "accept_transfer", "cancel_transfer")
+
+OPPONENTS = (
+    "Miami (OH)", "Houston", "Xavier", "Kansas", "Kansas State", "Baylor", "TCU", "West Virginia",
+    "Iowa State", "Oklahoma State", "Texas Tech", "BYU", "UCF", "Arizona", "Arizona State", "Utah",
+    "Colorado", "Louisville", "Ohio", "Memphis", "Tulane", "SMU", "Temple", "Navy",
+)
+SPORTS = (
+    ("Football", "F", "PAYCOR STADIUM"),
+    ("Men's Basketball", "MB", "FIFTH THIRD ARENA"),
+    ("Women's Basketball", "WB", "FIFTH THIRD ARENA"),
+    ("Baseball", "BS", "UC BASEBALL STADIUM"),
+    ("Volleyball", "VB", "FIFTH THIRD ARENA"),
+)
+EASTERN = timezone(timedelta(hours=-5))
+
+
+# ------------------------------
+# Fault injection
+# ------------------------------
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turn a latency spec (milliseconds, see module docstring) into a sampler returning seconds."""
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(":")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec {spec!r}")
+    shapes = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+    if kind not in shapes or len(values) != shapes[kind]:
+        raise ValueError(f"Invalid latency spec {spec!r}")
+
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000.0
+    if kind == "lognormal":
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000.0
+    return lambda rng: rng.expovariate(1.0 / values[0]) / 1000.0 if values[0] > 0 else 0.0
+
+
+class Faults:
+    """Latency, error and timeout settings for one route."""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, timeout_rate: float = 0.0):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+
+    def updated(self, changes: Dict[str, Any]) -> "Faults":
+        return Faults(
+            latency=changes.get("latency", self.latency),
+            error_rate=float(changes.get("error_rate", self.error_rate)),
+            timeout_rate=float(changes.get("timeout_rate", self.timeout_rate)),
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {"latency": self.latency, "error_rate": self.error_rate, "timeout_rate": self.timeout_rate}
+
+
+class SimulatedTimeout(Exception):
+    """Raised by the simulator to make the handler hang and drop the connection."""
+
+
+# ------------------------------
+# Synthetic orders
+# ------------------------------
+def _season_year(season_code: str) -> int:
+    digits = re.search(r"(\d{2})$", season_code)
+    return 2000 + int(digits.group(1)) if digits else datetime.utcnow().year
+
+
+def synthetic_line_items(patron_id: str, season_code: str, count: int) -> List[Dict[str, Any]]:
+    """
+    `count` order line items with one event each, shaped like the fixtures' lineItemOHVos.
+    Seeded by (patron, season), so a patron's synthetic orders never change between calls or runs.
+    """
+    rng = random.Random(zlib.crc32(f"{patron_id}:{season_code}".encode("utf-8")))
+    year = _season_year(season_code)
+    start = datetime(year, 8, 15, tzinfo=EASTERN)
+    items = []
+    for i in range(count):
+        sport, prefix, facility = SPORTS[rng.randrange(len(SPORTS))]
+        opponent = OPPONENTS[rng.randrange(len(OPPONENTS))]
+        event_dt = start + timedelta(days=rng.randrange(300), hours=rng.choice((12, 14, 16, 19, 20)))
+        event_id = f"{prefix}{i + 1:05d}"
+        stamp = int(event_dt.timestamp() * 1000)
+        name = f"UC {sport} vs. {opponent}"
+        items.append({
+            "orderDtStr": start.strftime("%Y-%m-%dT%H:%M:%S.000%z"),
+            "season": f"{year} {sport}",
+            "eventTimeStamp": stamp,
+            "eventOHVos": [{
+                "eventDtStr": event_dt.strftime("%Y-%m-%dT%H:%M:%S.000%z"),
+                "eventTimeStamp": stamp,
+                "timeTba": "0",
+                "seatOHVos": [{
+                    "dispositionName": "Mobile Delivery ",
+                    "level": rng.choice(("Gen Adm", "Lower Level", "Upper Level", "Student Section")),
+                }],
+                "cost": 0,
+                "facility": facility,
+                "qty": 1,
+                "extPrice": 0,
+                "id": event_id,
+                "name": name,
+            }],
+            "seasonCd": season_code,
+            "balance": 0,
+            "qty": 1,
+            "totalPrice": 0,
+            "orderDt": int(start.timestamp() * 1000),
+            "type": "S",
+            "id": f"{season_code}:CINN:{event_id}",
+            "name": name,
+        })
+    return items
+
+
+# ------------------------------
+# Simulator
+# ------------------------------
+class PaciolanSimulator:
+    def __init__(
+        self,
+        fixtures_dir: str = FIXTURES_DIR,
+        synthetic_events: int = 0,
+        token_ttl: int = 3600,
+        faults: Optional[Faults] = None,
+        route_faults: Optional[Dict[str, Faults]] = None,
+        error_status: int = 503,
+        timeout_seconds: float = 60.0,
+        orders_cache_size: int = 256,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param synthetic_events: Generated events added to every orders response
+        :param token_ttl: expiresIn of issued tokens; expired or unknown tokens get a 401
+        :param route_faults: Per-route overrides of `faults`
+        :param orders_cache_size: Encoded orders payloads kept, keyed by (patron, season)
+        :param seed: Seed for fault draws, for reproducible runs
+        """
+        self.synthetic_events = synthetic_events
+        self.token_ttl = token_ttl
+        self.error_status = error_status
+        self.timeout_seconds = timeout_seconds
+        self.orders_cache_size = orders_cache_size
+
+        self.accounts: Dict[str, Dict[str, Any]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self._load_fixtures(fixtures_dir)
+
+        default = faults or Faults()
+        self.faults: Dict[str, Faults] = {route: default for route in ROUTES}
+        self.faults.update(route_faults or {})
+
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._tokens: Dict[str, float] = {}
+        self._transfers: Dict[str, Dict[str, Any]] = {}
+        self._confirmations: Dict[str, str] = {}
+        self._orders_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.stats = {route: {"requests": 0, "errors": 0, "timeouts": 0, "latency_ms": 0.0} for route in ROUTES}
+
+        self._routes = [
+            ("POST", re.compile(r"^/v1/auth/token$"), "auth_token", self.auth_token),
+            ("GET", re.compile(r"^/v2/accounts$"), "get_account", self.get_account),
+            ("GET", re.compile(r"^/v2/patron/(?P<patron_id>[^/]+)/orders/(?P<season>[^/]+)$"), "get_patron_orders", self.get_patron_orders),
+            ("POST", re.compile(r"^/v1/tickets/transfer$"), "create_transfer", self.create_transfer),
+            ("POST", re.compile(r"^/v1/tickets/transfer/accept$"), "accept_transfer", self.accept_transfer),
+            ("DELETE", re.compile(r"^/v1/tickets/transfer/(?P<code>[^/]+)$"), "cancel_transfer", self.cancel_transfer),
+        ]
+
+    def _load_fixtures(self, fixtures_dir: str):
+        for name in ACCOUNT_FIXTURES:
+            with open(os.path.join(fixtures_dir, name), encoding="utf-8") as f:
+                account = json.load(f)
+            self.accounts[account["loginEmail"].lower()] = account
+        for name in ORDER_FIXTURES:
+            with open(os.path.join(fixtures_dir, name), encoding="utf-8") as f:
+                orders = json.load(f)
+            self.orders[str(orders["value"]["patronId"])] = orders
+
+    # ------------------------------
+    # Dispatch
+    # ------------------------------
+    def configure(self, changes: Dict[str, Any]):
+        """Apply a POST /_sim/config body: top-level settings for every route, "routes" per route."""
+        routes = changes.get("routes", {})
+        unknown = set(routes) - set(ROUTES)
+        if unknown:
+            raise ValueError(f"Unknown routes: {', '.join(sorted(unknown))}")
+        with self._lock:
+            faults = {route: f.updated(changes) for route, f in self.faults.items()}
+            for route, route_changes in routes.items():
+                faults[route] = faults[route].updated(route_changes)
+            self.faults = faults
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "routes": {route: dict(stats, **self.faults[route].describe()) for route, stats in self.stats.items()},
+                "transfers": len(self._transfers),
+                "tokens": len(self._tokens),
+            }
+
+    def dispatch(self, method: str, path: str, query: Dict[str, str], body: Any, headers) -> Tuple[int, Any]:
+        """
+        Route one request. Returns (status, JSON-able body or pre-encoded bytes, or None for no body).
+        Raises SimulatedTimeout when the request should hang.
+        """
+        for route_method, pattern, route, handler in self._routes:
+            match = pattern.match(path)
+            if match is None or route_method != method:
+                continue
+            with self._lock:
+                faults = self.faults[route]
+                delay = faults.sample_latency(self._rng)
+                timeout = self._rng.random() < faults.timeout_rate
+                error = not timeout and self._rng.random() < faults.error_rate
+                stats = self.stats[route]
+                stats["requests"] += 1
+                stats["latency_ms"] += delay * 1000.0
+                stats["timeouts"] += timeout
+                stats["errors"] += error
+            if timeout:
+                raise SimulatedTimeout(route)
+            if delay:
+                time.sleep(delay)
+            if error:
+                return self.error_status, {"status": {"cd": self.error_status, "msg": "Simulated failure"}}
+            if route != "auth_token" and not self._authorized(headers.get("Authorization", "")):
+                return 401, {"status": {"cd": 401, "msg": "Invalid or expired token"}}
+            return handler(query=query, body=body, **match.groupdict())
+        return 404, {"status": {"cd": 404, "msg": f"No route for {method} {path}"}}
+
+    def _authorized(self, authorization: str) -> bool:
+        token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else ""
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        return expires_at is not None and time.monotonic() < expires_at
+
+    # ------------------------------
+    # Routes
+    # ------------------------------
+    def auth_token(self, query, body):
+        token = uuid.uuid4().hex
+        with self._lock:
+            now = time.monotonic()
+            # Forget expired tokens so long runs don't grow without bound
+            self._tokens = {t: exp for t, exp in self._tokens.items() if exp > now}
+            self._tokens[token] = now + self.token_ttl
+        return 200, {"accessToken": token, "tokenType": "Bearer", "expiresIn": self.token_ttl}
+
+    def get_account(self, query, body):
+        user_name = (query.get("userName") or "").strip()
+        if not user_name:
+            return 400, {"status": {"cd": 400, "msg": "userName is required"}}
+        account = self.accounts.get(user_name.lower())
+        if account is not None:
+            return 200, account
+        patron_id = str(10000000 + zlib.crc32(user_name.lower().encode("utf-8")) % 90000000)
+        return 200, {
+            "key": {"id": patron_id, "dbId": "CINN"},
+            "accountType": "I",
+            "accountName": user_name,
+            "accountStatusId": "A",
+            "accountStatusName": "Active",
+            "loginEmail": user_name,
+        }
+
+    def get_patron_orders(self, query, body, patron_id, season):
+        cache_key = (patron_id, season)
+        with self._lock:
+            payload = self._orders_cache.get(cache_key)
+            if payload is not None:
+                self._orders_cache.move_to_end(cache_key)
+                return 200, payload
+
+        fixture = self.orders.get(patron_id)
+        line_items = list(fixture["value"]["lineItemOHVos"]) if fixture else []
+        if self.synthetic_events:
+            line_items.extend(synthetic_line_items(patron_id, season, self.synthetic_events))
+        orders = dict(fixture) if fixture else {"status": {"cd": 0, "mg": "successful", "level": 0}}
+        orders["value"] = dict(fixture["value"]) if fixture else {"patronId": patron_id}
+        orders["value"]["lineItemOHVos"] = line_items
+        payload = json.dumps(orders).encode("utf-8")
+
+        with self._lock:
+            self._orders_cache[cache_key] = payload
+            while len(self._orders_cache) > self.orders_cache_size:
+                self._orders_cache.popitem(last=False)
+        return 200, payload
+
+    def create_transfer(self, query, body):
+        if not query.get("distributorCode"):
+            return 400, {"status": {"cd": 400, "msg": "distributorCode is required"}}
+        transfer_requests = body.get("transferRequests") if isinstance(body, dict) else None
+        if not transfer_requests:
+            return 400, {"status": {"cd": 400, "msg": "transferRequests is required"}}
+        transfer_id = uuid.uuid4().hex
+        confirmation_code = uuid.uuid4().hex[:10].upper()
+        with self._lock:
+            self._transfers[transfer_id] = {"status": "pending", "confirmationCd": confirmation_code, "request": transfer_requests}
+            self._confirmations[confirmation_code] = transfer_id
+        return 200, {
+            "transferId": transfer_id,
+            "url": f"https://am.ticketmaster.com/uc/transfer/{transfer_id}",
+            "confirmationCd": confirmation_code,
+        }
+
+    def accept_transfer(self, query, body):
+        transfer_id = body.get("transferId") if isinstance(body, dict) else None
+        with self._lock:
+            transfer = self._transfers.get(transfer_id)
+            if transfer is None:
+                return 404, {"status": {"cd": 404, "msg": "Transfer not found"}}
+            if transfer["status"] == "canceled":
+                return 409, {"status": {"cd": 409, "msg": "Transfer was canceled"}}
+            # Accepting twice returns the same confirmation, as a retried call would see
+            transfer["status"] = "accepted"
+            return 200, {"transferId": transfer_id, "confirmationCd": transfer["confirmationCd"]}
+
+    def cancel_transfer(self, query, body, code):
+        with self._lock:
+            transfer = self._transfers.get(self._confirmations.get(code))
+            if transfer is None:
+                return 404, {"status": {"cd": 404, "msg": "Transfer not found"}}
+            if transfer["status"] == "accepted":
+                return 409, {"status": {"cd": 409, "msg": "Transfer was already accepted"}}
+            transfer["status"] = "canceled"
+        return 204, None
+
+
+# ------------------------------
+# HTTP server
+# ------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so PaciolanClient's pooled connections are reused as against the real API
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: Any):
+        payload = b"" if body is None else body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        if payload:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            return self._send(400, {"status": {"cd": 400, "msg": "Invalid JSON body"}})
+
+        simulator: PaciolanSimulator = self.server.simulator
+        if parts.path == "/_sim/stats" and self.command == "GET":
+            return self._send(200, simulator.snapshot())
+        if parts.path == "/_sim/config" and self.command == "POST":
+            try:
+                simulator.configure(body or {})
+            except (ValueError, TypeError) as e:
+                return self._send(400, {"error": str(e)})
+            return self._send(200, simulator.snapshot())
+
+        try:
+            status, response = simulator.dispatch(self.command, parts.path, query, body, self.headers)
+        except SimulatedTimeout:
+            time.sleep(simulator.timeout_seconds)
+            self.close_connection = True
+            return
+        self._send(status, response)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+
+def make_server(simulator: PaciolanSimulator, host: str = "127.0.0.1", port: int = 3003, verbose: bool = False) -> ThreadingHTTPServer:
+    """An HTTP server for simulator; call serve_forever() (e.g. on a thread) to start it. Port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.simulator = simulator
+    server.verbose = verbose
+    return server
+
+
+def _route_overrides(values: List[str], option: str) -> Dict[str, str]:
+    overrides = {}
+    for value in values:
+        route, sep, setting = value.partition("=")
+        if not sep or route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"{option} expects ROUTE=VALUE with ROUTE one of {', '.join(ROUTES)}")
+        overrides[route] = setting
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Paciolan API simulator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3003)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory holding the UC Ticket Data fixtures")
+    parser.add_argument("--synthetic-events", type=int, default=0, help="Generated events added to every orders response")
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    parser.add_argument("--latency", default="fixed:0", help="Latency spec in ms, e.g. lognormal:80:0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=60.0)
+    parser.add_argument("--route-latency", action="append", default=[], metavar="ROUTE=SPEC")
+    parser.add_argument("--route-error-rate", action="append", default=[], metavar="ROUTE=P")
+    parser.add_argument("--route-timeout-rate", action="append", default=[], metavar="ROUTE=P")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    try:
+        faults = Faults(args.latency, args.error_rate, args.timeout_rate)
+        overrides: Dict[str, Dict[str, Any]] = {}
+        for option, values, key in (
+            ("--route-latency", args.route_latency, "latency"),
+            ("--route-error-rate", args.route_error_rate, "error_rate"),
+            ("--route-timeout-rate", args.route_timeout_rate, "timeout_rate"),
+        ):
+            for route, value in _route_overrides(values, option).items():
+                overrides.setdefault(route, {})[key] = value
+        route_faults = {route: faults.updated(changes) for route, changes in overrides.items()}
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    simulator = PaciolanSimulator(
+        fixtures_dir=args.fixtures,
+        synthetic_events=args.synthetic_events,
+        token_ttl=args.token_ttl,
+        faults=faults,
+        route_faults=route_faults,
+        error_status=args.error_status,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+    )
+    server = make_server(simulator, args.host, args.port, verbose=args.verbose)
+    print(f"Paciolan simulator listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
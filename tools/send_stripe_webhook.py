@@ -0,0 +1,83 @@
+"""
+Deliver a fake, correctly signed Stripe event to a local backend.
+
+    STRIPE_WEBHOOK_SECRET=whsec_test python tools/send_stripe_webhook.py pi_123
+    python tools/send_stripe_webhook.py pi_123 --type payment_intent.payment_failed --secret whsec_test
+
+The backend must run with the same STRIPE_WEBHOOK_SECRET. Pass --repeat to send
+the same event id again (it should be acknowledged as a duplicate), or
+--event-id to replay a specific event.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stripe_webhooks import sign_payload  # noqa: E402
+
+# PaymentIntent status Stripe reports with each event type
+EVENT_STATUSES = {
+    "payment_intent.succeeded": "succeeded",
+    "payment_intent.processing": "processing",
+    "payment_intent.payment_failed": "requires_payment_method",
+    "payment_intent.requires_action": "requires_action",
+    "payment_intent.canceled": "canceled",
+}
+
+
+def build_event(payment_intent_id, event_type, event_id=None, created=None, amount=None, metadata=None):
+    return {
+        "id": event_id or f"evt_{uuid.uuid4().hex[:24]}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()) if created is None else created,
+        "livemode": False,
+        "data": {
+            "object": {
+                "id": payment_intent_id,
+                "object": "payment_intent",
+                "status": EVENT_STATUSES.get(event_type, "requires_payment_method"),
+                "amount": amount,
+                "metadata": metadata or {},
+            }
+        },
+    }
+
+
+def send_event(url, event, secret):
+    payload = json.dumps(event)
+    return requests.post(
+        url,
+        data=payload,
+        headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(payload, secret)},
+        timeout=10,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a signed fake Stripe webhook event.")
+    parser.add_argument("payment_intent", help="PaymentIntent id (the ticket's transaction_id)")
+    parser.add_argument("--type", default="payment_intent.succeeded", choices=sorted(EVENT_STATUSES))
+    parser.add_argument("--url", default="http://127.0.0.1:5000/webhooks/stripe")
+    parser.add_argument("--secret", default=os.getenv("STRIPE_WEBHOOK_SECRET"))
+    parser.add_argument("--event-id")
+    parser.add_argument("--buyer-id", help="metadata.buyer_id; the purchase only completes for this buyer")
+    parser.add_argument("--repeat", type=int, default=1, help="Deliver the same event this many times")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("--secret or STRIPE_WEBHOOK_SECRET is required")
+
+    metadata = {"buyer_id": args.buyer_id} if args.buyer_id else None
+    event = build_event(args.payment_intent, args.type, event_id=args.event_id, metadata=metadata)
+    for _ in range(args.repeat):
+        response = send_event(args.url, event, args.secret)
+        print(response.status_code, response.text.strip())
+
+
+if __name__ == "__main__":
+    main()
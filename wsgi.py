@@ -0,0 +1,10 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+See gunicorn.conf.py for the worker model and pool-size settings.
+"""
+from app import create_app
+
+app = create_app()